@@ -5,12 +5,13 @@ The context for an action, allowing it to update its state, log progress, and
 create child actions.
 """
 
-from collections.abc import Awaitable, Callable
-from dataclasses import dataclass
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Concatenate, ParamSpec, TypeVar
 
-from markten.__utils import friendly_name
+from markten.__utils import LogBuffer, friendly_name
 
 TeardownHook = Callable[[], Awaitable[None] | None]
 """Callback function for cleaning up after an action has completed."""
@@ -37,8 +38,20 @@ class ActionStatus(Enum):
     """Action resolved, but failed"""
 
 
-@dataclass
+ChangeListener = Callable[[], None]
+"""Callback function for when an action or any of its children changes."""
+
+
+@dataclass(eq=False)
 class ActionInfo:
+    """
+    Snapshot of an action's state, for display.
+
+    Snapshots are reused for as long as the action and its children are
+    unchanged, so they are compared by identity, allowing anything derived
+    from them (eg rendered output) to be cached.
+    """
+
     name: str
     status: ActionStatus
     message: str | None
@@ -46,6 +59,17 @@ class ActionInfo:
     children: list["ActionInfo"]
     output: list[str]
     verbose: bool
+    omitted_output: int = 0
+    """Number of earlier lines of output not included in `output`"""
+    start: float = 0.0
+    """Time at which the action was created, from `time.perf_counter`"""
+    end: float | None = None
+    """
+    Time at which the action resolved, from `time.perf_counter`, or `None` if
+    it is still running
+    """
+    log: LogBuffer | None = field(default=None, repr=False)
+    """Full log of the action, for reading lines not included in `output`"""
 
 
 class ActionSession:
@@ -69,10 +93,14 @@ class ActionSession:
         """Status as enum"""
         self.__message: str | None = None
         """Status message"""
-        self.__output: list[str] = []
+        self.__output = LogBuffer()
         """Overall logs"""
         self.__progress: float | None = None
         """Progress percentage (float from 0 to 1)"""
+        self.__start = time.perf_counter()
+        """Time at which this action was created"""
+        self.__end: float | None = None
+        """Time at which this action resolved, if it has"""
 
         self.__children: list[ActionSession] = []
         """Child tasks"""
@@ -84,6 +112,50 @@ class ActionSession:
         self.__verbose = False
         """Whether task should always show full output regardless of status"""
 
+        self.__parent: ActionSession | None = None
+        """Parent action, which is notified when this action changes"""
+        self.__change_listeners: list[ChangeListener] = []
+        self.__info: ActionInfo | None = None
+        """
+        Snapshot from the last call to `display`, or `None` if this action or
+        any of its children changed since then
+        """
+
+    def add_change_listener(self, listener: ChangeListener) -> None:
+        """Register a listener, to be called when this action or any of its
+        children changes.
+
+        To avoid redundant notifications, listeners are only called for the
+        first change since `display` was last called.
+
+        Parameters
+        ----------
+        listener : ChangeListener
+            Listener callback function.
+        """
+        self.__change_listeners.append(listener)
+
+    def remove_change_listener(self, listener: ChangeListener) -> None:
+        """Remove a previously-registered change listener."""
+        self.__change_listeners.remove(listener)
+
+    def notify_changed(self) -> None:
+        """Notify listeners that this action should be redrawn, eg because
+        state which is drawn alongside it has changed.
+        """
+        self.__changed()
+
+    def __changed(self) -> None:
+        """Mark this action and its ancestors as changed, notifying
+        listeners.
+        """
+        session: ActionSession | None = self
+        while session is not None and session.__info is not None:
+            session.__info = None
+            for listener in session.__change_listeners:
+                listener()
+            session = session.__parent
+
     def add_teardown_hook(self, hook: TeardownHook):
         """Register a teardown hook, which will be called during the clean-up
         phase of the action.
@@ -201,9 +273,27 @@ class ActionSession:
             Child task
         """
         child = ActionSession(name)
+        child.__parent = self
         self.__children.append(child)
+        self.__changed()
         return child
 
+    def remove_child(self, child: "ActionSession") -> None:
+        """Remove the given child action, so that it is no longer displayed
+        as part of this action.
+
+        Its teardown and abort hooks are no longer returned by this action, so
+        they must be handled separately.
+
+        Parameters
+        ----------
+        child : ActionSession
+            Child to remove.
+        """
+        self.__children.remove(child)
+        child.__parent = None
+        self.__changed()
+
     def set_verbose(self, new_value: bool = True) -> None:
         """Set verbosity for this action's output.
 
@@ -216,6 +306,7 @@ class ActionSession:
             New verbose value, by default True
         """
         self.__verbose = new_value
+        self.__changed()
 
     def log(self, line: str) -> None:
         """
@@ -225,6 +316,27 @@ class ActionSession:
         process or debugging info.
         """
         self.__output.append(line.strip())
+        self.__changed()
+
+    def log_lines(self, lines: Iterable[str]) -> None:
+        """
+        Add multiple messages to the action's output log at once.
+
+        This is more efficient than calling `log` for each line, eg when
+        logging large amounts of output from a child process.
+        """
+        for line in lines:
+            self.__output.append(line.strip())
+        self.__changed()
+
+    def full_output(self) -> list[str]:
+        """
+        Return the action's full output log.
+
+        Only the most-recent lines are kept in memory (and displayed), so this
+        may need to read earlier lines from disk.
+        """
+        return self.__output.read_all()
 
     def progress(self, progress: float | None) -> None:
         """
@@ -244,6 +356,7 @@ class ActionSession:
         If `None`, no message is shown, and the previous message is discarded.
         """
         self.__message = msg
+        self.__changed()
         if msg is not None:
             self.log(msg)
 
@@ -254,6 +367,8 @@ class ActionSession:
         Optionally, a status message can be provided.
         """
         self.__status = ActionStatus.Running
+        self.__end = None
+        self.__changed()
         self.message(msg)
 
     def succeed(self, msg: str | None = None) -> None:
@@ -263,6 +378,8 @@ class ActionSession:
         Optionally, a status message can be provided.
         """
         self.__status = ActionStatus.Success
+        self.__end = time.perf_counter()
+        self.__changed()
         self.message(msg)
 
     def fail(self, msg: str | BaseException | None = None) -> None:
@@ -276,6 +393,8 @@ class ActionSession:
         action.
         """
         self.__status = ActionStatus.Failure
+        self.__end = time.perf_counter()
+        self.__changed()
         if isinstance(msg, BaseException):
             msg = str(msg)
         self.message(msg)
@@ -291,13 +410,22 @@ class ActionSession:
         """
         Return info about this action in a format which can be displayed
         easily.
+
+        If nothing has changed since the previous call, the same info is
+        returned. Similarly, info for unchanged children is reused.
         """
-        return ActionInfo(
-            self.__name,
-            self.__status,
-            self.__message,
-            self.__progress,
-            [child.display() for child in self.__children],
-            self.__output,
-            self.__verbose,
-        )
+        if self.__info is None:
+            self.__info = ActionInfo(
+                self.__name,
+                self.__status,
+                self.__message,
+                self.__progress,
+                [child.display() for child in self.__children],
+                self.__output.tail(),
+                self.__verbose,
+                self.__output.spilled,
+                self.__start,
+                self.__end,
+                self.__output,
+            )
+        return self.__info
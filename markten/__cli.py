@@ -6,23 +6,54 @@ Class for displaying multiple parallel spinners.
 This is used to report the progress of tasks that run simultaneously.
 """
 
-from collections.abc import Callable
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from weakref import WeakKeyDictionary
 
 from rich.columns import Columns
-from rich.console import Group, RenderableType
+from rich.console import Console, Group, RenderableType
 from rich.live import Live
 from rich.padding import Padding
 from rich.spinner import Spinner
 from rich.text import Text
 
 from markten.__action_session import ActionInfo, ActionSession, ActionStatus
-from markten.__consts import TIME_PER_CLI_FRAME
-from markten.more_itertools import hourglass
+from markten.__consts import (
+    DASHBOARD_EXPANDED_PERMUTATIONS,
+    TIME_PER_CLI_FRAME,
+    TIME_PER_IDLE_CLI_FRAME,
+)
+from markten.__context import get_context
+from markten.__events import EventStreamManager, is_headless
+from markten.__utils import BufferedConsole
 
 INDENT_MULTIPLIER = 2
 
 PARTIAL_OUTPUT_LINES = 10
 
+Drawer = Callable[[ActionInfo], RenderableType]
+"""Function which draws an action"""
+
+__render_cache: WeakKeyDictionary[ActionInfo, dict[Drawer, RenderableType]]
+__render_cache = WeakKeyDictionary()
+"""
+Renderables drawn for each action, so that unchanged actions (whose info is
+reused) don't need to be redrawn.
+"""
+
+
+def draw_cached(action: ActionInfo, drawer: Drawer) -> RenderableType:
+    """
+    Draw the given action using the given drawer, reusing the previous result
+    if the action is unchanged.
+    """
+    drawn = __render_cache.setdefault(action, {})
+    if drawer not in drawn:
+        drawn[drawer] = drawer(action)
+    return drawn[drawer]
+
 
 def action_status(action: ActionInfo, title: Text) -> RenderableType:
     # Need weird spacing to make things line up due to emoji annoyance
@@ -80,10 +111,15 @@ def draw_action_partial(action: ActionInfo) -> RenderableType:
 def draw_action_full(action: ActionInfo) -> RenderableType:
     header = draw_action_brief(action)
     latest_logs = "\n".join(action.output)
+    if action.omitted_output:
+        latest_logs = (
+            f"... {action.omitted_output} earlier lines omitted ...\n"
+            + latest_logs
+        )
 
     # Brief overview of child actions
     children = [
-        Padding.indent(draw_action_full(child), INDENT_MULTIPLIER)
+        Padding.indent(draw_cached(child, draw_action_full), INDENT_MULTIPLIER)
         for child in action.children
     ]
 
@@ -96,15 +132,42 @@ def draw_action_full(action: ActionInfo) -> RenderableType:
 
 def draw_action(
     action: ActionInfo,
-    drawer: Callable[[ActionInfo], RenderableType] = draw_action_partial,
+    drawer: Drawer = draw_action_partial,
 ) -> RenderableType:
     """
     Draw action output, choosing output verbosity based on status
     """
     if action.verbose or action.status == ActionStatus.Failure:
-        return draw_action_full(action)
+        return draw_cached(action, draw_action_full)
     else:
-        return drawer(action)
+        return draw_cached(action, drawer)
+
+
+def draw_children(action: ActionInfo) -> RenderableType:
+    """
+    Draw only the children of the given action, each at the verbosity given by
+    its status. This is used when the action is just a container for other
+    actions running in parallel.
+    """
+    return Group(*(draw_action(child) for child in action.children))
+
+
+@contextmanager
+def live_display(console: Console) -> Iterator[Live]:
+    """Show a live display on the given console for the duration of the
+    context.
+    """
+    try:
+        # Refreshing is controlled by the `CliManager`, so that it can adapt
+        # the frame rate
+        with Live(console=console, auto_refresh=False) as live:
+            yield live
+    finally:
+        # When the console isn't a terminal (eg output is buffered or
+        # redirected to a file), rich doesn't end the final frame with a
+        # newline, so the next output would be joined onto it.
+        if not console.is_terminal:
+            console.line()
 
 
 class CliManager:
@@ -113,20 +176,305 @@ class CliManager:
     Responsible for displaying output during the execution of a recipe step.
     """
 
-    def __init__(self, live: Live) -> None:
+    def __init__(
+        self,
+        live: Live,
+        drawer: Drawer = draw_action,
+    ) -> None:
         self.__live = live
+        self.__drawer = drawer
         self.__should_stop = False
+        self.__changed = asyncio.Event()
+        """Set when the action changes, or when the manager should stop"""
 
     def stop(self) -> None:
         self.__should_stop = True
+        self.__changed.set()
 
     async def run(self, action: ActionSession) -> None:
         """Run the CLI output.
 
-        This runs infinitely, redrawing the output every frame, until it is
-        manually cancelled.
+        This runs until it is stopped, redrawing the output immediately
+        whenever the action changes, at most once per frame. While nothing
+        changes, the display is refreshed (to animate spinners) increasingly
+        rarely, down to `TIME_PER_IDLE_CLI_FRAME`. The frame rate is also
+        lowered if drawing takes longer than the render budget allows.
         """
-        async for _ in hourglass(TIME_PER_CLI_FRAME):
-            self.__live.update(draw_action(action.display()))
-            if self.__should_stop:
-                return
+        budget = get_context().render_budget
+        # Time between idle frames
+        idle_interval = TIME_PER_CLI_FRAME
+        changed = True
+        action.add_change_listener(self.__changed.set)
+        try:
+            while True:
+                stopping = self.__should_stop
+                frame_start = time.perf_counter()
+                if changed or stopping:
+                    # The final frame must always show the latest state
+                    self.__live.update(
+                        self.__drawer(action.display()), refresh=True
+                    )
+                    # Only clear once the change has been drawn
+                    self.__changed.clear()
+                    idle_interval = TIME_PER_CLI_FRAME
+                else:
+                    self.__live.refresh()
+                    idle_interval = min(
+                        idle_interval * 2, TIME_PER_IDLE_CLI_FRAME
+                    )
+                if stopping:
+                    return
+                render_time = time.perf_counter() - frame_start
+
+                # Don't draw the next frame too soon
+                min_interval = max(TIME_PER_CLI_FRAME, render_time / budget)
+                await asyncio.sleep(min_interval - render_time)
+                # Then wait until something changes, or it's time for an idle
+                # frame
+                if self.__changed.is_set():
+                    changed = True
+                    continue
+                try:
+                    await asyncio.wait_for(
+                        self.__changed.wait(),
+                        max(idle_interval - min_interval, 0),
+                    )
+                    changed = True
+                except TimeoutError:
+                    changed = False
+        finally:
+            action.remove_change_listener(self.__changed.set)
+
+
+@asynccontextmanager
+async def show_progress(
+    console: Console,
+    action: ActionSession,
+    drawer: Drawer = draw_action,
+) -> AsyncIterator[None]:
+    """Display the progress of the given action for the duration of the
+    context.
+
+    This uses a live display, unless Markten is running headless, in which
+    case changes are reported as JSON events instead.
+    """
+    if is_headless():
+        events = EventStreamManager(console.file)
+        events_task = asyncio.create_task(events.run(action))
+        try:
+            yield
+        finally:
+            events.stop()
+            await events_task
+        return
+
+    with live_display(console) as live:
+        spinners = CliManager(live, drawer)
+        # Start drawing the spinners
+        spinner_task = asyncio.create_task(spinners.run(action))
+        try:
+            yield
+        finally:
+            # Stop spinners
+            spinners.stop()
+            await spinner_task
+
+
+def contains_verbose(action: ActionInfo) -> bool:
+    """Whether the given action, or any of its descendants, is verbose"""
+    return action.verbose or any(
+        contains_verbose(child) for child in action.children
+    )
+
+
+def draw_permutation(action: ActionInfo) -> RenderableType:
+    """
+    Draw a running permutation of a recipe, showing the progress of each of
+    its steps.
+    """
+    return Group(
+        draw_action_brief(action),
+        *(
+            Padding.indent(draw_action(step), INDENT_MULTIPLIER)
+            for step in action.children
+        ),
+    )
+
+
+class Dashboard:
+    """
+    A single live display which shows the progress of all permutations of a
+    recipe.
+
+    Running permutations are shown along with the progress of their steps
+    (collapsed to a single line if there are many of them), followed by the
+    number of permutations completed so far. When a permutation finishes, it
+    is removed from the display, and a one-line summary is printed above it,
+    along with any of its steps containing verbose actions.
+    """
+
+    def __init__(self, console: Console, total: int | None) -> None:
+        """Create a dashboard.
+
+        Parameters
+        ----------
+        console : Console
+            Console to display the dashboard on.
+        total : int | None
+            Total number of permutations, if known.
+        """
+        self.__console = console
+        self.__total = total
+        self.__root = ActionSession("Recipe")
+        """Parent of the session of each permutation"""
+        self.__running: list[ActionSession] = []
+        """Sessions of running permutations, in the order they started"""
+        self.__succeeded = 0
+        self.__failed = 0
+        self.__skipped = 0
+        self.__live: Live | None = None
+        """Live display, while the dashboard is shown"""
+
+    def add(self, name: str) -> ActionSession:
+        """Add a permutation, returning the session under which its steps
+        should be run.
+
+        The permutation is only shown once it is started, so its steps can be
+        prefetched before then.
+        """
+        return self.__root.make_child(name)
+
+    def start(self, session: ActionSession) -> None:
+        """Show the given permutation as running."""
+        self.__running.append(session)
+        session.running()
+
+    def skip(self) -> None:
+        """Count a permutation which was skipped without being run."""
+        self.__skipped += 1
+        self.__root.notify_changed()
+
+    def discard(self, session: ActionSession) -> None:
+        """Remove a permutation which was abandoned without being run."""
+        self.__root.remove_child(session)
+
+    def finish(
+        self,
+        session: ActionSession,
+        success: bool,
+        summary: str,
+        output: BufferedConsole | None = None,
+    ) -> None:
+        """Remove a permutation from the display, and print its outcome
+        above it.
+
+        Parameters
+        ----------
+        session : ActionSession
+            Session of the permutation.
+        success : bool
+            Whether the permutation succeeded.
+        summary : str
+            Summary of the permutation, eg its duration.
+        output : BufferedConsole | None, optional
+            Output of the permutation. This is only printed if the
+            permutation failed, along with the progress of its steps. If it
+            succeeded, only steps containing verbose actions are shown.
+        """
+        if success:
+            self.__succeeded += 1
+            session.succeed()
+        else:
+            self.__failed += 1
+            session.fail()
+        if session in self.__running:
+            self.__running.remove(session)
+
+        self.__console.print(
+            draw_action_brief(session.display()),
+            Text(summary, style="dim"),
+        )
+        info = session.display()
+        if not success:
+            self.__console.print(
+                Padding.indent(draw_children(info), INDENT_MULTIPLIER)
+            )
+            if output is not None:
+                self.__console.print(Text.from_ansi(output.take()))
+        else:
+            verbose_steps = [
+                step for step in info.children if contains_verbose(step)
+            ]
+            if verbose_steps:
+                self.__console.print(
+                    Padding.indent(
+                        Group(*(draw_action(step) for step in verbose_steps)),
+                        INDENT_MULTIPLIER,
+                    )
+                )
+        self.__root.remove_child(session)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Hide the dashboard for the duration of the context, eg so that the
+        user can be prompted for input.
+        """
+        live = self.__live
+        if live is None or not live.is_started:
+            yield
+            return
+        transient = live.transient
+        # Erase the display, rather than leaving a copy of it behind
+        live.transient = True
+        live.stop()
+        try:
+            yield
+        finally:
+            live.transient = transient
+            live.start(refresh=True)
+
+    def __draw(self, _: ActionInfo) -> RenderableType:
+        running = [session.display() for session in self.__running]
+        expanded = running[:DASHBOARD_EXPANDED_PERMUTATIONS]
+        collapsed = running[DASHBOARD_EXPANDED_PERMUTATIONS:]
+
+        done = self.__succeeded + self.__failed + self.__skipped
+        progress = Text.assemble(
+            ("Completed ", "bold"),
+            (str(done), "bold cyan"),
+            *(
+                ((" of ", "bold"), (str(self.__total), "bold cyan"))
+                if self.__total is not None
+                else ()
+            ),
+            " permutations",
+            *(
+                (" - ", (f"{self.__failed} failed", "red"))
+                if self.__failed
+                else ()
+            ),
+            *(
+                (" - ", (f"{self.__skipped} skipped", "yellow"))
+                if self.__skipped
+                else ()
+            ),
+        )
+        return Group(
+            *(draw_cached(info, draw_permutation) for info in expanded),
+            *(draw_cached(info, draw_action_brief) for info in collapsed),
+            progress,
+        )
+
+    @asynccontextmanager
+    async def show(self) -> AsyncIterator[None]:
+        """Show the dashboard for the duration of the context."""
+        with live_display(self.__console) as live:
+            self.__live = live
+            manager = CliManager(live, self.__draw)
+            manager_task = asyncio.create_task(manager.run(self.__root))
+            try:
+                yield
+            finally:
+                manager.stop()
+                await manager_task
+                self.__live = None
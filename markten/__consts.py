@@ -3,22 +3,108 @@
 """
 
 from datetime import timedelta
-from importlib.metadata import version
+from typing import TYPE_CHECKING
+
+from markten.__lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    VERSION: str
+    """
+    Markten version, determined using importlib metadata (so that I don't need
+    to constantly remember to update it).
+
+    This is determined when first accessed, since reading package metadata is
+    slow.
+    """
+
+
+def __version() -> str:
+    from importlib.metadata import version
+
+    return version("markten")
+
+
+__getattr__ = lazy_getattr(__name__, computed={"VERSION": __version})
 
-VERSION = version("markten")
-"""
-Markten version, determined using importlib metadata (so that I don't need to
-constantly remember to update it).
-"""
 
 TIME_PER_CLI_FRAME = 0.03
 """30 FPS"""
 
+TIME_PER_IDLE_CLI_FRAME = 0.5
+"""
+Slowest frame rate (2 FPS), which the CLI backs off to while nothing changes,
+so that spinners keep moving
+"""
+
+DASHBOARD_EXPANDED_PERMUTATIONS = 4
+"""
+Maximum number of running permutations whose steps are shown in full on the
+dashboard. Any others are collapsed to a single line.
+"""
+
+DEFAULT_RENDER_BUDGET = 0.25
+"""
+Default maximum fraction of time spent drawing CLI output. On slow terminals
+(eg over SSH), the frame rate is lowered to stay within this budget.
+"""
+
+RENDER_BUDGET_ENV_VAR = "MARKTEN_RENDER_BUDGET"
+"""Environment variable to determine the render budget from"""
+
+LOG_TAIL_LINES = 1000
+"""
+Number of lines of each action's output to keep in memory. Earlier lines are
+moved to a temporary file.
+"""
+
 VERBOSE_ENV_VAR = "MARKTEN_VERBOSITY"
 """Environment variable to determine verbosity from"""
 
+JOBS_ENV_VAR = "MARKTEN_JOBS"
+"""
+Environment variable to determine the number of recipe permutations to run
+concurrently
+"""
+
+RESUME_ENV_VAR = "MARKTEN_RESUME"
+"""
+Environment variable to determine whether to skip recipe permutations which
+already succeeded in a previous run
+"""
+
+OUTPUT_ENV_VAR = "MARKTEN_OUTPUT"
+"""
+Environment variable to determine the output format: `"rich"` for live
+terminal output, `"json"` for a stream of JSON events, or `"auto"` to choose
+based on whether output is going to a terminal
+"""
+
+OUTPUT_FORMATS = ("auto", "rich", "json")
+"""Supported output formats"""
+
+TRACE_ENV_VAR = "MARKTEN_TRACE"
+"""
+Environment variable to determine the file to write a trace of each action's
+timing to
+"""
+
+SHARD_ENV_VAR = "MARKTEN_SHARD"
+"""
+Environment variable to determine which shard of the recipe's permutations to
+run, as `"i/n"`
+"""
+
 INTERRUPT_SPEED = timedelta(seconds=5)
 """
 How quickly will a second press of Ctrl+C (KeyboardInterrupt) exit the entire
 program?
 """
+
+DAEMON_ENV_VAR = "MARKTEN_DAEMON"
+"""
+Environment variable to determine whether to run recipes using the Markten
+daemon, if it is running
+"""
+
+SOCKET_ENV_VAR = "MARKTEN_SOCKET"
+"""Environment variable to determine the path of the Markten daemon's socket"""
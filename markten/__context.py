@@ -6,12 +6,47 @@ Definition for the `MarktenContext` singleton.
 import logging
 from os import environ
 
-from markten.__consts import VERBOSE_ENV_VAR
+from markten.__consts import (
+    DEFAULT_RENDER_BUDGET,
+    JOBS_ENV_VAR,
+    OUTPUT_ENV_VAR,
+    OUTPUT_FORMATS,
+    RENDER_BUDGET_ENV_VAR,
+    RESUME_ENV_VAR,
+    SHARD_ENV_VAR,
+    TRACE_ENV_VAR,
+    VERBOSE_ENV_VAR,
+)
+
+
+def valid_render_budget(budget: float) -> bool:
+    """Whether the given render budget is within the allowed range"""
+    return 0 < budget <= 1
 
 
 class __MarktenContext:
     def __init__(self) -> None:
         self.__verbosity = int(environ.get(VERBOSE_ENV_VAR, "0"))
+        jobs = environ.get(JOBS_ENV_VAR)
+        self.__jobs = int(jobs) if jobs else None
+        self.__resume = environ.get(RESUME_ENV_VAR, "") not in ("", "0")
+        output = environ.get(OUTPUT_ENV_VAR, "auto")
+        self.__output = output if output in OUTPUT_FORMATS else "auto"
+        try:
+            render_budget = float(
+                environ.get(RENDER_BUDGET_ENV_VAR) or DEFAULT_RENDER_BUDGET
+            )
+        except ValueError:
+            render_budget = DEFAULT_RENDER_BUDGET
+        # Same range as the setter, since the CLI option isn't checked when
+        # a recipe is run directly
+        self.__render_budget = (
+            render_budget
+            if valid_render_budget(render_budget)
+            else DEFAULT_RENDER_BUDGET
+        )
+        self.__trace = environ.get(TRACE_ENV_VAR) or None
+        self.__shard = environ.get(SHARD_ENV_VAR) or None
 
     @property
     def verbosity(self) -> int:
@@ -32,6 +67,99 @@ class __MarktenContext:
         }
         logging.basicConfig(level=mappings.get(new_verbosity, "DEBUG"))
 
+    @property
+    def jobs(self) -> int | None:
+        """
+        The number of recipe permutations to run concurrently, or `None` if
+        this should be determined by the recipe.
+        """
+        return self.__jobs
+
+    @jobs.setter
+    def jobs(self, new_jobs: int | None) -> None:
+        self.__jobs = new_jobs
+        if new_jobs is None:
+            environ.pop(JOBS_ENV_VAR, None)
+        else:
+            environ[JOBS_ENV_VAR] = str(new_jobs)
+
+    @property
+    def resume(self) -> bool:
+        """
+        Whether to skip recipe permutations which succeeded in a previous run.
+        """
+        return self.__resume
+
+    @resume.setter
+    def resume(self, new_resume: bool) -> None:
+        self.__resume = new_resume
+        environ[RESUME_ENV_VAR] = "1" if new_resume else "0"
+
+    @property
+    def output(self) -> str:
+        """
+        The format of Markten's output: `"rich"`, `"json"` or `"auto"`.
+        """
+        return self.__output
+
+    @output.setter
+    def output(self, new_output: str) -> None:
+        if new_output not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{new_output}'")
+        self.__output = new_output
+        environ[OUTPUT_ENV_VAR] = new_output
+
+    @property
+    def render_budget(self) -> float:
+        """
+        The maximum fraction of time to spend drawing CLI output, between 0
+        and 1.
+        """
+        return self.__render_budget
+
+    @render_budget.setter
+    def render_budget(self, new_budget: float) -> None:
+        if not valid_render_budget(new_budget):
+            raise ValueError("Render budget must be between 0 and 1")
+        self.__render_budget = new_budget
+        environ[RENDER_BUDGET_ENV_VAR] = str(new_budget)
+
+    @property
+    def trace(self) -> str | None:
+        """
+        The file to write a trace of each action's timing to, or `None` to
+        not record a trace.
+        """
+        return self.__trace
+
+    @trace.setter
+    def trace(self, new_trace: str | None) -> None:
+        self.__trace = new_trace
+        if new_trace is None:
+            environ.pop(TRACE_ENV_VAR, None)
+        else:
+            environ[TRACE_ENV_VAR] = new_trace
+
+    @property
+    def shard(self) -> str | None:
+        """
+        The shard of the recipe's permutations to run, as `"i/n"`, or `None`
+        to run all permutations.
+        """
+        return self.__shard
+
+    @shard.setter
+    def shard(self, new_shard: str | None) -> None:
+        if new_shard is None:
+            self.__shard = None
+            environ.pop(SHARD_ENV_VAR, None)
+        else:
+            # Imported when needed, to speed up start-up
+            from markten.__shard import Shard
+
+            self.__shard = str(Shard.parse(new_shard))
+            environ[SHARD_ENV_VAR] = self.__shard
+
 
 __ctx = __MarktenContext()
 
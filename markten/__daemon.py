@@ -0,0 +1,219 @@
+"""
+# Markten / Daemon
+
+A daemon which keeps the interpreter warm between runs of recipes, so that
+the cost of starting Python and importing Markten (and its dependencies) is
+only paid once.
+
+The daemon listens on a Unix socket. For each run, the client sends its
+standard streams (as file descriptors), working directory, environment and
+arguments. The daemon forks a child process with these, which runs the recipe
+as `markten` would, writing its output directly to the client's terminal.
+The child reports its exit code to the client before exiting.
+
+Since each run is in a forked process, runs can't affect each other, or the
+daemon itself.
+"""
+
+import json
+import os
+import signal
+import socket
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+from . import __consts as consts
+
+WARM_MODULES = [
+    "asyncio",
+    "aiofiles",
+    "humanize",
+    "platformdirs",
+    "rich.live",
+    "rich.traceback",
+    "markten.__recipe",
+    "markten.actions.editor",
+    "markten.actions.email",
+    "markten.actions.fs",
+    "markten.actions.git",
+    "markten.actions.process",
+    "markten.actions.time",
+    "markten.actions.webbrowser",
+    "markten.parameters",
+]
+"""Modules imported by the daemon before it accepts runs"""
+
+
+def default_socket_path() -> Path:
+    """Returns the path of the daemon's socket, which can be overridden using
+    the `MARKTEN_SOCKET` environment variable.
+    """
+    if path := os.environ.get(consts.SOCKET_ENV_VAR):
+        return Path(path)
+    import warnings
+
+    from platformdirs import user_runtime_dir
+
+    with warnings.catch_warnings():
+        # Falling back to a temporary directory is fine for the socket
+        warnings.simplefilter("ignore")
+        runtime_dir = user_runtime_dir("markten")
+    return Path(runtime_dir) / "daemon.sock"
+
+
+def send_message(conn: socket.socket, **message: Any) -> None:
+    """Send a message to the other end of the connection, as a line of JSON"""
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def serve(socket_path: Path | None = None) -> None:
+    """Run the daemon until it is interrupted.
+
+    Parameters
+    ----------
+    socket_path : Path | None, optional
+        Path of the socket to listen on, by default `default_socket_path()`.
+    """
+    if sys.platform == "win32":
+        raise NotImplementedError("The Markten daemon requires a Unix system")
+    if socket_path is None:
+        socket_path = default_socket_path()
+
+    import importlib
+
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+    socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # Remove the socket of a previous daemon which didn't exit cleanly
+    socket_path.unlink(missing_ok=True)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(socket_path))
+    # Runs execute arbitrary code, so only we may connect
+    socket_path.chmod(0o600)
+    listener.listen()
+    # Children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # Clean up the socket when terminated
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Markten daemon listening on {socket_path}", flush=True)
+    try:
+        while True:
+            conn, _ = listener.accept()
+            with conn:
+                handle_connection(conn, listener)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        socket_path.unlink(missing_ok=True)
+
+
+def handle_connection(conn: socket.socket, listener: socket.socket) -> None:
+    """Receive a run from the given connection, and start it in a child
+    process.
+    """
+    _, fds, _, _ = socket.recv_fds(conn, 1, 3)
+    try:
+        line = conn.makefile("rb").readline()
+        if len(fds) != 3 or not line:
+            # Not a well-behaved client
+            return
+        request = json.loads(line)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            listener.close()
+            run_request(conn, fds, request)
+    finally:
+        # The child has its own copies
+        for fd in fds:
+            os.close(fd)
+
+
+def run_request(
+    conn: socket.socket,
+    fds: list[int],
+    request: dict[str, Any],
+) -> None:
+    """Run a recipe in a forked child process, then exit."""
+    code = 1
+    try:
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        import rich
+
+        # Detect the capabilities of the client's terminal
+        rich.reconfigure()
+        send_message(conn, pid=os.getpid())
+
+        from .__main__ import main
+
+        try:
+            main.main(request["args"], prog_name="markten")
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else int(bool(e.code))
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            send_message(conn, exit=code)
+        finally:
+            os._exit(code)
+
+
+def submit(socket_path: Path, args: Sequence[str]) -> int | None:
+    """Run markten with the given arguments using the daemon.
+
+    Parameters
+    ----------
+    socket_path : Path
+        Path of the daemon's socket.
+    args : Sequence[str]
+        Arguments for markten, such as the recipe file, and its arguments.
+
+    Returns
+    -------
+    int | None
+        Exit code of the run, or `None` if the daemon isn't running.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(socket_path))
+    except OSError:
+        conn.close()
+        return None
+    env = dict(os.environ)
+    env.pop(consts.DAEMON_ENV_VAR, None)
+    with conn, conn.makefile("rb") as responses:
+        socket.send_fds(conn, [b"\0"], [0, 1, 2])
+        send_message(conn, args=list(args), cwd=os.getcwd(), env=env)
+        pid: int | None = None
+
+        def forward(signum: int, frame: object) -> None:
+            if pid is not None:
+                os.kill(pid, signum)
+
+        previous = signal.signal(signal.SIGINT, forward)
+        try:
+            for line in responses:
+                response = json.loads(line)
+                if "pid" in response:
+                    pid = response["pid"]
+                elif "exit" in response:
+                    return response["exit"]
+        finally:
+            signal.signal(signal.SIGINT, previous)
+    # Run ended without reporting its exit code, eg if it was killed
+    return 1
@@ -0,0 +1,139 @@
+"""
+# Markten / Events
+
+Headless output, which reports the progress of a recipe as a stream of JSON
+objects (one per line), rather than drawing it to the terminal.
+
+This is used when output isn't going to a terminal (eg when running recipes
+from `cron`), or when requested using the `--output json` CLI option.
+"""
+
+import asyncio
+import json
+import traceback
+from datetime import datetime
+from typing import IO, Any
+
+from markten.__action_session import ActionInfo, ActionSession, ActionStatus
+from markten.__context import get_context
+from markten.__utils import console
+
+
+def is_headless() -> bool:
+    """Returns whether output should be given as JSON events."""
+    output = get_context().output
+    if output == "auto":
+        return not console.is_terminal
+    return output == "json"
+
+
+def emit(file: IO[str], event: str, **data: Any) -> None:
+    """Write an event to the given file, as a single line of JSON.
+
+    Parameters
+    ----------
+    file : IO[str]
+        File to write to.
+    event : str
+        Kind of event, eg `"action_start"`.
+    **data : Any
+        Data for the event. Values which can't be represented in JSON are
+        converted to strings.
+    """
+    entry = {"event": event, "time": datetime.now().isoformat(), **data}
+    file.write(json.dumps(entry, default=str) + "\n")
+    file.flush()
+
+
+def emit_exception(file: IO[str], title: str) -> None:
+    """Write an event describing the active exception."""
+    emit(file, "error", message=title, traceback=traceback.format_exc())
+
+
+class EventStreamManager:
+    """
+    Headless equivalent of `CliManager`, which reports changes to an action
+    and its children as events.
+
+    Changes are found by comparing the action's current info to the info
+    reported previously. Since info is reused for unchanged actions, unchanged
+    subtrees are skipped without being inspected.
+    """
+
+    def __init__(self, file: IO[str]) -> None:
+        self.__file = file
+        self.__should_stop = False
+        self.__changed = asyncio.Event()
+        """Set when the action changes, or when the manager should stop"""
+        self.__reported: dict[tuple[int, ...], ActionInfo] = {}
+        """Most recently reported info for each action, by its position"""
+        self.__started: dict[tuple[int, ...], datetime] = {}
+        """Time at which each action was first reported"""
+
+    def stop(self) -> None:
+        self.__should_stop = True
+        self.__changed.set()
+
+    async def run(self, action: ActionSession) -> None:
+        """Report changes to the given action until stopped."""
+        action.add_change_listener(self.__changed.set)
+        try:
+            while True:
+                self.__changed.clear()
+                self.__report(action.display(), (), [])
+                if self.__should_stop:
+                    return
+                await self.__changed.wait()
+        finally:
+            action.remove_change_listener(self.__changed.set)
+
+    def __report(
+        self,
+        info: ActionInfo,
+        position: tuple[int, ...],
+        parent_path: list[str],
+    ) -> None:
+        """Report changes to the given action and its children."""
+        previous = self.__reported.get(position)
+        if previous is info:
+            return
+        self.__reported[position] = info
+        path = [*parent_path, info.name]
+        now = datetime.now()
+
+        if previous is None:
+            self.__started[position] = now
+            emit(self.__file, "action_start", action=path)
+        if info.message and (
+            previous is None or info.message != previous.message
+        ):
+            emit(self.__file, "message", action=path, message=info.message)
+
+        # Lines which weren't already reported
+        total = info.omitted_output + len(info.output)
+        reported = (
+            previous.omitted_output + len(previous.output) if previous else 0
+        )
+        if reported < info.omitted_output and info.log is not None:
+            # Some lines were spilled to disk since the previous report
+            new_lines = info.log.read_lines(reported, total)
+        else:
+            new_lines = info.output[
+                max(len(info.output) - total + reported, 0) :
+            ]
+        for line in new_lines:
+            emit(self.__file, "log", action=path, line=line)
+
+        for i, child in enumerate(info.children):
+            self.__report(child, (*position, i), path)
+
+        if info.status != ActionStatus.Running and (
+            previous is None or previous.status != info.status
+        ):
+            emit(
+                self.__file,
+                "action_end",
+                action=path,
+                status=info.status.name.lower(),
+                duration=(now - self.__started[position]).total_seconds(),
+            )
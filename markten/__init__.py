@@ -4,15 +4,32 @@
 A manual marking automation framework.
 """
 
-# Intentionally disable import sorting so that we don't get circular import
-# annoyance for importing common types such as `ActionSession`
-from .__action_session import ActionSession  # noqa: I001
-from .__consts import VERSION as __version__
-from .__context import get_context
-from .__recipe import Recipe
-from .actions import MarktenAction
+# Everything is imported lazily (when first accessed), so that starting
+# Markten doesn't require importing modules which a recipe doesn't use.
+from typing import TYPE_CHECKING
+
+from .__lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from . import actions, parameters
+    from .__action_session import ActionSession
+    from .__consts import VERSION as __version__
+    from .__context import get_context
+    from .__recipe import Recipe
+    from .actions import MarktenAction
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "ActionSession": (".__action_session", "ActionSession"),
+        "MarktenAction": (".actions.__action", "MarktenAction"),
+        "Recipe": (".__recipe", "Recipe"),
+        "get_context": (".__context", "get_context"),
+        "__version__": (".__consts", "VERSION"),
+    },
+    {"actions", "parameters"},
+)
 
-from . import actions, parameters
 
 __all__ = [
     "ActionSession",
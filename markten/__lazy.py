@@ -0,0 +1,66 @@
+"""
+# Markten / Lazy
+
+Lazy importing of a module's attributes, so that starting Markten doesn't
+require importing modules which a recipe doesn't use.
+"""
+
+import sys
+from collections.abc import Callable, Iterable, Mapping
+from importlib import import_module
+from typing import Any
+
+
+def lazy_getattr(
+    module_name: str,
+    attributes: Mapping[str, tuple[str, str]] | None = None,
+    modules: Iterable[str] = (),
+    *,
+    computed: Mapping[str, Callable[[], Any]] | None = None,
+) -> Callable[[str], Any]:
+    """Returns a module-level `__getattr__` function (see PEP 562), which
+    produces the given attributes when they are first accessed.
+
+    Each value is stored on the module, so that it is only produced once.
+
+    ```py
+    __getattr__ = lazy_getattr(
+        __name__,
+        {"Recipe": (".__recipe", "Recipe")},
+        {"actions"},
+    )
+    ```
+
+    Parameters
+    ----------
+    module_name : str
+        Name of the module, ie its `__name__`.
+    attributes : Mapping[str, tuple[str, str]], optional
+        Module (which may be relative to this module) and name within it of
+        each attribute to import.
+    modules : Iterable[str], optional
+        Names of submodules to import.
+    computed : Mapping[str, Callable[[], Any]], optional
+        Functions to compute the values of other attributes, eg if they are
+        slow to determine.
+    """
+    attributes = dict(attributes or {})
+    modules = set(modules)
+    computed = dict(computed or {})
+
+    def __getattr__(name: str) -> Any:
+        if name in attributes:
+            module, attribute = attributes[name]
+            value = getattr(import_module(module, module_name), attribute)
+        elif name in modules:
+            value = import_module(f".{name}", module_name)
+        elif name in computed:
+            value = computed[name]()
+        else:
+            raise AttributeError(
+                f"module {module_name!r} has no attribute {name!r}"
+            )
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
@@ -6,29 +6,61 @@ Programmatic entrypoint to Markten, allowing it to be run as a script.
 
 import runpy
 import sys
+from pathlib import Path
+from typing import Any
 
 import click
-import rich
-from rich.panel import Panel
 
 from markten.__context import get_context
 
 from . import __consts as consts
-from . import __utils as utils
 
-console = rich.get_console()
-
-title = f"Markten - v{consts.VERSION}"
+# Other modules (including `rich`) are imported only when needed, so that
+# options such as `--version` are quick
 
 help_text = f"""
 ✅  Assess your students' work with all of the [green]delight[/] and none of the [red]tedium[/]
 
 Usage: [bold magenta]markten [OPTIONS] RECIPE [ARGS]...[/]
+       [bold magenta]markten serve [--socket PATH][/]
 
 Options:
   [yellow]-v, --verbose[/]  Increase the verbosity of markten's output.
                  You can also set this using '[yellow]{consts.VERBOSE_ENV_VAR}[/]' environment variable.
 
+  [yellow]-j, --jobs N[/]   Run up to N recipe permutations concurrently.
+                 You can also set this using '[yellow]{consts.JOBS_ENV_VAR}[/]' environment variable.
+
+  [yellow]--resume[/]       Skip recipe permutations which already succeeded, according to
+                 the journal stored next to the recipe file. The journal is
+                 updated as the run progresses, so that it can also be resumed.
+
+  [yellow]--output FORMAT[/]
+                 Output format: '[yellow]rich[/]' for a live display, '[yellow]json[/]' for a stream of
+                 JSON events (one per line), or '[yellow]auto[/]' (the default) to use '[yellow]json[/]'
+                 when output isn't a terminal.
+                 You can also set this using '[yellow]{consts.OUTPUT_ENV_VAR}[/]' environment variable.
+
+  [yellow]--render-budget FRACTION[/]
+                 Maximum fraction of time to spend drawing output (default {consts.DEFAULT_RENDER_BUDGET}).
+                 Lower this if Markten is slow over SSH.
+                 You can also set this using '[yellow]{consts.RENDER_BUDGET_ENV_VAR}[/]' environment variable.
+
+  [yellow]--trace FILE[/]   Write the timing of each action to FILE, in the Chrome trace format.
+                 This can be viewed using Perfetto ([cyan]https://ui.perfetto.dev[/]).
+                 You can also set this using '[yellow]{consts.TRACE_ENV_VAR}[/]' environment variable.
+
+  [yellow]--shard I/N[/]    Run only shard I of N of the recipe's permutations, so that a recipe can be
+                 split between several processes or machines, without any overlap.
+                 Every shard must be given the same parameters.
+                 You can also set this using '[yellow]{consts.SHARD_ENV_VAR}[/]' environment variable.
+
+  [yellow]--daemon[/]       Run the recipe using the Markten daemon (started with '[yellow]markten serve[/]'),
+                 which avoids the cost of starting Python and importing Markten for each run.
+                 If the daemon isn't running, the recipe is run normally.
+                 You can also set this using '[yellow]{consts.DAEMON_ENV_VAR}[/]' environment variable.
+                 The daemon's socket can be set using '[yellow]{consts.SOCKET_ENV_VAR}[/]' environment variable.
+
   [yellow]--version[/]      Show the version and exit.
   [yellow]--help[/]         Show this message and exit.
 
@@ -46,11 +78,53 @@ View the documentation: [cyan]https://github.com/COMP1010UNSW/Markten[/]
 def show_help(ctx: click.Context, param: click.Option, value: bool):
     if not value or ctx.resilient_parsing:
         return
-    console.print(Panel(help_text, title=title, border_style="blue"))
+    import rich
+    from rich.panel import Panel
+
+    title = f"Markten - v{consts.VERSION}"
+    rich.print(Panel(help_text, title=title, border_style="blue"))
     ctx.exit()
 
 
-@click.command("markten", help=help_text)
+def check_shard(
+    ctx: click.Context,
+    param: click.Option,
+    value: str | None,
+) -> str | None:
+    if value is None:
+        return None
+    from markten.__shard import Shard
+
+    try:
+        return str(Shard.parse(value))
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
+class MarktenCommand(click.Command):
+    """
+    The `markten` command, which also accepts the name of a sub-command (eg
+    `markten serve`) in place of a recipe file.
+    """
+
+    subcommands: dict[str, click.Command] = {}
+
+    def main(  # type: ignore[override]
+        self,
+        args: list[str] | None = None,
+        prog_name: str | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        args = list(sys.argv[1:] if args is None else args)
+        if args and args[0] in self.subcommands:
+            name = args.pop(0)
+            return self.subcommands[name].main(
+                args, f"{prog_name or 'markten'} {name}", **kwargs
+            )
+        return super().main(args, prog_name, **kwargs)
+
+
+@click.command("markten", cls=MarktenCommand, help=help_text)
 @click.option(
     "--help",
     is_flag=True,
@@ -59,21 +133,109 @@ def show_help(ctx: click.Context, param: click.Option, value: bool):
     is_eager=True,
 )
 @click.option("-v", "--verbose", count=True, envvar=consts.VERBOSE_ENV_VAR)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    envvar=consts.JOBS_ENV_VAR,
+)
+@click.option("--resume", is_flag=True, envvar=consts.RESUME_ENV_VAR)
+@click.option(
+    "--output",
+    type=click.Choice(consts.OUTPUT_FORMATS),
+    default="auto",
+    envvar=consts.OUTPUT_ENV_VAR,
+)
+@click.option(
+    "--render-budget",
+    type=click.FloatRange(0, 1, min_open=True),
+    default=consts.DEFAULT_RENDER_BUDGET,
+    envvar=consts.RENDER_BUDGET_ENV_VAR,
+)
+@click.option(
+    "--trace",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    envvar=consts.TRACE_ENV_VAR,
+)
+@click.option(
+    "--shard",
+    default=None,
+    envvar=consts.SHARD_ENV_VAR,
+    callback=check_shard,
+)
+@click.option("--daemon", is_flag=True, envvar=consts.DAEMON_ENV_VAR)
 @click.argument("recipe", type=click.Path(exists=True, readable=True))
 @click.argument("args", nargs=-1)
-@click.version_option(consts.VERSION)
-def main(recipe: str, args: tuple[str, ...], verbose: int = 0):
+# Version is looked up only when requested, since it's slow to determine
+@click.version_option(package_name="markten")
+def main(
+    recipe: str,
+    args: tuple[str, ...],
+    verbose: int = 0,
+    jobs: int | None = None,
+    resume: bool = False,
+    output: str = "auto",
+    render_budget: float = consts.DEFAULT_RENDER_BUDGET,
+    trace: str | None = None,
+    shard: str | None = None,
+    daemon: bool = False,
+):
     # Set verbosity
     get_context().verbosity = verbose
+    # Set concurrency
+    get_context().jobs = jobs
+    # Set whether to resume previous run
+    get_context().resume = resume
+    # Set output format
+    get_context().output = output
+    # Set how much time can be spent drawing output
+    get_context().render_budget = render_budget
+    # Set where to write a trace of action timing
+    get_context().trace = trace
+    # Set which shard of permutations to run
+    get_context().shard = shard
+    if daemon:
+        from .__daemon import default_socket_path, submit
+
+        # Options are passed to the daemon in the environment, since they
+        # were stored there by the context
+        code = submit(default_socket_path(), [recipe, *args])
+        if code is not None:
+            sys.exit(code)
     # replace argv
     sys.argv = [sys.argv[0], *args]
     try:
         # Then run code as main
         _ = runpy.run_path(recipe, {}, "__main__")
     except Exception as e:
+        from . import __utils as utils
+
         utils.print_exception(str(e), get_context().verbosity)
         exit(1)
 
 
+@click.command("serve")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    envvar=consts.SOCKET_ENV_VAR,
+    help="Path of the socket to listen on.",
+)
+def serve(socket_path: Path | None = None):
+    """Keep Markten loaded, so that recipes run using `markten --daemon` start
+    instantly.
+    """
+    from .__daemon import serve as run_daemon
+
+    run_daemon(socket_path)
+
+
+MarktenCommand.subcommands["serve"] = serve
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+"""
+# Markten / Recipe / Binding
+
+Precompiled plans for passing values from a recipe's context to its actions.
+"""
+
+import inspect
+from collections.abc import Awaitable, Mapping
+from types import UnionType
+from typing import Any, TypeVar, Union, get_args, get_origin
+
+from typing_extensions import override
+
+from markten.__action_session import ActionSession
+from markten.__recipe.hook import exec_hook
+from markten.__utils import friendly_name
+from markten.actions.__action import MarktenAction
+
+
+class ActionBinding:
+    """
+    Plan for calling an action with values from the context.
+
+    Inspecting an action's signature is comparatively slow, so this is done
+    once when the action is registered, rather than every time it is called.
+    """
+
+    def __init__(self, fn: MarktenAction) -> None:
+        """Compile a binding plan for the given action.
+
+        Parameters
+        ----------
+        fn : MarktenAction
+            Action to compile the plan for.
+
+        Raises
+        ------
+        ValueError
+            The action's signature doesn't accept an `ActionSession`, or has
+            parameters which cannot be given as keyword arguments.
+        """
+        self.fn = fn
+        """Action to call"""
+
+        # Named actions forward their context to their inner action, so we
+        # only need to give them what the inner action requires.
+        if isinstance(fn, NamedAction):
+            inner = fn.binding
+            self.__names: tuple[str, ...] = inner.__names
+            self.__required: frozenset[str] = inner.__required
+            self.__accepts_kwargs: bool = inner.__accepts_kwargs
+            self.__outputs: frozenset[str] | None = frozenset([fn.name])
+            return
+
+        try:
+            signature = inspect.signature(fn)
+        except (TypeError, ValueError) as e:
+            raise ValueError(
+                f"Unable to determine parameters of action "
+                f"'{friendly_name(fn)}'"
+            ) from e
+
+        # First parameter is the `ActionSession`, which is passed
+        # positionally
+        params = list(signature.parameters.values())
+        if params and params[0].kind in (
+            inspect.Parameter.POSITIONAL_ONLY,
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        ):
+            params = params[1:]
+        elif not any(
+            p.kind == inspect.Parameter.VAR_POSITIONAL for p in params
+        ):
+            raise ValueError(
+                f"Action '{friendly_name(fn)}' must accept an "
+                f"`ActionSession` as its first positional parameter"
+            )
+
+        names: list[str] = []
+        required: set[str] = set()
+        accepts_kwargs = False
+        for param in params:
+            if param.kind == inspect.Parameter.VAR_KEYWORD:
+                accepts_kwargs = True
+            elif param.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+            elif param.kind == inspect.Parameter.POSITIONAL_ONLY:
+                if param.default is inspect.Parameter.empty:
+                    raise ValueError(
+                        f"Action '{friendly_name(fn)}' has positional-only "
+                        f"parameter '{param.name}', which cannot be given a "
+                        f"value from the recipe"
+                    )
+            else:
+                names.append(param.name)
+                if param.default is inspect.Parameter.empty:
+                    required.add(param.name)
+
+        self.__names = tuple(names)
+        self.__required = frozenset(required)
+        self.__accepts_kwargs = accepts_kwargs
+        if may_be_mapping(signature.return_annotation):
+            self.__outputs = None
+        else:
+            self.__outputs = frozenset()
+
+    @property
+    def inputs(self) -> frozenset[str] | None:
+        """
+        Names of the context values used by the action, or `None` if it
+        accepts arbitrary keyword arguments, since it may use any value.
+        """
+        if self.__accepts_kwargs:
+            return None
+        return frozenset(self.__names)
+
+    @property
+    def required(self) -> frozenset[str]:
+        """
+        Names of the context values which must be given to the action.
+        """
+        return self.__required
+
+    @property
+    def outputs(self) -> frozenset[str] | None:
+        """
+        Names of the context values produced by the action.
+
+        Named actions produce exactly one value. Other actions only produce
+        values if they return a `dict`, so if the action's return annotation
+        rules this out, it produces nothing. Otherwise, this is `None`, since
+        the values it produces can't be known ahead of time.
+        """
+        return self.__outputs
+
+    def bind(self, context: dict[str, Any]) -> dict[str, Any]:
+        """Select the values from the context to pass to the action as keyword
+        arguments.
+
+        Parameters
+        ----------
+        context : dict[str, Any]
+            Context, including parameters and results of previous actions.
+
+        Returns
+        -------
+        dict[str, Any]
+            Keyword arguments for the action.
+
+        Raises
+        ------
+        TypeError
+            A value required by the action is not present in the context.
+        """
+        if self.__accepts_kwargs:
+            # Pass the full namespace
+            return context
+        kwargs = {
+            name: context[name] for name in self.__names if name in context
+        }
+        if not self.__required <= kwargs.keys():
+            missing = sorted(self.__required - kwargs.keys())
+            raise TypeError(
+                f"Action '{friendly_name(self.fn)}' requires values "
+                f"{missing}, which were not given by any parameter or earlier "
+                f"step"
+            )
+        return kwargs
+
+
+class NamedAction:
+    """
+    An action which runs another action, producing a dictionary which maps the
+    given name to the result of that action.
+    """
+
+    def __init__(self, name: str, fn: MarktenAction) -> None:
+        self.name = name
+        """Name under which the result is stored"""
+        self.binding = ActionBinding(fn)
+        """Binding plan for the action to run"""
+
+    async def __call__(self, task: ActionSession, **kwargs: Any) -> dict:
+        result = await call_action_with_context(self.binding, kwargs, task)
+        return {self.name: result}
+
+    @override
+    def __str__(self) -> str:
+        return friendly_name(self.binding.fn)
+
+
+async def call_action_with_context(
+    binding: ActionBinding,
+    context: dict[str, Any],
+    action: ActionSession,
+) -> Any:
+    """Execute an action function, passing any required parameters as kwargs.
+
+    Parameters
+    ----------
+    binding : ActionBinding
+        Binding plan of the action to call.
+    context : dict[str, Any]
+        Context, including parameters and results of previous actions.
+    action : ActionSession
+        Action session, used to update status and provide logging.
+
+    Returns
+    -------
+    Any
+        Return of that function, given its required parameters.
+    """
+    try:
+        ret = await binding.fn(action, **binding.bind(context))
+        # Succeed if not done already
+        if not action.is_resolved():
+            action.succeed()
+        return ret
+    except BaseException as e:
+        action.fail(e)
+        for abort_hook in action.get_abort_hooks():
+            await exec_hook(abort_hook, e)
+        raise
+
+
+def may_be_mapping(annotation: Any) -> bool:
+    """Returns whether a return annotation could describe a mapping.
+
+    Awaitables (such as the coroutine returned by a synchronous function
+    which wraps an async action) are described by the type they resolve to.
+    Annotations which can't be understood may describe a mapping.
+    """
+    try:
+        if annotation is None or annotation is type(None):
+            return False
+        if annotation in (inspect.Signature.empty, Any) or isinstance(
+            annotation, str | TypeVar
+        ):
+            return True
+        args = get_args(annotation)
+        if (
+            isinstance(annotation, UnionType)
+            or get_origin(annotation) is Union
+        ):
+            return any(may_be_mapping(a) for a in args)
+        origin = get_origin(annotation) or annotation
+        if not isinstance(origin, type):
+            return True
+        if issubclass(origin, Awaitable) and not issubclass(origin, Mapping):
+            # `Awaitable[T]` and `Coroutine[Y, S, T]` resolve to `T`
+            return may_be_mapping(args[-1]) if args else True
+        return issubclass(origin, Mapping) or issubclass(Mapping, origin)
+    except Exception:
+        return True
@@ -0,0 +1,103 @@
+"""
+# Markten / Recipe / Journal
+
+Persistent record of the permutations of a recipe which have been run, so that
+an interrupted run can be resumed.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint(params: dict[str, Any]) -> str:
+    """Produce a stable fingerprint for the given permutation of parameters.
+
+    Parameter values are identified by their `repr`, so values of types which
+    don't have a meaningful `repr` won't produce stable fingerprints.
+    """
+    data = json.dumps(
+        {name: repr(value) for name, value in params.items()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class RunJournal:
+    """
+    An append-only journal of recipe permutations, stored as JSON lines.
+
+    Each line records the outcome of running a single permutation.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        """Path to journal file"""
+
+    @staticmethod
+    def for_recipe(recipe_file: str | Path) -> "RunJournal":
+        """Return the journal stored next to the given recipe file."""
+        recipe = Path(recipe_file)
+        return RunJournal(recipe.with_name(f"{recipe.stem}.journal.jsonl"))
+
+    def succeeded(self) -> set[str]:
+        """Return the fingerprints of all permutations whose most-recent run
+        succeeded.
+        """
+        statuses: dict[str, str] = {}
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        statuses[entry["fingerprint"]] = entry["status"]
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        # Probably a partially-written line from a run which
+                        # was killed
+                        log.warning(f"Ignoring malformed journal entry {line}")
+        except FileNotFoundError:
+            return set()
+        return {fp for fp, status in statuses.items() if status == "success"}
+
+    def record(
+        self,
+        params: dict[str, Any],
+        status: str,
+        duration: float,
+        steps: list[tuple[str, float]],
+    ) -> None:
+        """Append the outcome of a permutation to the journal.
+
+        Parameters
+        ----------
+        params : dict[str, Any]
+            Parameters of the permutation.
+        status : str
+            Outcome of the permutation: `"success"`, `"failure"` or
+            `"interrupted"`.
+        duration : float
+            Duration of the permutation, in seconds.
+        steps : list[tuple[str, float]]
+            Name and duration in seconds of each step that completed.
+        """
+        entry = {
+            "fingerprint": fingerprint(params),
+            "time": datetime.now().isoformat(),
+            "params": {name: str(value) for name, value in params.items()},
+            "status": status,
+            "duration": duration,
+            "steps": [
+                {"name": name, "duration": step_duration}
+                for name, step_duration in steps
+            ],
+        }
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            log.exception(f"Unable to write to journal {self.path}")
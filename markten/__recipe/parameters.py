@@ -4,18 +4,134 @@
 Parameter manager for Markten
 """
 
-from collections.abc import Iterable, Iterator, Mapping
+import math
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
 from typing import Any
 
+from markten.__recipe.journal import fingerprint
+from markten.__shard import Shard
+from markten.more_itertools import RegenerateIterable
+
+
+class ParameterAxis:
+    """
+    All values of a single parameter.
+
+    Values are evaluated lazily, and are cached as they are produced, so that
+    the underlying iterable is only evaluated once, even when the parameter's
+    values are used many times (eg because it is nested within another
+    parameter).
+
+    The exception to this is `RegenerateIterable`, which explicitly requests to
+    be re-evaluated each time it is iterated, and so is never cached.
+    """
+
+    def __init__(self, name: str, values: Iterable[Any]) -> None:
+        self.name = name
+        """Name of the parameter"""
+        self.__values = values
+        self.__regenerate = isinstance(values, RegenerateIterable)
+        """Whether values should be regenerated on every iteration"""
+
+        self.__cache: Sequence[Any]
+        """Values produced so far"""
+        self.__iterator: Iterator[Any] | None
+        """Iterator producing remaining values, or `None` once exhausted"""
+        if isinstance(values, Sequence):
+            # Already fully evaluated
+            self.__cache = values
+            self.__iterator = None
+        else:
+            self.__cache = []
+            self.__iterator = iter(values)
+
+    @property
+    def cacheable(self) -> bool:
+        """Whether the values of this parameter are cached"""
+        return not self.__regenerate
+
+    @property
+    def size(self) -> int | None:
+        """
+        Number of values of this parameter, or `None` if that is not known
+        without evaluating it further.
+        """
+        if self.__iterator is None and not self.__regenerate:
+            return len(self.__cache)
+        return None
+
+    def iterate(self, start: int = 0) -> Iterator[Any]:
+        """Iterate over the values of this parameter, beginning at the given
+        index.
+        """
+        if self.__regenerate:
+            for i, value in enumerate(self.__values):
+                if i >= start:
+                    yield value
+            return
+
+        i = start
+        while True:
+            if i < len(self.__cache):
+                yield self.__cache[i]
+                i += 1
+            elif not self.__evaluate_next():
+                return
+
+    def get(self, index: int) -> Any:
+        """Return the value at the given index, evaluating the parameter as
+        far as required.
+
+        Raises
+        ------
+        IndexError
+            The parameter has fewer values than required.
+        """
+        while index >= len(self.__cache):
+            if not self.__evaluate_next():
+                raise IndexError(
+                    f"Parameter '{self.name}' has no value at index {index}"
+                )
+        return self.__cache[index]
+
+    def evaluate(self) -> int:
+        """Evaluate all values of this parameter, returning how many there
+        are.
+        """
+        while self.__evaluate_next():
+            pass
+        return len(self.__cache)
+
+    def __evaluate_next(self) -> bool:
+        """Evaluate and cache the next value, returning whether there was
+        one.
+        """
+        if self.__iterator is None:
+            return False
+        try:
+            value = next(self.__iterator)
+        except StopIteration:
+            self.__iterator = None
+            return False
+        assert isinstance(self.__cache, list)
+        self.__cache.append(value)
+        return True
+
 
 class ParameterManager:
     """
     Collect parameters for a recipe, and then allow for iterating over all
     permutations of those parameters.
+
+    Permutations are ordered such that the first parameter varies the slowest.
+    If the number of values of each parameter can be determined, the number of
+    permutations is given by `len()`, and permutations can be accessed by
+    index.
     """
 
     def __init__(self) -> None:
-        self.__params: dict[str, Iterable[Any]] = {}
+        self.__params: dict[str, ParameterAxis] = {}
 
     def add(self, name: str, values: Iterable[Any]) -> None:
         """Add the given iterable of parameters to the parameter set
@@ -37,42 +153,160 @@ class ParameterManager:
                 f"Cannot add parameter '{name}', as it has already been added"
             )
 
-        self.__params[name] = values
+        self.__params[name] = ParameterAxis(name, values)
+
+    @property
+    def names(self) -> list[str]:
+        """Names of all parameters, in the order they were added."""
+        return list(self.__params.keys())
+
+    @property
+    def size(self) -> int | None:
+        """
+        Number of permutations, or `None` if this is not known without
+        evaluating parameters further.
+        """
+        sizes = [axis.size for axis in self.__params.values()]
+        if any(size is None for size in sizes):
+            return None
+        return math.prod(size for size in sizes if size is not None)
+
+    def __len__(self) -> int:
+        """Number of permutations.
+
+        Raises
+        ------
+        TypeError
+            The number of permutations is not known yet.
+        """
+        size = self.size
+        if size is None:
+            raise TypeError(
+                "The number of permutations cannot be determined without "
+                "evaluating parameters"
+            )
+        return size
+
+    def __getitem__(self, index: int) -> dict[str, Any]:
+        """Return the permutation at the given index.
+
+        All parameters other than the first are fully evaluated in order to
+        do this. The first parameter is only evaluated as far as required.
+
+        Raises
+        ------
+        IndexError
+            There is no permutation at the given index.
+        ValueError
+            Permutations cannot be accessed by index, since a parameter is
+            re-evaluated each time it is used.
+        """
+        if index < 0:
+            raise IndexError("Permutation index cannot be negative")
+        offsets = self.__offsets(index)
+        return {
+            axis.name: axis.get(offset)
+            for axis, offset in zip(
+                self.__params.values(), offsets, strict=True
+            )
+        }
+
+    def iterate(self, start: int = 0) -> Iterator[dict[str, Any]]:
+        """Iterate over all permutations, beginning at the given index.
+
+        Raises
+        ------
+        ValueError
+            `start` is non-zero, but permutations cannot be accessed by index,
+            since a parameter is re-evaluated each time it is used.
+        """
+        offsets = (
+            self.__offsets(start) if start else [0] * len(self.__params)
+        )
+        return self.__do_dict_permutations_iterator(
+            list(self.__params.values()), offsets
+        )
+
+    def shard_size(self, shard: Shard) -> int | None:
+        """
+        Number of permutations in the given shard, or `None` if this is not
+        known without evaluating parameters further.
+        """
+        size = self.size
+        return len(shard.range(size)) if size is not None else None
+
+    def iterate_shard(self, shard: Shard) -> Iterator[dict[str, Any]]:
+        """Iterate over the permutations in the given shard.
+
+        If the number of permutations is known, the shard is a contiguous
+        range of permutations, which is accessed by index. Otherwise, all
+        permutations are evaluated, and those whose fingerprint belongs to the
+        shard are produced.
+        """
+        size = self.size
+        if size is None:
+            for permutation in self.iterate():
+                if shard.owns(fingerprint(permutation)):
+                    yield permutation
+        elif indexes := shard.range(size):
+            yield from islice(self.iterate(indexes.start), len(indexes))
+
+    def __offsets(self, index: int) -> list[int]:
+        """
+        Determine the index of each parameter's value in the permutation at the
+        given index.
+        """
+        axes = list(self.__params.values())
+        for axis in axes[1:]:
+            if not axis.cacheable:
+                raise ValueError(
+                    f"Cannot access permutations by index, as parameter "
+                    f"'{axis.name}' is re-evaluated each time it is used"
+                )
+        offsets: list[int] = []
+        for axis in reversed(axes[1:]):
+            size = axis.evaluate()
+            if size == 0:
+                raise IndexError(f"Parameter '{axis.name}' has no values")
+            index, offset = divmod(index, size)
+            offsets.append(offset)
+        if axes:
+            offsets.append(index)
+        elif index:
+            raise IndexError(f"No permutation at index {index}")
+        return list(reversed(offsets))
 
     @staticmethod
     def __do_dict_permutations_iterator(
-        keys: list[str],
-        params_dict: Mapping[str, Iterable[Any]],
+        axes: list[ParameterAxis],
+        offsets: list[int],
     ) -> Iterator[dict[str, Any]]:
         """
-        Recursively iterate over the given keys, producing a dict of values.
+        Recursively iterate over the given parameters, producing a dict of
+        values, beginning at the given offset within each parameter.
         """
-        keys_head = keys[0]
-        # Base case: this is the last remaining key
-        if len(keys) == 1:
-            for value in params_dict[keys_head]:
-                yield {keys_head: value}
+        # Base case: no parameters remain, so there is a single (empty)
+        # permutation
+        if not axes:
+            yield {}
             return
 
-        # Recursive case, other keys remain, and we need to iterate over those
-        # too
-        keys_tail = keys[1:]
-
-        for value in params_dict[keys_head]:
-            # Iterate over remaining keys
+        head, tail = axes[0], axes[1:]
+        for i, value in enumerate(head.iterate(offsets[0])):
+            # After the first value, iterate over all the values of the
+            # remaining parameters
+            tail_offsets = offsets[1:] if i == 0 else [0] * len(tail)
             for (
                 current_params
             ) in ParameterManager.__do_dict_permutations_iterator(
-                keys_tail, params_dict
+                tail, tail_offsets
             ):
                 # Overall keys is the union of the current key-value pair with
                 # the params yielded by the recursion
-                yield {keys_head: value} | current_params
+                yield {head.name: value} | current_params
 
     def __iter__(self) -> Iterator[dict[str, Any]]:
         """
         Iterate over all possible parameter values.
         """
-        return self.__do_dict_permutations_iterator(
-            list(self.__params.keys()), self.__params
-        )
+        return self.iterate()
@@ -6,19 +6,26 @@ Overall recipe class
 
 import asyncio
 import inspect
-from collections.abc import Iterable, Mapping
+from collections import deque
+from collections.abc import Callable, Iterable, Mapping
+from contextlib import AsyncExitStack, nullcontext
 from datetime import datetime
 from typing import Any, ParamSpec, TypeVar, overload
 
-import humanize
 import rich
 
 from markten import __utils as utils
+from markten.__cli import Dashboard
 from markten.__consts import INTERRUPT_SPEED
 from markten.__context import get_context
+from markten.__events import emit, emit_exception, is_headless
+from markten.__recipe.journal import RunJournal, fingerprint
 from markten.__recipe.parameters import ParameterManager
 from markten.__recipe.runner import RecipeRunner
 from markten.__recipe.step import RecipeStep, dict_to_actions
+from markten.__resources import resource_pools
+from markten.__shard import Shard
+from markten.__trace import Tracer
 from markten.actions.__action import MarktenAction
 
 P = ParamSpec("P")
@@ -41,6 +48,10 @@ class Recipe:
         self,
         recipe_name: str,
         verbose: int | None = None,
+        max_concurrency: int | None = None,
+        lookahead: int = 1,
+        infer_dependencies: bool = False,
+        journal: bool | None = None,
     ) -> None:
         """
         Create a Markten Recipe
@@ -56,6 +67,34 @@ class Recipe:
         verbose : int
             Logging verbosity. Higher numbers will produce more-verbose output.
             Defaults to verbosity level set using CLI.
+        max_concurrency : int
+            Maximum number of permutations of the recipe to run at the same
+            time. When more than one permutation is run at once, the output of
+            each permutation is displayed once it completes. Defaults to the
+            number of jobs set using CLI, or 1 if not set.
+        lookahead : int
+            Number of upcoming permutations for which steps registered with
+            `prefetch=True` should be run in the background, by default 1.
+            Note that the parameters of upcoming permutations are evaluated
+            early in order to do this.
+        infer_dependencies : bool
+            Whether to run steps of the recipe concurrently when they don't
+            depend on each other, by default False. A step depends on an
+            earlier step if it uses a value that the earlier step may produce.
+            Values produced by dictionary steps are known ahead of time. Other
+            steps are assumed to produce values unless their return annotation
+            shows that they don't return a `dict`, such as `-> None`.
+        journal : bool | None
+            Whether to record the outcome of each permutation in a journal
+            file stored next to the recipe file. The journal allows for
+            skipping permutations which already succeeded when resuming a
+            recipe. By default, the journal is only used when resuming, so
+            that runs which aren't resumable leave no files behind.
+
+        Raises
+        ------
+        ValueError
+            `max_concurrency` is less than 1, or `lookahead` is negative.
         """
         # Determine caller's module to show in debug info
         # https://stackoverflow.com/a/13699329/6335363
@@ -66,6 +105,23 @@ class Recipe:
         self.__params = ParameterManager()
         self.__steps: list[RecipeStep] = []
         self.__verbose = max(get_context().verbosity, verbose or 0)
+        if get_context().jobs is not None:
+            max_concurrency = get_context().jobs
+        self.__max_concurrency = (
+            max_concurrency if max_concurrency is not None else 1
+        )
+        if self.__max_concurrency < 1:
+            raise ValueError(
+                f"Cannot run {self.__max_concurrency} permutations at once"
+            )
+        if lookahead < 0:
+            raise ValueError(
+                f"Cannot prefetch {lookahead} permutations in advance"
+            )
+        self.__lookahead = lookahead
+        self.__infer_dependencies = infer_dependencies
+        self.__journal = journal
+        self.__resource_pools: dict[str, int] = {}
 
     def parameter(self, name: str, values: Iterable[Any]) -> None:
         """Add a single parameter to the recipe.
@@ -98,21 +154,73 @@ class Recipe:
         for name, values in parameters.items():
             self.__params.add(name, values)
 
+    def resource_pool(self, name: str, capacity: int) -> None:
+        """Limit the number of actions which can use a resource at once.
+
+        Actions which use a resource wait for a slot in its pool, in the order
+        that they requested it. While waiting, the action's position in the
+        queue is shown. Built-in actions use these pools:
+
+        * `"cpu"`: processes run using the `process` actions, unless told
+          otherwise.
+        * `"network"`: `git` actions which communicate with a remote, such as
+          `git.clone` and `git.push`.
+        * `"host:<hostname>"`: `git` actions which communicate with the given
+          host, such as `"host:github.com"`.
+
+        Custom actions can use pools using `markten.actions.using_resources`.
+        Pools which aren't given a capacity are unlimited.
+
+        Parameters
+        ----------
+        name : str
+            Name of the pool. If this ends with `*`, the capacity applies
+            separately to each pool whose name starts with the same prefix,
+            eg `"host:*"` limits the number of actions using each host.
+        capacity : int
+            Maximum number of actions which can use the resource at once.
+
+        Raises
+        ------
+        ValueError
+            `capacity` is less than 1.
+        """
+        if capacity < 1:
+            raise ValueError(
+                f"Resource pool '{name}' must have at least one slot"
+            )
+        self.__resource_pools[name] = capacity
+
     @overload
     def step(
         self,
         action: MarktenAction | dict[str, MarktenAction],
+        /,
         *actions: MarktenAction | dict[str, MarktenAction],
+        prefetch: bool = False,
     ) -> None: ...
 
     @overload
-    def step(self, action: MarktenAction[P, T]) -> MarktenAction[P, T]: ...
+    def step(
+        self,
+        action: MarktenAction[P, T],
+        /,
+        *,
+        prefetch: bool = False,
+    ) -> MarktenAction[P, T]: ...
 
+    @overload
     def step(
         self,
-        action: MarktenAction | dict[str, MarktenAction],
-        *other_actions: MarktenAction | dict[str, MarktenAction],
-    ) -> MarktenAction | None:
+        *,
+        prefetch: bool,
+    ) -> Callable[[MarktenAction[P, T]], MarktenAction[P, T]]: ...
+
+    def step(
+        self,
+        *full_step: MarktenAction | dict[str, MarktenAction],
+        prefetch: bool = False,
+    ) -> MarktenAction | Callable[[MarktenAction], MarktenAction] | None:
         """Add a step to the recipe.
 
         The step can be a variety of types:
@@ -125,15 +233,29 @@ class Recipe:
         If multiple actions are specified as one step, they will be run in
         parallel.
 
+        If no actions are given, a decorator is returned, allowing for usage
+        such as `@recipe.step(prefetch=True)`.
+
         Parameters
         ----------
         *step : MarktenAction | dict[str, MarktenAction]
             Action(s) to be run, as per the documentation above.
+        prefetch : bool, optional
+            Whether this step can be run in the background for upcoming
+            permutations of the recipe while the user is busy with the current
+            permutation, by default False. This is useful for non-interactive
+            steps that take a long time, such as cloning a git repo. Only steps
+            at the start of the recipe can be prefetched, so any steps after a
+            step which isn't prefetchable will run as normal. Prefetched output
+            is shown when the permutation is run.
         """
-        full_step: tuple[MarktenAction | dict[str, MarktenAction], ...] = (
-            action,
-            *other_actions,
-        )
+        if not full_step:
+
+            def decorator(action: MarktenAction) -> MarktenAction:
+                self.step(action, prefetch=prefetch)
+                return action
+
+            return decorator
 
         actions: list[MarktenAction] = []
         for action in full_step:
@@ -143,7 +265,9 @@ class Recipe:
                 actions.extend(dict_to_actions(action))
             else:
                 actions.append(action)
-        self.__steps.append(RecipeStep(len(self.__steps), actions))
+        self.__steps.append(
+            RecipeStep(len(self.__steps), actions, prefetch=prefetch)
+        )
 
         # If used as a decorator, return the function
         if len(full_step) == 1 and callable(full_step[0]):
@@ -151,25 +275,202 @@ class Recipe:
         else:
             return None
 
-    def run(self):
+    def run(
+        self,
+        *,
+        resume: bool = False,
+        shard: str | tuple[int, int] | None = None,
+    ):
         """Run the marking recipe for each permutation given by the generators.
 
         This begins the `asyncio` event loop, and so cannot be called from
         async code.
+
+        Parameters
+        ----------
+        resume : bool, optional
+            Whether to skip permutations which succeeded in a previous run of
+            the recipe, according to its journal, by default False. This is
+            also enabled by the `--resume` CLI flag. Unless disabled, the
+            journal is recorded when resuming, so a run which is started with
+            `resume=True` can itself be resumed.
+        shard : str | tuple[int, int] | None, optional
+            Run only the given shard of the recipe's permutations, given as
+            `"i/n"` or `(i, n)`, to run the i-th of n disjoint parts (numbered
+            from 1), by default None. This allows a recipe to be split between
+            several processes or machines, each of which must be given the
+            same parameters. If not given, this is determined by the `--shard`
+            CLI option.
         """
-        asyncio.run(self.async_run())
+        asyncio.run(self.async_run(resume=resume, shard=shard))
+
+    def __check_step_inputs(self) -> None:
+        """Ensure that every value required by each step is given by a
+        parameter or an earlier step.
 
-    async def async_run(self):
+        Steps whose outputs are unknown could produce any value, so checking
+        stops at the first such step.
+        """
+        available = set(self.__params.names)
+        for step in self.__steps:
+            missing = step.required - available
+            if missing:
+                raise ValueError(
+                    f"Step '{utils.friendly_name(step.name)}' requires values "
+                    f"{sorted(missing)}, which are not given by any parameter "
+                    f"or earlier step"
+                )
+            if step.outputs is None:
+                return
+            available |= step.outputs
+
+    async def async_run(
+        self,
+        *,
+        resume: bool = False,
+        shard: str | tuple[int, int] | None = None,
+    ):
         """Run the marking recipe for each permutation given by the generators.
 
         This function can be used if an `asyncio` event loop is already active.
+
+        Parameters
+        ----------
+        resume : bool, optional
+            Whether to skip permutations which succeeded in a previous run of
+            the recipe, according to its journal, by default False. This is
+            also enabled by the `--resume` CLI flag. Unless disabled, the
+            journal is recorded when resuming, so a run which is started with
+            `resume=True` can itself be resumed.
+        shard : str | tuple[int, int] | None, optional
+            Run only the given shard of the recipe's permutations, given as
+            `"i/n"` or `(i, n)`, to run the i-th of n disjoint parts (numbered
+            from 1), by default None. This allows a recipe to be split between
+            several processes or machines, each of which must be given the
+            same parameters. If not given, this is determined by the `--shard`
+            CLI option.
+
+        Raises
+        ------
+        ValueError
+            A step requires a value which is not given by any parameter or
+            earlier step, or the shard is invalid.
         """
-        utils.recipe_banner(self.__name, self.__file)
+        self.__check_step_inputs()
+        if shard is None:
+            shard = get_context().shard
+        current_shard = Shard.parse(shard) if shard is not None else None
+        if is_headless():
+            emit(
+                console.file,
+                "recipe_start",
+                recipe=self.__name,
+                recipe_file=self.__file,
+                **(
+                    {"shard": str(current_shard)}
+                    if current_shard is not None
+                    else {}
+                ),
+            )
+        else:
+            utils.recipe_banner(self.__name, self.__file)
+            if current_shard is not None:
+                console.print(
+                    f"Running shard {current_shard} of permutations",
+                    highlight=False,
+                )
         recipe_start = datetime.now()
 
         last_interrupt: datetime | None = None
 
-        # For each permutation of parameters, run the recipe
+        permutations = (
+            self.__params.iterate_shard(current_shard)
+            if current_shard is not None
+            else iter(self.__params)
+        )
+        running: set[asyncio.Task[None]] = set()
+        # Permutations whose prefetchable steps are running in the background
+        upcoming: deque[RecipeRunner] = deque()
+        prefetching = any(step.prefetch for step in self.__steps)
+        exhausted = False
+
+        # Permutations which succeeded previously, which should be skipped
+        completed: set[str] = set()
+        resume = resume or get_context().resume
+        journal = (
+            RunJournal.for_recipe(self.__file)
+            if (self.__journal if self.__journal is not None else resume)
+            and self.__file is not None
+            else None
+        )
+        if resume and journal is not None:
+            completed = journal.succeeded()
+        skipped = 0
+
+        # When running multiple permutations at once, show the progress of all
+        # of them on a single display, unless output isn't going to a terminal
+        dashboard = (
+            Dashboard(
+                console,
+                self.__params.shard_size(current_shard)
+                if current_shard is not None
+                else self.__params.size,
+            )
+            if self.__max_concurrency > 1
+            and console.is_terminal
+            and not is_headless()
+            else None
+        )
+
+        trace_file = get_context().trace
+        tracer = Tracer() if trace_file is not None else None
+
+        def new_runner() -> RecipeRunner | None:
+            """Create a runner for the next permutation, if there is one."""
+            nonlocal exhausted, skipped
+            while not exhausted:
+                try:
+                    # Parameters which aren't evaluated yet may prompt the
+                    # user for input, which the dashboard would draw over
+                    with (
+                        dashboard.paused()
+                        if dashboard is not None
+                        and self.__params.size is None
+                        else nullcontext()
+                    ):
+                        permutation = next(permutations)
+                except StopIteration:
+                    exhausted = True
+                    return None
+                if fingerprint(permutation) in completed:
+                    skipped += 1
+                    if dashboard is not None:
+                        dashboard.skip()
+                else:
+                    break
+            else:
+                return None
+            runner = RecipeRunner(
+                permutation,
+                self.__steps,
+                buffer_output=self.__max_concurrency > 1,
+                infer_dependencies=self.__infer_dependencies,
+                journal=journal,
+                dashboard=dashboard,
+                tracer=tracer,
+            )
+            if prefetching:
+                runner.prefetch()
+            return runner
+
+        exit_stack = AsyncExitStack()
+        # Permutations inherit the pools when their tasks are created
+        exit_stack.enter_context(resource_pools(self.__resource_pools))
+        if dashboard is not None:
+            await exit_stack.enter_async_context(dashboard.show())
+
+        # For each permutation of parameters, run the recipe, keeping up to
+        # `max_concurrency` permutations in flight at once.
 
         # Annoyingly, when an iterable throws an exception, its
         # iterator cannot be resumed. As such, this results in
@@ -183,15 +484,35 @@ class Recipe:
         # available for debugging purposes though, so it is ***FAR***
         # from ideal.
         try:
-            for permutation in self.__params:
-                runner = RecipeRunner(permutation, self.__steps)
+            while True:
+                while len(running) < self.__max_concurrency:
+                    runner = upcoming.popleft() if upcoming else new_runner()
+                    if runner is None:
+                        break
+                    running.add(asyncio.create_task(runner.run()))
+
+                # Start prefetching steps for upcoming permutations
+                while prefetching and len(upcoming) < self.__lookahead:
+                    runner = new_runner()
+                    if runner is None:
+                        break
+                    upcoming.append(runner)
+
+                if not running:
+                    break
+
                 try:
-                    # The runner will gracefully handle its own errors.
-                    await runner.run()
+                    # The runners will gracefully handle their own errors.
+                    _, running = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
                 except asyncio.CancelledError:
-                    utils.print_exception(
-                        "Interrupted while running recipe permutation.",
-                        self.__verbose,
+                    # Cancel all in-flight permutations, giving them a chance
+                    # to run their teardown hooks
+                    await cancel_all(running)
+                    running = set()
+                    self.__report_exception(
+                        "Interrupted while running recipe permutation."
                     )
                     # If this is the second recipe to be interrupted in a short
                     # timespan, we should stop entirely.
@@ -199,26 +520,58 @@ class Recipe:
                         last_interrupt is not None
                         and datetime.now() - last_interrupt < INTERRUPT_SPEED
                     ):
-                        print("Exiting due to repeated interruptions.")
+                        if not is_headless():
+                            print("Exiting due to repeated interruptions.")
                         break
-                    else:
+                    elif not is_headless():
                         print("Interrupt repeatedly to quit.")
                         print()
-                        last_interrupt = datetime.now()
+                    last_interrupt = datetime.now()
         except KeyboardInterrupt:
-            utils.print_exception(
-                "Interrupted while evaluating recipe parameters.",
-                self.__verbose,
+            self.__report_exception(
+                "Interrupted while evaluating recipe parameters."
             )
             return
         except Exception:
-            utils.print_exception(
-                "Error while evaluating recipe parameters:",
-                self.__verbose,
+            self.__report_exception(
+                "Error while evaluating recipe parameters:"
             )
             return
+        finally:
+            # If we're exiting early, don't leave permutations running in the
+            # background
+            await cancel_all(running)
+            for runner in upcoming:
+                await runner.abandon()
+            await exit_stack.aclose()
+            if tracer is not None and trace_file is not None:
+                tracer.write(trace_file)
 
         duration = datetime.now() - recipe_start
-        iter_str = humanize.precisedelta(duration, minimum_unit="seconds")
+        if is_headless():
+            emit(
+                console.file,
+                "recipe_end",
+                duration=duration.total_seconds(),
+                skipped=skipped,
+            )
+            return
+        iter_str = utils.format_duration(duration)
         print()
+        if skipped:
+            print(f"Skipped {skipped} permutations which already succeeded")
         print(f"All permutations complete in {iter_str}")
+
+    def __report_exception(self, title: str) -> None:
+        """Report the active exception, as an event if running headless."""
+        if is_headless():
+            emit_exception(console.file, title)
+        else:
+            utils.print_exception(title, self.__verbose)
+
+
+async def cancel_all(tasks: set[asyncio.Task[None]]) -> None:
+    """Cancel the given tasks, and wait for them to finish cancelling."""
+    for task in tasks:
+        task.cancel()
+    _ = await asyncio.gather(*tasks, return_exceptions=True)
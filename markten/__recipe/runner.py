@@ -4,17 +4,23 @@
 Runner for a single permutation of a recipe.
 """
 
+import asyncio
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Any
 
-import humanize
 import rich
+from rich.console import Console
 
 from markten import __utils as utils
-from markten.__action_session import TeardownHook
+from markten.__action_session import ActionSession, TeardownHook
+from markten.__cli import Dashboard, draw_children, show_progress
 from markten.__context import get_context
+from markten.__events import emit, emit_exception, is_headless
 from markten.__recipe.hook import exec_hook
+from markten.__recipe.journal import RunJournal
 from markten.__recipe.step import RecipeStep
+from markten.__trace import Tracer
 
 console = rich.get_console()
 
@@ -24,50 +30,340 @@ class RecipeRunner:
         self,
         params: dict[str, Any],
         steps: list[RecipeStep],
+        *,
+        buffer_output: bool = False,
+        infer_dependencies: bool = False,
+        journal: RunJournal | None = None,
+        dashboard: Dashboard | None = None,
+        tracer: Tracer | None = None,
     ) -> None:
+        """Create a runner for a single permutation of a recipe.
+
+        Parameters
+        ----------
+        params : dict[str, Any]
+            Parameters for this permutation.
+        steps : list[RecipeStep]
+            Steps of the recipe.
+        buffer_output : bool, optional
+            Whether to hold this permutation's output in memory until it
+            finishes, by default False. This should be used when multiple
+            permutations run concurrently, so that their output is not
+            interleaved.
+        infer_dependencies : bool, optional
+            Whether to run steps concurrently when they don't depend on each
+            other's results, by default False.
+        journal : RunJournal | None, optional
+            Journal in which to record the outcome of this permutation, by
+            default None.
+        dashboard : Dashboard | None, optional
+            Dashboard on which to display the progress of this permutation, by
+            default None, meaning that each step displays its own progress.
+        tracer : Tracer | None, optional
+            Tracer with which to record the timing of this permutation's
+            actions, by default None.
+        """
         self.__params = params
         self.__steps = steps
+        self.__infer_dependencies = infer_dependencies
+        self.__journal = journal
+        self.__dashboard = dashboard
+        self.__tracer = tracer
+        self.__name = (
+            ", ".join(f"{k} = {v}" for k, v in params.items()) or "Permutation"
+        )
+        self.__session = (
+            dashboard.add(self.__name) if dashboard is not None else None
+        )
+        """Session under which steps are run, if using a dashboard"""
+        self.__traced: list[ActionSession] = []
+        """Sessions recorded by the tracer, to finish once this permutation
+        completes
+        """
+        if self.__session is not None:
+            self.__trace(self.__session)
+        if dashboard is not None:
+            # Output is only shown if the permutation fails
+            buffer_output = True
+        self.__buffer = utils.BufferedConsole() if buffer_output else None
+        self.__console = (
+            self.__buffer.console if self.__buffer is not None else console
+        )
+
+        # Leading steps which can be run ahead of time
+        num_prefetch = 0
+        while num_prefetch < len(steps) and steps[num_prefetch].prefetch:
+            num_prefetch += 1
+        self.__num_prefetch = num_prefetch
+        self.__prefetch_task: asyncio.Task[None] | None = None
+        self.__prefetch_buffer = utils.BufferedConsole()
+
+        self.__context: dict[str, Any] = {}
+        self.__teardown: list[list[TeardownHook]] = []
+        self.__step_durations: list[tuple[str, float]] = []
+        """Name and duration of each completed step"""
+        self.__status = "interrupted"
+        """Outcome of this permutation"""
+
+    def prefetch(self) -> None:
+        """Begin running this permutation's prefetchable steps in the
+        background.
+
+        Prefetchable steps are the steps at the start of the recipe which were
+        registered with `prefetch=True`. Their output is held until this
+        permutation is run.
+        """
+        if self.__prefetch_task is None and self.__num_prefetch:
+            self.__prefetch_task = asyncio.create_task(
+                self.__run_steps(
+                    self.__steps[: self.__num_prefetch],
+                    self.__prefetch_buffer.console,
+                )
+            )
+
+    async def abandon(self) -> None:
+        """Abandon this permutation without running it, cancelling any
+        prefetched steps and running their teardown hooks.
+        """
+        await self.__cancel_prefetch()
+        await self.__teardown_all()
+        if self.__dashboard is not None and self.__session is not None:
+            self.__dashboard.discard(self.__session)
+        if self.__tracer is not None and self.__session is not None:
+            self.__tracer.discard(self.__session)
 
     async def run(self):
+        if self.__dashboard is not None and self.__session is not None:
+            self.__dashboard.start(self.__session)
+        start = datetime.now()
+        try:
+            await self.__run_and_report()
+        finally:
+            if self.__dashboard is not None and self.__session is not None:
+                duration = utils.format_duration(datetime.now() - start)
+                self.__dashboard.finish(
+                    self.__session,
+                    self.__status == "success",
+                    f"({self.__status} in {duration})",
+                    self.__buffer,
+                )
+            elif self.__buffer is not None:
+                self.__buffer.flush()
+            if self.__tracer is not None:
+                # Only the timing is needed from now on
+                for session in self.__traced:
+                    self.__tracer.finish(session)
+                self.__traced.clear()
+
+    def __trace(self, session: ActionSession) -> None:
+        """Record the given session using the tracer, if there is one"""
+        if self.__tracer is not None:
+            self.__tracer.record(self.__name, session)
+            self.__traced.append(session)
+
+    async def __run_and_report(self):
+        """Run the recipe, reporting its parameters and timing"""
         self.__show_current_params()
         start = datetime.now()
 
+        status = "interrupted"
         try:
             await self.__do_run()
+            status = self.__status = "success"
         except Exception:
-            utils.print_exception(
-                "Error while running this permutation of recipe",
-                get_context().verbosity,
-            )
+            status = self.__status = "failure"
+            if is_headless():
+                emit_exception(
+                    self.__console.file,
+                    "Error while running this permutation of recipe",
+                )
+            else:
+                utils.print_exception(
+                    "Error while running this permutation of recipe",
+                    get_context().verbosity,
+                    self.__console,
+                )
+        finally:
+            if self.__journal is not None:
+                self.__journal.record(
+                    self.__params,
+                    status,
+                    (datetime.now() - start).total_seconds(),
+                    self.__step_durations,
+                )
 
         duration = datetime.now() - start
-        perm_str = humanize.precisedelta(duration, minimum_unit="seconds")
-        print(f"Permutation complete in {perm_str}")
-        print()
+        if self.__dashboard is not None:
+            # Dashboard shows the outcome
+            return
+        if is_headless():
+            emit(
+                self.__console.file,
+                "permutation_end",
+                status=status,
+                duration=duration.total_seconds(),
+                steps=[
+                    {"name": name, "duration": step_duration}
+                    for name, step_duration in self.__step_durations
+                ],
+            )
+            return
+        perm_str = utils.format_duration(duration)
+        self.__console.print(
+            f"Permutation complete in {perm_str}", highlight=False
+        )
+        self.__console.print()
 
     async def __do_run(self):
         """Actually run the recipe"""
-        context: dict[str, Any] = {}
-        teardown: list[list[TeardownHook]] = []
-
         try:
-            for step in self.__steps:
-                context, teardown_hooks = await step.run(
-                    self.__params, context
-                )
-                teardown.append(teardown_hooks)
+            if self.__prefetch_task is not None:
+                if not (
+                    self.__prefetch_task.done()
+                    or is_headless()
+                    or self.__dashboard is not None
+                ):
+                    self.__console.print("Waiting for prefetched steps...")
+                try:
+                    await self.__prefetch_task
+                finally:
+                    self.__prefetch_buffer.flush(self.__console)
+                remaining = self.__steps[self.__num_prefetch :]
+            else:
+                remaining = self.__steps
+
+            await self.__run_steps(remaining, self.__console)
         finally:
-            # Now do clean-up in reverse order
-            for teardown_step in reversed(teardown):
-                for teardown_hook in teardown_step:
-                    await exec_hook(teardown_hook)
+            await self.__cancel_prefetch()
+            await self.__teardown_all()
+
+    async def __run_steps(
+        self,
+        steps: list[RecipeStep],
+        console: Console,
+    ) -> None:
+        """Run the given steps in order, recording their results and teardown
+        hooks.
+        """
+        if self.__infer_dependencies and len(steps) > 1:
+            await self.__run_steps_concurrently(steps, console)
+            return
+
+        for step in steps:
+            start = datetime.now()
+            if self.__session is not None:
+                # Progress is shown on the dashboard
+                results, teardown_hooks = await step.execute(
+                    self.__params | self.__context,
+                    self.__session.make_child(step.name),
+                )
+                self.__context = self.__context | results
+            else:
+                session = ActionSession(step.name)
+                self.__trace(session)
+                self.__context, teardown_hooks = await step.run(
+                    self.__params, self.__context, console, session
+                )
+            self.__teardown.append(teardown_hooks)
+            self.__record_duration(step, start)
+
+    async def __run_steps_concurrently(
+        self,
+        steps: list[RecipeStep],
+        console: Console,
+    ) -> None:
+        """Run the given steps, starting each step as soon as all the earlier
+        steps it depends on have completed.
+
+        Each step receives the results of all earlier steps that have
+        completed by the time it starts. Since it must wait for all steps
+        producing values that it uses, this is equivalent to running the steps
+        in order.
+        """
+        initial_context = self.__context
+        results: dict[int, dict[str, Any]] = {}
+        tasks: list[asyncio.Task[None]] = []
+        # Container for each step's action session, so they can be displayed
+        # together
+        root = self.__session or ActionSession("Steps")
+        if self.__session is None:
+            self.__trace(root)
+
+        async def run_step(i: int) -> None:
+            step = steps[i]
+            for j in range(i):
+                if step.depends_on(steps[j]):
+                    await tasks[j]
+            context = initial_context
+            for j in sorted(results):
+                if j < i:
+                    context = context | results[j]
+            start = datetime.now()
+            step_results, teardown_hooks = await step.execute(
+                self.__params | context,
+                root.make_child(step.name),
+            )
+            results[i] = step_results
+            self.__teardown.append(teardown_hooks)
+            self.__record_duration(step, start)
+
+        async with (
+            show_progress(console, root, draw_children)
+            if self.__session is None
+            else nullcontext(),
+            asyncio.TaskGroup() as tg,
+        ):
+            for i in range(len(steps)):
+                tasks.append(tg.create_task(run_step(i)))
+
+        for i in sorted(results):
+            self.__context = self.__context | results[i]
+
+    def __record_duration(self, step: RecipeStep, start: datetime) -> None:
+        """Record the duration of a completed step"""
+        self.__step_durations.append(
+            (
+                utils.friendly_name(step.name),
+                (datetime.now() - start).total_seconds(),
+            )
+        )
+
+    async def __cancel_prefetch(self) -> None:
+        """Cancel prefetching if it is still running"""
+        if self.__prefetch_task is not None:
+            self.__prefetch_task.cancel()
+            _ = await asyncio.gather(
+                self.__prefetch_task, return_exceptions=True
+            )
+
+    async def __teardown_all(self) -> None:
+        """Do clean-up in reverse order"""
+        while self.__teardown:
+            for teardown_hook in self.__teardown.pop():
+                await exec_hook(teardown_hook)
 
     def __show_current_params(self):
         """
         Displays the current params to the user.
         """
-        print()
-        print("Running recipe with given parameters:")
+        if self.__dashboard is not None:
+            # Dashboard shows the params
+            return
+        if is_headless():
+            emit(
+                self.__console.file,
+                "permutation_start",
+                params={k: str(v) for k, v in self.__params.items()},
+            )
+            return
+        self.__console.print()
+        self.__console.print(
+            "Running recipe with given parameters:", highlight=False
+        )
         for param_name, param_value in self.__params.items():
-            print(f"  {param_name} = {param_value}")
-        print()
+            self.__console.print(
+                f"  {param_name} = {param_value}",
+                markup=False,
+                highlight=False,
+            )
+        self.__console.print()
@@ -5,14 +5,18 @@ A single step within a recipe.
 """
 
 import asyncio
-import inspect
+from collections.abc import Iterable
 from typing import Any, ParamSpec, TypeVar
 
-from rich.live import Live
+from rich.console import Console
 
 from markten.__action_session import ActionSession, TeardownHook
-from markten.__cli import CliManager
-from markten.__consts import TIME_PER_CLI_FRAME
+from markten.__cli import show_progress
+from markten.__recipe.binding import (
+    ActionBinding,
+    NamedAction,
+    call_action_with_context,
+)
 from markten.__recipe.hook import exec_hook
 from markten.actions.__action import MarktenAction, ResultType
 
@@ -25,16 +29,81 @@ class RecipeStep:
         self,
         index: int,
         actions: list[MarktenAction],
+        *,
+        prefetch: bool = False,
     ) -> None:
         self.__index = index
-        self.__actions = actions
+        self.__actions = [ActionBinding(action) for action in actions]
+        self.__prefetch = prefetch
+        self.__inputs = union_of(b.inputs for b in self.__actions)
+        self.__outputs = union_of(b.outputs for b in self.__actions)
+        self.__required = frozenset().union(
+            *(b.required for b in self.__actions)
+        )
+
+    @property
+    def prefetch(self) -> bool:
+        """
+        Whether this step can be run ahead of time for upcoming permutations
+        of the recipe.
+        """
+        return self.__prefetch
+
+    @property
+    def name(self) -> str | object:
+        """
+        Name of this step, used as the name of its `ActionSession`.
+        """
+        if len(self.__actions) > 1:
+            return f"Step {self.__index + 1}"
+        else:
+            return self.__actions[0].fn
+
+    @property
+    def inputs(self) -> frozenset[str] | None:
+        """
+        Names of the values this step reads from the context, or `None` if it
+        may read any value.
+        """
+        return self.__inputs
+
+    @property
+    def required(self) -> frozenset[str]:
+        """
+        Names of the values which must be in the context for this step to run.
+        """
+        return self.__required
+
+    @property
+    def outputs(self) -> frozenset[str] | None:
+        """
+        Names of the values this step adds to the context, or `None` if this
+        cannot be determined ahead of time.
+        """
+        return self.__outputs
+
+    def depends_on(self, other: "RecipeStep") -> bool:
+        """Returns whether this step must wait for the given earlier step to
+        complete before it can run.
+
+        This is the case if this step may read a value produced by the other
+        step, or if both steps may produce the same value (in which case the
+        later step's value must take priority).
+        """
+        if other.outputs is None:
+            return True
+        if self.inputs is None or self.outputs is None:
+            return len(other.outputs) > 0
+        return bool(other.outputs & (self.inputs | self.outputs))
 
     async def run(
         self,
         parameters: dict[str, Any],
         state: dict[str, Any],
+        console: Console,
+        session: ActionSession | None = None,
     ) -> tuple[dict[str, Any], list[TeardownHook]]:
-        """Run this step of the recipe.
+        """Run this step of the recipe, displaying its progress.
 
         This receives the parameters from the previous step, and produces a new
         dictionary with parameters for the next step.
@@ -47,40 +116,68 @@ class RecipeStep:
             Named data produced from previous steps of the recipe. Data from
             this state is included in a new returned dictionary, and updated
             with return values from named actions in this step.
+        console : Console
+            Console on which to display the progress of this step.
+        session : ActionSession | None, optional
+            Action session for this step, by default None to create a new
+            session.
 
         Yields
         ------
         dict[str, Any]
             Data from this step, to use when running future steps.
         """
-        with Live(refresh_per_second=(1 / TIME_PER_CLI_FRAME)) as live:
-            spinners = CliManager(live)
-            if len(self.__actions) > 1:
-                name: str | object = f"Step {self.__index + 1}"
-            else:
-                name = self.__actions[0]
-            session = ActionSession(name)
-
-            # Now await all yielded values
-            tasks: list[asyncio.Task[Any]] = []
-            for action in self.__actions:
-                tasks.append(
-                    asyncio.create_task(
-                        call_action_with_context(
-                            action,
-                            parameters | state,
-                            session.make_child(action)
-                            if len(self.__actions) > 1
-                            else session,
-                        )
+        if session is None:
+            session = ActionSession(self.name)
+        async with show_progress(console, session):
+            results, teardown_hooks = await self.execute(
+                parameters | state, session
+            )
+
+        # Produce new state to next task
+        return (state | results, teardown_hooks)
+
+    async def execute(
+        self,
+        context: dict[str, Any],
+        session: ActionSession,
+    ) -> tuple[dict[str, Any], list[TeardownHook]]:
+        """Execute the actions of this step, without displaying their
+        progress.
+
+        Parameters
+        ----------
+        context : dict[str, Any]
+            Parameters and data from previous steps, passed to the actions.
+        session : ActionSession
+            Action session for this step. If this step has multiple actions,
+            each is given a child of this session.
+
+        Returns
+        -------
+        tuple[dict[str, Any], list[TeardownHook]]
+            Data produced by this step, and the teardown hooks registered by
+            its actions.
+        """
+        # Now await all yielded values
+        tasks: list[asyncio.Task[Any]] = []
+        for action in self.__actions:
+            tasks.append(
+                asyncio.create_task(
+                    call_action_with_context(
+                        action,
+                        context,
+                        session.make_child(action.fn)
+                        if len(self.__actions) > 1
+                        else session,
                     )
                 )
+            )
 
-            # Start drawing the spinners
-            spinner_task = asyncio.create_task(spinners.run(session))
-            # Now wait for all tasks to resolve
-            results: dict[str, Any] = {}
-            task_errors: list[Exception] = []
+        # Now wait for all tasks to resolve
+        results: dict[str, Any] = {}
+        task_errors: list[Exception] = []
+        try:
             for task in tasks:
                 try:
                     result = await task
@@ -90,83 +187,35 @@ class RecipeStep:
                             results[key] = value
                 except Exception as e:
                     task_errors.append(e)
+        except BaseException:
+            # Eg this step was cancelled because a concurrent step failed.
+            # Don't leave the other actions running in the background.
+            for task in tasks:
+                task.cancel()
+            _ = await asyncio.gather(*tasks, return_exceptions=True)
+            for teardown_hook in session.get_teardown_hooks():
+                await exec_hook(teardown_hook)
+            raise
 
-            if len(task_errors):
-                session.fail()
-            else:
-                session.succeed()
-            # Stop spinners
-            spinners.stop()
-            await spinner_task
-
-            if len(task_errors):
-                # Run registered teardown hooks for this step if an error
-                # occurred
-                for teardown_hook in session.get_teardown_hooks():
-                    await exec_hook(teardown_hook)
-
-                raise ExceptionGroup(
-                    f"Task failed on step {self.__index + 1}",
-                    task_errors,
-                )
-
-        # Produce new state to next task
-        return (state | results, session.get_teardown_hooks())
-
-
-async def call_action_with_context(
-    fn: MarktenAction[P, T],
-    context: dict[str, Any],
-    action: ActionSession,
-) -> T:
-    """Execute an action function, passing any required parameters as kwargs.
+        if len(task_errors):
+            session.fail()
+            # Run registered teardown hooks for this step if an error
+            # occurred
+            for teardown_hook in session.get_teardown_hooks():
+                await exec_hook(teardown_hook)
 
-    Parameters
-    ----------
-    fn : MarktenAction
-        Function to call to produce generator
-    context : dict[str, Any]
-        Context, including parameters and results of previous actions.
-    action : ActionSession
-        Action session, used to update status and provide logging.
+            raise ExceptionGroup(
+                f"Task failed on step {self.__index + 1}",
+                task_errors,
+            )
 
-    Returns
-    -------
-    ActionGenerator
-        Return of that function, given its required parameters.
-    """
-    args = inspect.getfullargspec(fn)
-    # Check if function uses kwargs
-    kwargs_used = args[2] is not None
-    if kwargs_used:
-        # If so, pass the full namespace
-        promise = fn(action, **context)  # type: ignore
-    else:
-        # Otherwise, only pass the args it requests
-        named_args = args[0]
-        param_subset = {
-            name: value
-            for name, value in context.items()
-            if name in named_args
-        }
-        promise = fn(action, **param_subset)  # type: ignore
-
-    try:
-        ret = await promise
-        # Succeed if not done already
-        if not action.is_resolved():
-            action.succeed()
-        return ret
-    except BaseException as e:
-        action.fail(e)
-        for abort_hook in action.get_abort_hooks():
-            await exec_hook(abort_hook, e)
-        raise
+        session.succeed()
+        return results, session.get_teardown_hooks()
 
 
 def dict_to_actions(
     actions: dict[str, MarktenAction[P, ResultType]],
-) -> list[MarktenAction[P, ResultType]]:
+) -> list[MarktenAction[..., dict[str, ResultType]]]:
     """Convert the given dictionary of actions into a list of actions.
 
     All the given actions will be run in parallel.
@@ -181,28 +230,16 @@ def dict_to_actions(
     list[MarktenAction]
         Each action in the dictionary as its own independent action.
     """
-    result = []
-    for name, fn in actions.items():
-
-        def make_generator(name, fn):
-            """
-            Make the generator function.
-
-            Needed to capture the `name` and `fn` loop variables, else they
-            will end up being the last value of the iteration.
-
-            https://docs.astral.sh/ruff/rules/function-uses-loop-variable/
-            """
-
-            async def generator(
-                task: ActionSession, **kwargs
-            ) -> dict[str, ResultType]:
-                """The actual generator function"""
-                gen = call_action_with_context(fn, kwargs, task)
-                return {name: await gen}
-
-            return generator
-
-        result.append(make_generator(name, fn))
-
+    return [NamedAction(name, fn) for name, fn in actions.items()]
+
+
+def union_of(
+    sets: Iterable[frozenset[str] | None],
+) -> frozenset[str] | None:
+    """Union of the given sets, or `None` if any of them is `None`."""
+    result: frozenset[str] = frozenset()
+    for s in sets:
+        if s is None:
+            return None
+        result |= s
     return result
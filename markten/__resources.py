@@ -0,0 +1,211 @@
+"""
+# Markten / Resources
+
+Named resource pools, which limit how many actions can use a resource (such
+as the network, the CPU, or a particular server) at once.
+
+Pools are configured on a `Recipe`, and are acquired by actions using
+`using_resources`. Pools which aren't configured are unlimited.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterator, Mapping
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+
+from markten.__action_session import ActionSession
+
+
+class ResourcePool:
+    """
+    Pool of a limited number of slots for a resource.
+
+    Admission is fair: slots are given to waiting actions in the order in
+    which they requested them, and a newly-arriving action can't take a slot
+    while others are waiting.
+    """
+
+    def __init__(self, name: str, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError(
+                f"Resource pool '{name}' must have at least one slot"
+            )
+        self.name = name
+        self.capacity = capacity
+        self.__in_use = 0
+        self.__waiters: deque[
+            tuple[asyncio.Future[None], Callable[[int], None]]
+        ] = deque()
+        """Futures for waiting actions, with callbacks to report their
+        position in the queue
+        """
+
+    @property
+    def in_use(self) -> int:
+        """Number of slots currently in use"""
+        return self.__in_use
+
+    @property
+    def queued(self) -> int:
+        """Number of actions waiting for a slot"""
+        return len(self.__waiters)
+
+    async def acquire(
+        self,
+        on_queued: Callable[[int], None] = lambda _: None,
+    ) -> None:
+        """Wait for a slot in the pool.
+
+        Parameters
+        ----------
+        on_queued : Callable[[int], None], optional
+            Called with the number of actions ahead of this one in the queue
+            when waiting begins, and whenever that number changes.
+        """
+        if self.__in_use < self.capacity and not self.__waiters:
+            self.__in_use += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, on_queued)
+        self.__waiters.append(entry)
+        on_queued(len(self.__waiters) - 1)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was given to us as we were cancelled
+                self.release()
+            else:
+                self.__waiters.remove(entry)
+                self.__report_positions()
+            raise
+
+    def release(self) -> None:
+        """Release a slot, giving it to the next waiting action, if any."""
+        while self.__waiters:
+            future, _ = self.__waiters.popleft()
+            if not future.done():
+                # Slot passes directly to the waiter
+                future.set_result(None)
+                self.__report_positions()
+                return
+        self.__in_use -= 1
+
+    def __report_positions(self) -> None:
+        for position, (_, on_queued) in enumerate(self.__waiters):
+            on_queued(position)
+
+
+class ResourcePools:
+    """
+    Collection of resource pools, by name.
+
+    A capacity given for a name ending in `*` applies separately to each name
+    starting with the same prefix. For example, a capacity given for `"host:*"`
+    limits the actions using each host, rather than all hosts combined.
+    """
+
+    def __init__(self, capacities: Mapping[str, int]) -> None:
+        self.__capacities = dict(capacities)
+        self.__pools: dict[str, ResourcePool] = {}
+
+    def get(self, name: str) -> ResourcePool | None:
+        """Returns the pool with the given name, or `None` if it is unlimited.
+        """
+        if name in self.__pools:
+            return self.__pools[name]
+        capacity = self.__capacities.get(name)
+        if capacity is None:
+            # Longest matching wildcard
+            wildcards = [
+                pattern
+                for pattern in self.__capacities
+                if pattern.endswith("*") and name.startswith(pattern[:-1])
+            ]
+            if not wildcards:
+                return None
+            capacity = self.__capacities[max(wildcards, key=len)]
+        pool = self.__pools[name] = ResourcePool(name, capacity)
+        return pool
+
+
+__pools: ContextVar[ResourcePools | None] = ContextVar(
+    "markten_resource_pools", default=None
+)
+"""Pools for the running recipe"""
+
+__held: ContextVar[frozenset[str]] = ContextVar(
+    "markten_held_resources", default=frozenset()
+)
+"""Names of pools held by the current action or one of its callers"""
+
+
+@contextmanager
+def resource_pools(capacities: Mapping[str, int]) -> Iterator[None]:
+    """Use pools with the given capacities for actions run within the
+    context, including in tasks created within it.
+    """
+    token = __pools.set(ResourcePools(capacities))
+    try:
+        yield
+    finally:
+        __pools.reset(token)
+
+
+@asynccontextmanager
+async def using_resources(
+    action: ActionSession,
+    *names: str,
+) -> AsyncIterator[None]:
+    """Hold a slot in each of the given resource pools while the context is
+    active, showing the action as waiting while the pools are busy.
+
+    Slots are acquired in a consistent order, so that actions acquiring
+    multiple pools can't deadlock each other. Pools which are already held by
+    a calling action are not acquired again.
+
+    ```py
+    async with using_resources(action, "network", "host:github.com"):
+        ...
+    ```
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action which uses the resources.
+    *names : str
+        Names of resource pools.
+    """
+    pools = __pools.get()
+    held = __held.get()
+    acquired: list[ResourcePool] = []
+    message = action.display().message
+    waited = False
+    try:
+        for name in sorted(set(names) - held):
+            pool = pools.get(name) if pools is not None else None
+            if pool is None:
+                continue
+
+            def on_queued(position: int, name: str = name) -> None:
+                nonlocal waited
+                waited = True
+                action.running(
+                    f"Waiting for '{name}' ({position} ahead in queue)"
+                )
+
+            await pool.acquire(on_queued)
+            acquired.append(pool)
+        if waited:
+            action.running(message)
+        token = __held.set(held | set(names))
+        try:
+            yield
+        finally:
+            # Async generators may be closed from a different context
+            with suppress(ValueError):
+                __held.reset(token)
+    finally:
+        for pool in reversed(acquired):
+            pool.release()
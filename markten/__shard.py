@@ -0,0 +1,80 @@
+"""
+# Markten / Shard
+
+Deterministic partitioning of a recipe's permutations into shards, so that
+independent Markten processes (possibly on different machines) can each run
+part of a recipe, without any overlap or coordination.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One of `count` disjoint parts of a recipe's permutations, numbered from
+    1.
+
+    When the number of permutations is known, each shard is a contiguous
+    range of them. Otherwise, permutations are assigned to shards by a stable
+    hash of their parameters. Either way, every process must be given the
+    same parameters in order for the shards not to overlap.
+    """
+
+    index: int
+    """Number of this shard, from 1 to `count`"""
+    count: int
+    """Total number of shards"""
+
+    def __post_init__(self) -> None:
+        if self.count < 1:
+            raise ValueError("Number of shards must be at least 1")
+        if not 1 <= self.index <= self.count:
+            raise ValueError(
+                f"Shard number must be between 1 and {self.count}"
+            )
+
+    @staticmethod
+    def parse(shard: "str | tuple[int, int] | Shard") -> "Shard":
+        """Parse a shard given as `"i/n"`, or as a tuple `(i, n)`.
+
+        Raises
+        ------
+        ValueError
+            The shard is invalid.
+        """
+        if isinstance(shard, Shard):
+            return shard
+        if isinstance(shard, str):
+            index, sep, count = shard.partition("/")
+            try:
+                if not sep:
+                    raise ValueError
+                return Shard(int(index), int(count))
+            except ValueError as e:
+                raise ValueError(
+                    f"Invalid shard '{shard}': expected 'i/n', where i is "
+                    f"between 1 and n"
+                ) from e
+        return Shard(*shard)
+
+    def range(self, size: int) -> range:
+        """Indexes of the permutations in this shard, given the total number
+        of permutations.
+
+        Shards differ in size by at most one.
+        """
+        return range(
+            (self.index - 1) * size // self.count,
+            self.index * size // self.count,
+        )
+
+    def owns(self, fingerprint: str) -> bool:
+        """Whether the permutation with the given (hexadecimal) fingerprint
+        belongs to this shard, for when the number of permutations isn't
+        known.
+        """
+        return int(fingerprint, 16) % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
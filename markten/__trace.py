@@ -0,0 +1,214 @@
+"""
+# Markten / Trace
+
+Records the timing of each action, and exports it in the Chrome trace event
+format, which can be viewed using Perfetto (https://ui.perfetto.dev) or
+speedscope.
+
+Each permutation of the recipe is shown as a separate track, with its steps
+and their child actions shown as nested slices.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from markten.__action_session import ActionInfo, ActionSession
+
+
+@dataclass(frozen=True)
+class TracedAction:
+    """
+    Timing of an action and its children, taken once the action finishes, so
+    that the trace doesn't need to keep the action's session (including its
+    output) in memory.
+    """
+
+    name: str
+    status: str
+    """Status of the action, or `"unfinished"` if it never resolved"""
+    message: str | None
+    start: float
+    end: float | None
+    children: tuple["TracedAction", ...]
+
+    @staticmethod
+    def of(info: ActionInfo) -> "TracedAction":
+        """Take the timing of the given action and its children."""
+        return TracedAction(
+            info.name,
+            info.status.name.lower() if info.end is not None else "unfinished",
+            info.message,
+            info.start,
+            info.end,
+            tuple(TracedAction.of(child) for child in info.children),
+        )
+
+
+class Tracer:
+    """
+    Collects the timing of the actions of each permutation, so that it can be
+    written as a trace once the recipe finishes.
+
+    Since action sessions record their own start and end times, sessions only
+    need to be registered while they run, then replaced by a `TracedAction`
+    once they finish.
+    """
+
+    def __init__(self) -> None:
+        self.__origin = time.perf_counter()
+        """Time at which the trace begins"""
+        self.__tracks: dict[str, list[ActionSession | TracedAction]] = {}
+        """
+        Top-level actions for each track, by the track's name. Sessions are
+        replaced by their timing once they finish.
+        """
+
+    def record(self, track: str, session: ActionSession) -> None:
+        """Record the given session (and its children) on the given track.
+
+        `finish` should be called once the session is complete, so that the
+        session isn't kept in memory.
+
+        Parameters
+        ----------
+        track : str
+            Name of the track, such as the parameters of a permutation.
+        session : ActionSession
+            Session to record.
+        """
+        self.__tracks.setdefault(track, []).append(session)
+
+    def finish(self, session: ActionSession) -> None:
+        """Replace the given session with its timing."""
+        for actions in self.__tracks.values():
+            if session in actions:
+                index = actions.index(session)
+                actions[index] = TracedAction.of(session.display())
+
+    def discard(self, session: ActionSession) -> None:
+        """Remove the given session from the trace, eg if it was abandoned."""
+        for actions in self.__tracks.values():
+            if session in actions:
+                actions.remove(session)
+
+    def events(self) -> list[dict[str, Any]]:
+        """Returns the recorded actions as a list of trace events.
+
+        Actions which never resolved are assumed to have ended when their
+        parent did, or at the current time for top-level actions.
+        """
+        now = time.perf_counter()
+        events: list[dict[str, Any]] = []
+        tracks = [(name, s) for name, s in self.__tracks.items() if s]
+        for pid, (track, actions) in enumerate(tracks, 1):
+            events.append(
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": track},
+                }
+            )
+            events.append(
+                {
+                    "name": "process_sort_index",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"sort_index": pid},
+                }
+            )
+            slices: list[tuple[float, float, TracedAction]] = []
+            for action in actions:
+                self.__collect(
+                    action
+                    if isinstance(action, TracedAction)
+                    else TracedAction.of(action.display()),
+                    now,
+                    slices,
+                )
+            for lane, (start, end, info) in zip(
+                assign_lanes(slices), slices, strict=True
+            ):
+                events.append(
+                    {
+                        "name": info.name,
+                        "cat": "action",
+                        "ph": "X",
+                        "ts": (start - self.__origin) * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": pid,
+                        "tid": lane,
+                        "args": {
+                            "status": info.status,
+                            "message": info.message,
+                        },
+                    }
+                )
+        return events
+
+    def __collect(
+        self,
+        info: TracedAction,
+        parent_end: float,
+        slices: list[tuple[float, float, TracedAction]],
+    ) -> None:
+        """Add the given action and its children to the list of slices"""
+        end = info.end if info.end is not None else parent_end
+        # Clamp to the start, in case the action ended before it was shown
+        end = max(end, info.start)
+        slices.append((info.start, end, info))
+        for child in info.children:
+            self.__collect(child, end, slices)
+
+    def write(self, file: str | Path) -> None:
+        """Write the trace to the given file, as JSON."""
+        with open(file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.events(), "displayTimeUnit": "ms"},
+                f,
+            )
+
+
+def assign_lanes(
+    slices: list[tuple[float, float, Any]],
+) -> list[int]:
+    """Assign each slice to a lane, such that slices on the same lane are
+    either nested or don't overlap.
+
+    Trace viewers draw slices on the same thread as a stack, so actions which
+    run concurrently (eg the actions of a multi-action step) must be placed
+    on separate lanes.
+
+    Returns
+    -------
+    list[int]
+        Lane of each slice, in the same order as the given slices.
+    """
+    order = sorted(
+        range(len(slices)), key=lambda i: (slices[i][0], -slices[i][1])
+    )
+    # End times of the slices enclosing the current point, for each lane
+    lanes: list[list[float]] = []
+    result = [0] * len(slices)
+    for i in order:
+        start, end, _ = slices[i]
+        for stack in lanes:
+            while stack and stack[-1] <= start:
+                stack.pop()
+        # First lane where this slice fits within the enclosing slice
+        lane = next(
+            (
+                n
+                for n, stack in enumerate(lanes)
+                if not stack or end <= stack[-1]
+            ),
+            len(lanes),
+        )
+        if lane == len(lanes):
+            lanes.append([])
+        lanes[lane].append(end)
+        result[i] = lane
+    return result
@@ -5,12 +5,17 @@ Utility functions.
 """
 
 import asyncio
+import io
 import os
 import shutil
+import tempfile
+from collections import deque
+from datetime import timedelta
 from pathlib import Path
 from types import FunctionType
 
 import rich
+from rich.console import Console
 from rich.panel import Panel
 from typing_extensions import override
 
@@ -53,6 +58,15 @@ async def unlink_file(f: Path) -> None:
     _ = await asyncio.to_thread(lambda: f.unlink())
 
 
+def format_duration(duration: timedelta) -> str:
+    """Format the given duration for display, eg "1 minute and 2.5 seconds".
+    """
+    # Imported when needed, to speed up start-up
+    import humanize
+
+    return humanize.precisedelta(duration, minimum_unit="seconds")
+
+
 def recipe_banner(
     recipe_name: str | None,
     recipe_file: str | None,
@@ -90,11 +104,139 @@ class TextCollector:
     def __call__(self, line: str) -> None:
         self.__output.append(line)
 
+    def extend(self, lines: list[str]) -> None:
+        """Collect multiple lines at once"""
+        self.__output.extend(lines)
+
     @override
     def __str__(self) -> str:
         return "\n".join(self.__output).strip()
 
 
+class LogBuffer:
+    """
+    Log of lines of output, which keeps only the most-recent lines in memory.
+
+    Earlier lines are spilled to a temporary file (which is removed when the
+    buffer is garbage-collected), so that memory usage is bounded even if a
+    program produces unlimited output, while the full log is still available
+    using `read_all`.
+    """
+
+    def __init__(self, max_lines: int = consts.LOG_TAIL_LINES) -> None:
+        self.__tail: deque[str] = deque(maxlen=max_lines)
+        self.__spilled = 0
+        """Number of lines spilled to the file"""
+        self.__spill_file: io.TextIOWrapper | None = None
+        self.__cursor = (0, 0)
+        """Line number and position in the spill file where reading last
+        stopped, so that consecutive reads don't re-read the whole file
+        """
+
+    def append(self, line: str) -> None:
+        """Add a line to the log"""
+        if len(self.__tail) == self.__tail.maxlen:
+            if self.__spill_file is None:
+                # Closed (and removed) when garbage-collected
+                self.__spill_file = tempfile.TemporaryFile(  # noqa: SIM115
+                    "w+", encoding="utf-8", prefix="markten-log-"
+                )
+            self.__spill_file.write(self.__tail[0] + "\n")
+            self.__spilled += 1
+        self.__tail.append(line)
+
+    @property
+    def spilled(self) -> int:
+        """Number of earlier lines which are not kept in memory"""
+        return self.__spilled
+
+    def tail(self) -> list[str]:
+        """Return the lines kept in memory"""
+        return list(self.__tail)
+
+    def read_all(self) -> list[str]:
+        """Return all lines of the log, including those spilled to disk"""
+        lines: list[str] = []
+        if self.__spill_file is not None:
+            self.__spill_file.flush()
+            self.__spill_file.seek(0)
+            lines = self.__spill_file.read().splitlines()
+            # Continue appending at the end
+            self.__spill_file.seek(0, io.SEEK_END)
+        return lines + list(self.__tail)
+
+    def read_lines(self, start: int, stop: int | None = None) -> list[str]:
+        """Return the lines of the log from line number `start` up to (but
+        not including) `stop`, reading lines spilled to disk if required.
+        """
+        if stop is None:
+            stop = len(self)
+        lines: list[str] = []
+        if start < self.__spilled and self.__spill_file is not None:
+            f = self.__spill_file
+            f.flush()
+            number, position = self.__cursor
+            if number > start:
+                number, position = 0, 0
+            f.seek(position)
+            while number < min(stop, self.__spilled):
+                line = f.readline()
+                if number >= start:
+                    lines.append(line.removesuffix("\n"))
+                number += 1
+            self.__cursor = (number, f.tell())
+            # Continue appending at the end
+            f.seek(0, io.SEEK_END)
+        tail_start = max(start - self.__spilled, 0)
+        tail_stop = max(stop - self.__spilled, 0)
+        return lines + list(self.__tail)[tail_start:tail_stop]
+
+    def __len__(self) -> int:
+        return self.__spilled + len(self.__tail)
+
+
+class BufferedConsole:
+    """
+    A rich `Console` whose output is held in memory until it is flushed to the
+    real console.
+
+    This is used when running multiple recipe permutations concurrently, so
+    that the output of each permutation is displayed as one contiguous block,
+    rather than being interleaved with the output of other permutations.
+    """
+
+    def __init__(self) -> None:
+        self.__buffer = io.StringIO()
+        self.console = Console(
+            file=self.__buffer,
+            width=console.width,
+            color_system=console.color_system,  # type: ignore
+        )
+        """Console to write output to"""
+
+    def flush(self, to: Console = console) -> None:
+        """Write all buffered output to the given console, and clear the
+        buffer.
+
+        Parameters
+        ----------
+        to : Console
+            Console to write output to, by default the global rich console.
+        """
+        output = self.take()
+        if output and not output.endswith("\n"):
+            output += "\n"
+        to.file.write(output)
+        to.file.flush()
+
+    def take(self) -> str:
+        """Return all buffered output, and clear the buffer."""
+        output = self.__buffer.getvalue()
+        self.__buffer.seek(0)
+        self.__buffer.truncate()
+        return output
+
+
 def friendly_name(obj: object) -> str:
     """Returns a "human-friendly" name for an object
 
@@ -140,10 +282,17 @@ def default_traceback_suppressions():
     ]
 
 
-def print_exception(title: str, verbosity: int):
+def print_exception(
+    title: str,
+    verbosity: int,
+    console: Console = console,
+):
     """
     Print the active exception. Due to Python weirdness, this is determined by
     inspecting stack frames, instead of using a local variable, which is weird.
+
+    The exception is printed to the given `console`, which defaults to the
+    global rich console.
     """
     console.print()
     console.print(f"[bold red]{title}[/]")
@@ -0,0 +1,278 @@
+"""
+# Markten / Actions / Cache
+
+Decorator for caching the results of actions on disk.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from datetime import timedelta
+from logging import Logger
+from pathlib import Path
+from typing import Any, ParamSpec, TypeVar, overload
+
+from platformdirs import user_cache_dir
+
+from markten.__action_session import ActionSession
+from markten.__utils import friendly_name
+from markten.actions.__action import MarktenAction
+
+log = Logger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+DEFAULT_CACHE_DIR = Path(user_cache_dir("markten")) / "actions"
+"""Default directory in which cached results are stored"""
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+"""Default maximum total size of the cache, in bytes (256 MiB)"""
+
+PICKLE_PROTOCOL = 4
+"""Pickle protocol used for keys, so that they are stable between runs"""
+
+
+def result_exists(result: object) -> bool:
+    """
+    Default validation for cached results. Results which are paths are only
+    valid if the path still exists.
+    """
+    return not isinstance(result, Path) or result.exists()
+
+
+class ActionCache:
+    """
+    Content-addressed store of action results, with least-recently-used
+    eviction.
+
+    Each result is pickled to its own file (along with the time at which it
+    was created), named using the hash of its key. The modification time of
+    each file is updated whenever it is used, so that the least-recently-used
+    entries can be evicted when the cache grows too large.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float | None,
+        max_size: int,
+    ) -> None:
+        self.directory = directory
+        """Directory in which results are stored"""
+        self.ttl = ttl
+        """Number of seconds after which results expire"""
+        self.max_size = max_size
+        """Maximum total size of stored results, in bytes"""
+
+    def key(
+        self,
+        action: object,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> str | None:
+        """Return the key for the given call of an action, or `None` if its
+        arguments can't be serialised.
+        """
+        try:
+            data = pickle.dumps(
+                (friendly_name(action), args, sorted(kwargs.items())),
+                protocol=PICKLE_PROTOCOL,
+            )
+        except Exception:
+            return None
+        return hashlib.sha256(data).hexdigest()
+
+    def load(self, key: str) -> tuple[bool, Any]:
+        """Load the result with the given key.
+
+        Returns a tuple of whether a result was found, and the result itself.
+        """
+        path = self.directory / f"{key}.pickle"
+        try:
+            with open(path, "rb") as f:
+                created, result = pickle.load(f)
+            if self.ttl is not None and time.time() - created > self.ttl:
+                path.unlink(missing_ok=True)
+                return False, None
+            # Mark as recently used
+            os.utime(path)
+            return True, result
+        except FileNotFoundError:
+            return False, None
+        except Exception:
+            log.exception(f"Unable to load cached result {path}")
+            with suppress(OSError):
+                path.unlink(missing_ok=True)
+            return False, None
+
+    def store(self, key: str, result: Any) -> None:
+        """Store the given result under the given key, then evict entries if
+        the cache is too large.
+        """
+        try:
+            data = pickle.dumps((time.time(), result))
+        except Exception:
+            log.warning("Unable to cache unpicklable result", exc_info=True)
+            return
+        # A caching failure must never fail the action
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{key}.pickle"
+            # Write atomically, so that concurrent readers never see a partial
+            # result. The temporary file is unique, since the same key may be
+            # stored concurrently.
+            fd, temp = tempfile.mkstemp(
+                prefix=f"{key}.", suffix=".tmp", dir=self.directory
+            )
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp, path)
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except OSError:
+            log.warning(f"Unable to cache result {key}", exc_info=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then remove the least-recently-used
+        entries until the cache fits within its maximum size.
+        """
+        try:
+            self.__evict()
+        except OSError:
+            log.warning("Unable to evict cached results", exc_info=True)
+
+    def __evict(self) -> None:
+        entries: list[tuple[float, int, Path]] = []
+        now = time.time()
+        for path in self.directory.glob("*.pickle"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            # Entries are created before they are last used, so if they were
+            # last used before the TTL, they must have expired
+            if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+@overload
+def cached(
+    action: MarktenAction[P, T],
+    /,
+) -> MarktenAction[P, T]: ...
+
+
+@overload
+def cached(
+    *,
+    ttl: timedelta | float | None = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+    validate: Callable[[Any], bool] = result_exists,
+    directory: Path | None = None,
+) -> Callable[[MarktenAction[P, T]], MarktenAction[P, T]]: ...
+
+
+def cached(
+    action: MarktenAction[P, T] | None = None,
+    /,
+    *,
+    ttl: timedelta | float | None = None,
+    max_size: int = DEFAULT_MAX_SIZE,
+    validate: Callable[[Any], bool] = result_exists,
+    directory: Path | None = None,
+) -> (
+    MarktenAction[P, T]
+    | Callable[[MarktenAction[P, T]], MarktenAction[P, T]]
+):
+    """Decorator to cache the results of an action on disk.
+
+    Results are identified by the action's name and the arguments it was
+    called with, so this should only be used for actions whose result depends
+    only on their arguments. Both the arguments and result must be picklable.
+    If the arguments can't be pickled, the action is always run.
+
+    When a cached result is used, the action isn't run at all, so any teardown
+    hooks it would have registered are not run either.
+
+    Examples
+    --------
+
+    ```py
+    @cached(ttl=timedelta(days=1))
+    @markten_action
+    async def student_info(action: ActionSession, zid: str) -> str:
+        return await actions.process.stdout_of(action, "acc", zid)
+
+    # Or cache an existing action
+    cached_stdout_of = cached(actions.process.stdout_of)
+    ```
+
+    Parameters
+    ----------
+    action : MarktenAction
+        Action to cache.
+    ttl : timedelta | float | None, optional
+        Duration (in seconds if a `float`) after which cached results expire,
+        by default None, meaning that results never expire.
+    max_size : int, optional
+        Maximum total size of the cache in bytes. When this is exceeded, the
+        least-recently-used results are evicted. Defaults to 256 MiB.
+    validate : Callable[[Any], bool], optional
+        Function used to check whether a cached result is still valid. By
+        default, results which are `Path`s are only valid if they still exist.
+    directory : Path | None, optional
+        Directory in which to store results, by default in Markten's directory
+        within the user's cache directory. Actions can share a directory, in
+        which case they share the `max_size` limit.
+    """
+    if isinstance(ttl, timedelta):
+        ttl = ttl.total_seconds()
+    cache = ActionCache(directory or DEFAULT_CACHE_DIR, ttl, max_size)
+
+    def decorator(action: MarktenAction[P, T]) -> MarktenAction[P, T]:
+        @functools.wraps(action)
+        async def wrapper(
+            session: ActionSession,
+            *args: P.args,
+            **kwargs: P.kwargs,
+        ) -> T:
+            key = cache.key(action, args, kwargs)
+            if key is None:
+                log.debug("Unable to cache action with unpicklable arguments")
+                return await action(session, *args, **kwargs)
+
+            found, result = await asyncio.to_thread(cache.load, key)
+            if found and validate(result):
+                session.succeed("Using cached result")
+                return result
+
+            result = await action(session, *args, **kwargs)
+            await asyncio.to_thread(cache.store, key, result)
+            return result
+
+        return wrapper
+
+    if action is not None:
+        return decorator(action)
+    return decorator
@@ -4,9 +4,18 @@
 Actions associated with `git` and Git repos.
 """
 
+import asyncio
+import hashlib
 import re
+import shutil
+import time
+from contextlib import suppress
+from datetime import timedelta
 from logging import Logger
 from pathlib import Path
+from urllib.parse import urlsplit
+
+from platformdirs import user_cache_dir
 
 from markten import ActionSession
 from markten.actions import fs, process
@@ -17,6 +26,40 @@ log = Logger(__name__)
 
 DEFAULT_REMOTE = "origin"
 
+DEFAULT_MIRROR_DIR = Path(user_cache_dir("markten")) / "git-mirrors"
+"""Default directory in which mirrors of upstream repos are stored"""
+
+DEFAULT_MIRROR_MAX_AGE = timedelta(hours=1)
+"""Default duration after which mirrors are updated from their upstream"""
+
+MIRROR_MARKER = "markten-updated"
+"""File within a mirror whose modification time records its last update"""
+
+__mirror_locks: dict[Path, asyncio.Lock] = {}
+"""
+Locks for each mirror, so that concurrent clones don't all update the same
+mirror at once
+"""
+
+
+def network_resources(repo_url: str | None = None) -> tuple[str, ...]:
+    """
+    Names of the resource pools used when communicating with the given
+    remote repo: `"network"`, and `"host:<hostname>"` if the host is known.
+    """
+    if repo_url is None:
+        return ("network",)
+    repo_url = repo_url.strip()
+    if "://" in repo_url:
+        host = urlsplit(repo_url).hostname
+    elif match := re.match(r"^(?:[^@/]+@)?([^:/]+):", repo_url):
+        # scp-like syntax, eg `git@github.com:user/repo.git`
+        host = match.group(1)
+    else:
+        # Local path
+        host = None
+    return ("network", f"host:{host}") if host else ("network",)
+
 
 @markten_action
 async def branch_exists(
@@ -69,11 +112,31 @@ async def clone(
     branch: str | None = None,
     fallback_to_main: bool = False,
     dir: Path | None = None,
+    reference: str | None = None,
+    depth: int | None = None,
+    filter: str | None = None,
+    single_branch: bool = False,
+    no_checkout: bool = False,
 ) -> Path:
     """Perform a `git clone` operation.
 
     By default, this clones the project to a temporary directory.
 
+    If a `branch` is given, its existence is checked using `git ls-remote`
+    before cloning, so that the branch can be checked out as part of the
+    clone itself, and so that nothing is downloaded if the clone would fail.
+
+    If many repos share most of their history (eg student forks of a starter
+    repo), the URL of the shared upstream repo can be given as the
+    `reference`. A local mirror of it is maintained (see `mirror`), and the
+    clone borrows objects from that mirror, so that only objects unique to
+    the cloned repo are downloaded. The clone is dissociated from the mirror
+    afterwards, so it remains usable even if the mirror is removed.
+
+    While cloning, a slot is held in the `"network"` resource pool and in the
+    pool for the repo's host (eg `"host:github.com"`), so that the number of
+    concurrent clones can be limited using `Recipe.resource_pool`.
+
     Parameters
     ----------
     action : ActionSession
@@ -88,43 +151,204 @@ async def clone(
         branch does not given.
     dir : Path | None, optional
         Directory to clone to, by default None for a temporary directory
+    reference : str | None, optional
+        URL of an upstream repo to borrow objects from, by default None. If
+        the mirror of this repo cannot be created or updated, the repo is
+        cloned without it.
+    depth : int | None, optional
+        Number of commits of history to download, by default None for the full
+        history. Note that `git` ignores this for clones of local paths.
+    filter : str | None, optional
+        Filter for a partial clone, eg `"blob:none"` to only download file
+        contents when they are needed, by default None.
+    single_branch : bool, optional
+        Whether to only download the history of the branch being checked out,
+        by default False.
+    no_checkout : bool, optional
+        Whether to skip creating a working tree, by default False. This is
+        useful when only a few files are needed, since they can be read
+        directly from the object store using `object_reader`.
     """
     repo_url = repo_url.strip()
     branch = branch.strip() if branch else None
 
+    if branch and not await action.child(
+        remote_branch_exists, repo_url, branch
+    ):
+        if fallback_to_main:
+            action.log(
+                f"Branch {branch} does not exist. Remaining on main branch"
+            )
+            branch = None
+        else:
+            action.fail(f"Branch {branch} does not exist.")
+            raise RuntimeError("Checkout failed")
+
     if dir:
         clone_path = dir
     else:
         clone_path = await fs.temp_dir(action.make_child(fs.temp_dir))
 
-    program: tuple[str, ...] = ("git", "clone", repo_url, str(clone_path))
+    flags: list[str] = []
+    if branch:
+        flags.extend(["--branch", branch])
+    if depth is not None:
+        flags.append(f"--depth={depth}")
+    if filter is not None:
+        flags.append(f"--filter={filter}")
+    if single_branch:
+        flags.append("--single-branch")
+    if no_checkout:
+        flags.append("--no-checkout")
+
+    if reference:
+        mirror_action = action.make_child(mirror)
+        try:
+            mirror_path = await mirror(mirror_action, reference.strip())
+            flags.extend(["--reference", str(mirror_path), "--dissociate"])
+        except Exception as e:
+            mirror_action.fail(str(e))
+            action.log("Note: cloning without reference mirror")
 
-    _ = await process.run(action, *program)
+    program: tuple[str, ...] = (
+        "git",
+        "clone",
+        *flags,
+        repo_url,
+        str(clone_path),
+    )
 
-    if branch:
-        if await action.child(branch_exists, clone_path, branch, remote=True):
-            checkout_action = action.make_child(checkout)
+    _ = await process.run(
+        action, *program, resources=network_resources(repo_url)
+    )
+
+    return clone_path
+
+
+@markten_action
+async def remote_branch_exists(
+    action: ActionSession,
+    repo_url: str,
+    branch: str,
+) -> bool:
+    """
+    Return whether the given branch exists in the given remote repo.
+
+    Unlike `branch_exists`, this queries the remote directly using
+    `git ls-remote`, so it doesn't require the repo to be cloned or fetched.
+
+    Parameters
+    ----------
+    repo_url : str
+        URL of remote repo
+    branch : str
+        Name of the branch to check for
+    """
+    refs = await process.stdout_of(
+        action,
+        "git",
+        "ls-remote",
+        "--heads",
+        repo_url,
+        f"refs/heads/{branch}",
+        resources=network_resources(repo_url),
+    )
+    return any(
+        line.split()[-1] == f"refs/heads/{branch}"
+        for line in refs.splitlines()
+        if line.strip()
+    )
+
+
+@markten_action
+async def mirror(
+    action: ActionSession,
+    repo_url: str,
+    max_age: timedelta = DEFAULT_MIRROR_MAX_AGE,
+    directory: Path | None = None,
+) -> Path:
+    """Maintain a local bare mirror of the given repo, returning its path.
+
+    The mirror is created if it doesn't exist yet. Otherwise, if it was last
+    updated longer ago than `max_age`, it is fetched from upstream, and
+    `git gc --auto` is run so that it stays compact over time.
+
+    This is used by `clone` when given a `reference`, but can also be used
+    directly, eg to update a mirror before a large batch of clones.
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    repo_url : str
+        URL of repo to mirror.
+    max_age : timedelta, optional
+        Duration after which the mirror is updated, by default 1 hour.
+    directory : Path | None, optional
+        Directory in which to store mirrors, by default Markten's directory
+        within the user's cache directory.
+
+    Returns
+    -------
+    Path
+        Path to the bare mirror.
+    """
+    directory = directory or DEFAULT_MIRROR_DIR
+    digest = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+    slug = re.sub(r"[^\w.-]+", "-", repo_url.rstrip("/").rsplit("/")[-1])
+    path = directory / f"{slug.removesuffix('.git')}-{digest}.git"
+    marker = path / MIRROR_MARKER
+
+    lock = __mirror_locks.setdefault(path, asyncio.Lock())
+    async with lock:
+        if not path.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            # Clone into a temporary location so that an interrupted clone
+            # never leaves a partial mirror behind
+            temp_path = path.with_name(f"{path.name}.tmp-{time.time_ns()}")
             try:
-                await checkout(
-                    checkout_action,
-                    clone_path,
-                    branch,
+                await process.run(
+                    action,
+                    "git",
+                    "clone",
+                    "--mirror",
+                    "--quiet",
+                    repo_url,
+                    str(temp_path),
+                    resources=network_resources(repo_url),
                 )
-            except Exception as e:
-                checkout_action.fail(str(e))
-                if fallback_to_main:
-                    action.log("Note: remaining on main branch")
-                else:
-                    raise
-        elif fallback_to_main:
-            action.log(
-                f"Branch {branch} does not exist. Remaining on main branch"
+                (temp_path / MIRROR_MARKER).touch()
+                try:
+                    temp_path.rename(path)
+                except OSError:
+                    # Another process may have created the mirror first
+                    if not path.exists():
+                        raise
+            finally:
+                shutil.rmtree(temp_path, ignore_errors=True)
+            action.succeed(f"Created mirror of {repo_url}")
+        elif (
+            not marker.exists()
+            or time.time() - marker.stat().st_mtime > max_age.total_seconds()
+        ):
+            await process.run(
+                action,
+                "git",
+                "-C",
+                str(path),
+                "remote",
+                "update",
+                "--prune",
+                resources=network_resources(repo_url),
             )
+            await action.child(
+                process.run, "git", "-C", str(path), "gc", "--auto", "--quiet"
+            )
+            marker.touch()
+            action.succeed(f"Updated mirror of {repo_url}")
         else:
-            action.fail(f"Branch {branch} does not exist.")
-            raise RuntimeError("Checkout failed")
-
-    return clone_path
+            action.succeed(f"Mirror of {repo_url} is up to date")
+    return path
 
 
 @markten_action
@@ -192,14 +416,14 @@ async def push(
         *additional_flags,
     )
 
-    _ = await process.run(action, *program)
+    _ = await process.run(action, *program, resources=network_resources())
 
 
 @markten_action
 async def pull(action: ActionSession, dir: Path) -> None:
     """Perform a `git pull` operation."""
     program = ("git", "-C", str(dir), "pull")
-    _ = await process.run(action, *program)
+    _ = await process.run(action, *program, resources=network_resources())
 
 
 @markten_action
@@ -375,7 +599,7 @@ async def commit(
     push_options : dict[str, str | True], optional
         Push options. Requires `push_after=True`. Defaults to `None`.
     skip_unchanged : bool, optional
-        Whether to perform no action if there are no current changes in the 
+        Whether to perform no action if there are no current changes in the
         repository.
         Defaults to false.
     """
@@ -434,3 +658,175 @@ async def current_branch(action: ActionSession, dir: Path) -> str:
     """
     program = ("git", "-C", str(dir), "rev-parse", "--abbrev-ref", "HEAD")
     return await stdout_of(action, *program)
+
+
+class GitObjectReader:
+    """
+    Reads files directly from a repo's object store, without requiring a
+    working tree.
+
+    This is backed by a single long-running `git cat-file --batch` process, so
+    reading many files doesn't require a subprocess for each of them. Create
+    one using the `object_reader` action.
+    """
+
+    def __init__(self, dir: Path, process: asyncio.subprocess.Process):
+        self.dir = dir
+        """Path to git repository"""
+        self.__process = process
+        self.__broken = False
+        """
+        Whether a request was interrupted, leaving the process's responses out
+        of sync with our requests, so that it must be restarted
+        """
+        self.__lock = asyncio.Lock()
+        """Requests must be made one at a time, so that responses match"""
+
+    @staticmethod
+    async def __start_process(dir: Path) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            "git",
+            "-C",
+            str(dir),
+            "cat-file",
+            "--batch",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+
+    @staticmethod
+    async def start(dir: Path) -> "GitObjectReader":
+        """Start a reader for the given repository."""
+        return GitObjectReader(dir, await GitObjectReader.__start_process(dir))
+
+    async def read(self, path: str | Path, rev: str = "HEAD") -> bytes:
+        """Read the contents of the file at the given path and revision.
+
+        Parameters
+        ----------
+        path : str | Path
+            Path to file, relative to the root of the repository.
+        rev : str, optional
+            Revision to read the file from, by default "HEAD".
+
+        Returns
+        -------
+        bytes
+            Contents of the file.
+
+        Raises
+        ------
+        FileNotFoundError
+            The file does not exist at the given revision.
+        """
+        # `git` always uses forward slashes
+        obj = f"{rev}:{Path(path).as_posix()}"
+        if "\n" in obj:
+            raise ValueError("Object names cannot contain newlines")
+        async with self.__lock:
+            if self.__broken:
+                await self.__restart()
+            stdin = self.__process.stdin
+            stdout = self.__process.stdout
+            assert stdin is not None and stdout is not None
+            try:
+                stdin.write(f"{obj}\n".encode())
+                await stdin.drain()
+                header = (await stdout.readline()).decode().rstrip("\n")
+                if not header:
+                    raise RuntimeError("git cat-file exited unexpectedly")
+                if header.endswith((" missing", " ambiguous")):
+                    raise FileNotFoundError(
+                        f"{path} does not exist at revision {rev} of "
+                        f"{self.dir}"
+                    )
+                # `<object name> <type> <size>`
+                parts = header.rsplit(" ", 2)
+                if len(parts) != 3 or not parts[2].isdigit():
+                    raise RuntimeError(
+                        f"Unexpected response from git cat-file: {header!r}"
+                    )
+                _, obj_type, size = parts
+                # Contents are followed by a newline
+                contents = (await stdout.readexactly(int(size) + 1))[:-1]
+            except FileNotFoundError:
+                raise
+            except BaseException:
+                # Eg cancelled part-way through a response, so the next
+                # response wouldn't match the next request
+                self.__broken = True
+                with suppress(ProcessLookupError):
+                    self.__process.kill()
+                raise
+
+        if obj_type != "blob":
+            raise IsADirectoryError(
+                f"{path} at revision {rev} of {self.dir} is a {obj_type}, not "
+                f"a file"
+            )
+        return contents
+
+    async def read_text(
+        self,
+        path: str | Path,
+        rev: str = "HEAD",
+        encoding: str = "utf-8",
+    ) -> str:
+        """Read the contents of the file at the given path and revision as
+        text.
+        """
+        return (await self.read(path, rev)).decode(encoding, errors="replace")
+
+    async def __restart(self) -> None:
+        """Replace a process whose responses are out of sync."""
+        _ = await self.__process.wait()
+        self.__process = await GitObjectReader.__start_process(self.dir)
+        self.__broken = False
+
+    async def close(self) -> None:
+        """Stop the underlying `git cat-file` process."""
+        if self.__process.returncode is not None:
+            return
+        assert self.__process.stdin is not None
+        self.__process.stdin.close()
+        try:
+            await asyncio.wait_for(self.__process.wait(), timeout=1)
+        except TimeoutError:
+            self.__process.kill()
+            await self.__process.wait()
+
+
+@markten_action
+async def object_reader(action: ActionSession, dir: Path) -> GitObjectReader:
+    """Start a reader for files in the given repo's object store.
+
+    This works with repos cloned using `clone(..., no_checkout=True)`, so
+    that a working tree never needs to be written to disk. The reader is
+    closed automatically during teardown.
+
+    Examples
+    --------
+
+    ```py
+    async def read_answer(action: ActionSession, repo: str) -> str:
+        dir = await action.child(git.clone, repo, no_checkout=True)
+        reader = await action.child(git.object_reader, dir)
+        return await reader.read_text("answer.txt")
+    ```
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    dir : Path
+        Path to git repository
+
+    Returns
+    -------
+    GitObjectReader
+        Reader, whose `read` and `read_text` methods give file contents.
+    """
+    reader = await GitObjectReader.start(dir)
+    action.add_teardown_hook(reader.close)
+    action.succeed(f"Reading objects from {dir}")
+    return reader
@@ -4,12 +4,35 @@
 Code defining actions that are run during the marking recipe.
 """
 
-from . import editor, email, fs, git, process, time, webbrowser
+# Action modules are imported lazily (when first accessed), so that recipes
+# don't need to import the dependencies of actions which they don't use.
+from typing import TYPE_CHECKING
+
+from markten.__lazy import lazy_getattr
+
 from .__action import MarktenAction
-from .__misc import open
+
+if TYPE_CHECKING:
+    from markten.__resources import using_resources
+
+    from . import editor, email, fs, git, process, time, webbrowser
+    from .__cache import cached
+    from .__misc import open
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "cached": (".__cache", "cached"),
+        "open": (".__misc", "open"),
+        "using_resources": ("markten.__resources", "using_resources"),
+    },
+    {"editor", "email", "fs", "git", "process", "time", "webbrowser"},
+)
+
 
 __all__ = [
     "MarktenAction",
+    "cached",
     "editor",
     "email",
     "fs",
@@ -17,5 +40,6 @@ __all__ = [
     "open",
     "process",
     "time",
+    "using_resources",
     "webbrowser",
 ]
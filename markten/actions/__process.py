@@ -5,17 +5,27 @@ Actions for running subprocesses
 """
 
 import asyncio
+import codecs
+import os
 import signal
 import subprocess
 import sys
-from collections.abc import Callable
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Sequence,
+)
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
 
 from typing_extensions import deprecated
 
 from markten import ActionSession
+from markten.__resources import using_resources
 from markten.__utils import TextCollector
 from markten.actions.__action import markten_action
 from markten.actions.__fs import temp_dir
@@ -23,37 +33,221 @@ from markten.actions.__fs import temp_dir
 log = Logger(__name__)
 
 
+READ_CHUNK_SIZE = 256 * 1024
+"""Number of bytes to read from a subprocess's output at once"""
+
+MAX_LINE_LENGTH = 64 * 1024
+"""
+Maximum length of a line of output. Longer lines are split into multiple lines.
+"""
+
+
+class LineDecoder:
+    """
+    Incrementally decodes chunks of UTF-8 output (replacing invalid bytes)
+    into lines.
+
+    Line endings are removed, and lines longer than `max_line_length` are
+    split, unless it is `None`.
+    """
+
+    def __init__(self, max_line_length: int | None = MAX_LINE_LENGTH) -> None:
+        self.__decoder = codecs.getincrementaldecoder("utf-8")(
+            errors="replace"
+        )
+        self.__max_line_length = max_line_length
+        self.__pending: list[str] = []
+        """Pieces of the incomplete line from the end of previous chunks"""
+
+    def feed(self, chunk: bytes) -> list[str]:
+        """Decode the given chunk, returning the lines it completes.
+
+        An empty chunk marks the end of the output, completing the final line.
+        """
+        decoded = self.__decoder.decode(chunk, final=not chunk)
+        if chunk and "\n" not in decoded:
+            # Avoid copying a long incomplete line for every chunk
+            self.__pending.append(decoded)
+            if (
+                self.__max_line_length is None
+                or sum(map(len, self.__pending)) < self.__max_line_length
+            ):
+                return []
+            decoded = ""
+        text = "".join(self.__pending) + decoded
+        raw_lines = text.split("\n")
+        # Last line is incomplete, unless the output has ended
+        self.__pending = [raw_lines.pop()] if chunk else []
+        if not chunk and raw_lines and raw_lines[-1] == "":
+            # Output ended with a newline
+            raw_lines.pop()
+
+        lines = [line.removesuffix("\r") for line in raw_lines]
+        if self.__max_line_length is None:
+            return lines
+        lines = [
+            piece
+            for line in lines
+            for piece in split_line(line, self.__max_line_length)
+        ]
+        # Don't let an incomplete line grow without bound
+        pending = "".join(self.__pending)
+        if len(pending) >= self.__max_line_length:
+            *complete, pending = split_line(pending, self.__max_line_length)
+            self.__pending = [pending]
+            lines.extend(complete)
+        return lines
+
+
 async def read_stream(
     stream: asyncio.StreamReader,
-    cb: Callable[[str], None],
+    cb: Callable[[list[str]], None],
+    *,
+    max_line_length: int | None = MAX_LINE_LENGTH,
+    on_chunk: Callable[[bytes], None] | None = None,
 ) -> None:
-    """Call the given callback for all lines of the given stream"""
+    """Call the given callback with batches of lines from the given stream.
+
+    The stream is read in large chunks and decoded using a `LineDecoder`, so
+    that large amounts of output can be read efficiently. Lines longer than
+    `max_line_length` are split (eg for display), unless it is `None`. If
+    given, `on_chunk` is called with each raw chunk before it is decoded.
+    """
+    decoder = LineDecoder(max_line_length)
     while True:
-        line = await stream.readline()
-        if line:
-            cb(line.decode())
-        else:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if on_chunk is not None and chunk:
+            on_chunk(chunk)
+        lines = decoder.feed(chunk)
+        if lines:
+            cb(lines)
+        if not chunk:
             break
 
 
+def split_line(line: str, max_length: int) -> list[str]:
+    """Split the given line into pieces no longer than `max_length`."""
+    if len(line) <= max_length:
+        return [line]
+    return [
+        line[i : i + max_length] for i in range(0, len(line), max_length)
+    ]
+
+
+class ProcessLimitExceeded(RuntimeError):
+    """
+    A process was killed because it exceeded one of its limits.
+
+    This is distinct from the process exiting with a non-zero exit code, so
+    that (for example) a submission which loops forever can be reported
+    differently from one which fails its tests.
+    """
+
+    def __init__(self, limit: str, message: str) -> None:
+        super().__init__(message)
+        self.limit = limit
+        """
+        Name of the limit which was exceeded: `"timeout"`, `"cpu_seconds"` or
+        `"max_output_bytes"`.
+        """
+
+
+@dataclass(frozen=True)
+class ProcessLimits:
+    """Limits on the resources used by a process."""
+
+    timeout: float | None = None
+    """Number of seconds the process can run for"""
+    cpu_seconds: int | None = None
+    """Number of seconds of CPU time the process can use"""
+    max_memory: int | None = None
+    """Number of bytes of virtual memory the process can use"""
+    max_output_bytes: int | None = None
+    """Number of bytes of output the process can produce"""
+
+    @property
+    def needs_process_group(self) -> bool:
+        """Whether the process should be started in its own process group, so
+        that it and all its descendants can be killed when a limit is
+        exceeded.
+        """
+        return sys.platform != "win32" and (
+            self.timeout is not None or self.max_output_bytes is not None
+        )
+
+    def preexec(self) -> Callable[[], None] | None:
+        """Returns a function which applies rlimits in the child process, if
+        any are needed.
+        """
+        if self.cpu_seconds is None and self.max_memory is None:
+            return None
+        if sys.platform == "win32":
+            raise NotImplementedError(
+                "CPU and memory limits are not supported on Windows"
+            )
+        import resource
+
+        cpu_seconds = self.cpu_seconds
+        max_memory = self.max_memory
+
+        def apply_limits() -> None:
+            if cpu_seconds is not None:
+                # Soft limit sends SIGXCPU, hard limit sends SIGKILL in case
+                # SIGXCPU is handled
+                resource.setrlimit(
+                    resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1)
+                )
+            if max_memory is not None:
+                resource.setrlimit(
+                    resource.RLIMIT_AS, (max_memory, max_memory)
+                )
+
+        return apply_limits
+
+
+def kill_process(
+    process: asyncio.subprocess.Process,
+    process_group: bool,
+) -> None:
+    """Kill the given process, and its process group if it has one."""
+    with suppress(ProcessLookupError):
+        if process_group:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+
+
 async def run_process(
     cmd: tuple[str, ...],
     stdin: str = "",
     cwd: Path | None = None,
     *,
-    on_stdout: Callable[[str], None] | None = None,
-    on_stderr: Callable[[str], None] | None = None,
+    on_stdout: Callable[[list[str]], None] | None = None,
+    on_stderr: Callable[[list[str]], None] | None = None,
+    limits: ProcessLimits | None = None,
+    max_stdout_line_length: int | None = MAX_LINE_LENGTH,
 ) -> int:
     """
-    Run a process, calling the given callbacks when receiving stdout and
-    stderr.
+    Run a process, calling the given callbacks with batches of lines when
+    receiving stdout and stderr.
+
+    Long lines are split for display, but this can be disabled for stdout
+    using `max_stdout_line_length=None`, eg when capturing its output.
+
+    The process is killed if it exceeds any of the given `limits` (raising a
+    `ProcessLimitExceeded`), or if this coroutine is cancelled.
     """
+    if limits is None:
+        limits = ProcessLimits()
+    process_group = limits.needs_process_group
     process = await asyncio.create_subprocess_exec(
         *cmd,
         cwd=cwd,
         stdin=asyncio.subprocess.PIPE,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
+        preexec_fn=limits.preexec(),
+        start_new_session=process_group,
     )
 
     assert process.stdin is not None
@@ -63,12 +257,67 @@ async def run_process(
     assert process.stdout is not None
     assert process.stderr is not None
 
-    async with asyncio.TaskGroup() as tg:
-        if on_stdout:
-            tg.create_task(read_stream(process.stdout, on_stdout))
-        if on_stderr:
-            tg.create_task(read_stream(process.stderr, on_stderr))
-    return await process.wait()
+    exceeded: ProcessLimitExceeded | None = None
+    output_bytes = 0
+
+    def count_output(chunk: bytes) -> None:
+        nonlocal output_bytes, exceeded
+        output_bytes += len(chunk)
+        if (
+            exceeded is None
+            and limits.max_output_bytes is not None
+            and output_bytes > limits.max_output_bytes
+        ):
+            exceeded = ProcessLimitExceeded(
+                "max_output_bytes",
+                f"Process produced more than {limits.max_output_bytes} "
+                f"bytes of output",
+            )
+            # Reading continues until the killed process's output ends
+            kill_process(process, process_group)
+
+    try:
+        async with asyncio.timeout(limits.timeout):
+            async with asyncio.TaskGroup() as tg:
+                if on_stdout:
+                    tg.create_task(
+                        read_stream(
+                            process.stdout,
+                            on_stdout,
+                            max_line_length=max_stdout_line_length,
+                            on_chunk=count_output,
+                        )
+                    )
+                if on_stderr:
+                    tg.create_task(
+                        read_stream(
+                            process.stderr, on_stderr, on_chunk=count_output
+                        )
+                    )
+            returncode = await process.wait()
+    except TimeoutError:
+        kill_process(process, process_group)
+        _ = await process.wait()
+        raise ProcessLimitExceeded(
+            "timeout", f"Process timed out after {limits.timeout} seconds"
+        ) from None
+    except BaseException:
+        # Don't leave the process running if we're cancelled
+        kill_process(process, process_group)
+        _ = await process.wait()
+        raise
+
+    if exceeded is not None:
+        raise exceeded
+    if limits.cpu_seconds is not None and returncode in (
+        -signal.SIGXCPU,
+        -signal.SIGKILL,
+    ):
+        raise ProcessLimitExceeded(
+            "cpu_seconds",
+            f"Process used more than {limits.cpu_seconds} seconds of CPU time",
+        )
+    return returncode
 
 
 @markten_action
@@ -77,6 +326,11 @@ async def run(
     *args: str,
     allow_exit_failure: bool = False,
     cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+    timeout: float | None = None,
+    cpu_seconds: int | None = None,
+    max_memory: int | None = None,
+    max_output_bytes: int | None = None,
 ) -> int:
     """Run the given process, and wait for it to exit before resolving.
 
@@ -91,19 +345,50 @@ async def run(
         code, by default False
     cwd : Path
         Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+    timeout : float | None, optional
+        Number of seconds after which to kill the process, by default None.
+    cpu_seconds : int | None, optional
+        Number of seconds of CPU time after which to kill the process, by
+        default None. Not supported on Windows.
+    max_memory : int | None, optional
+        Number of bytes of virtual memory the process can use, by default
+        None. Allocations beyond this fail, which usually causes the program
+        to exit with an error. Not supported on Windows.
+    max_output_bytes : int | None, optional
+        Number of bytes of output (stdout and stderr combined) after which to
+        kill the process, by default None.
 
     Returns
     -------
     int
         Subprocess's exit code.
+
+    Raises
+    ------
+    ProcessLimitExceeded
+        The process was killed for exceeding its `timeout`, `cpu_seconds` or
+        `max_output_bytes`. This is raised even if `allow_exit_failure` is
+        set.
     """
-    action.running(" ".join(args))
-    returncode = await run_process(
-        args,
-        on_stdout=action.log,
-        on_stderr=action.log,
-        cwd=cwd,
-    )
+    async with using_resources(action, *resources):
+        action.running(" ".join(args))
+        try:
+            returncode = await run_process(
+                args,
+                on_stdout=action.log_lines,
+                on_stderr=action.log_lines,
+                cwd=cwd,
+                limits=ProcessLimits(
+                    timeout, cpu_seconds, max_memory, max_output_bytes
+                ),
+            )
+        except ProcessLimitExceeded as e:
+            action.fail(str(e))
+            raise
     if returncode and not allow_exit_failure:
         raise RuntimeError(f"Process exited with code {returncode}")
     action.succeed()
@@ -116,6 +401,11 @@ async def stdout_of(
     *args: str,
     allow_exit_failure: bool = False,
     cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+    timeout: float | None = None,
+    cpu_seconds: int | None = None,
+    max_memory: int | None = None,
+    max_output_bytes: int | None = None,
 ) -> str:
     """Run the given process, wait for it to exit, and resolve with its stdout
     output.
@@ -131,24 +421,317 @@ async def stdout_of(
         code, by default False
     cwd : Path
         Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+    timeout : float | None, optional
+        Number of seconds after which to kill the process, by default None.
+    cpu_seconds : int | None, optional
+        Number of seconds of CPU time after which to kill the process, by
+        default None. Not supported on Windows.
+    max_memory : int | None, optional
+        Number of bytes of virtual memory the process can use, by default
+        None. Allocations beyond this fail, which usually causes the program
+        to exit with an error. Not supported on Windows.
+    max_output_bytes : int | None, optional
+        Number of bytes of output (stdout and stderr combined) after which to
+        kill the process, by default None.
 
     Returns
     -------
     str
         Process stdout
+
+    Raises
+    ------
+    ProcessLimitExceeded
+        The process was killed for exceeding its `timeout`, `cpu_seconds` or
+        `max_output_bytes`. This is raised even if `allow_exit_failure` is
+        set.
     """
-    action.running(" ".join(args))
     stdout = TextCollector()
-    returncode = await run_process(
-        args,
-        on_stdout=stdout,
-        on_stderr=action.log,
+    async with using_resources(action, *resources):
+        action.running(" ".join(args))
+        try:
+            returncode = await run_process(
+                args,
+                on_stdout=stdout.extend,
+                on_stderr=action.log_lines,
+                cwd=cwd,
+                limits=ProcessLimits(
+                    timeout, cpu_seconds, max_memory, max_output_bytes
+                ),
+                # Lines are captured whole, rather than split for display
+                max_stdout_line_length=None,
+            )
+        except ProcessLimitExceeded as e:
+            action.fail(str(e))
+            raise
+    if returncode and not allow_exit_failure:
+        raise RuntimeError(f"Process exited with code {returncode}")
+    action.succeed()
+    return str(stdout)
+
+
+@asynccontextmanager
+async def start_process(
+    action: ActionSession,
+    args: tuple[str, ...],
+    cwd: Path | None,
+    stdout: int | IO[Any] = asyncio.subprocess.PIPE,
+) -> AsyncIterator[asyncio.subprocess.Process]:
+    """
+    Start the given process with no input, logging its stderr to the given
+    action.
+
+    When the context exits, the process is killed if it is still running, and
+    all of its stderr is logged.
+    """
+    action.running(" ".join(args))
+    process = await asyncio.create_subprocess_exec(
+        *args,
         cwd=cwd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=stdout,
+        stderr=asyncio.subprocess.PIPE,
     )
+    assert process.stderr is not None
+    stderr_task = asyncio.create_task(
+        read_stream(process.stderr, action.log_lines)
+    )
+    try:
+        yield process
+    finally:
+        try:
+            if process.returncode is None:
+                with suppress(ProcessLookupError):
+                    process.kill()
+            _ = await process.wait()
+        finally:
+            await stderr_task
+
+
+def check_exit_code(returncode: int, allow_exit_failure: bool) -> None:
+    """Raise an exception if the given exit code indicates failure."""
     if returncode and not allow_exit_failure:
         raise RuntimeError(f"Process exited with code {returncode}")
+
+
+@markten_action
+async def stdout_bytes_of(
+    action: ActionSession,
+    *args: str,
+    allow_exit_failure: bool = False,
+    cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+) -> bytearray:
+    """Run the given process, wait for it to exit, and resolve with its raw
+    stdout output.
+
+    Unlike `stdout_of`, the output is not decoded or stripped, so this is
+    suitable for binary output, such as from `git archive`. The output is
+    collected into a single buffer as it is read, which is returned without
+    being copied, so that large outputs use little more memory than their
+    size.
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    *args : str
+        Program to execute.
+    allow_exit_failure : bool, optional
+        Whether to fail the action if the process exits with a non-zero status
+        code, by default False
+    cwd : Path
+        Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+
+    Returns
+    -------
+    bytearray
+        Process stdout
+    """
+    output = bytearray()
+    async with (
+        using_resources(action, *resources),
+        start_process(action, args, cwd) as process,
+    ):
+        assert process.stdout is not None
+        while chunk := await process.stdout.read(READ_CHUNK_SIZE):
+            output += chunk
+        returncode = await process.wait()
+    check_exit_code(returncode, allow_exit_failure)
     action.succeed()
-    return str(stdout)
+    return output
+
+
+@markten_action
+async def stdout_to_file(
+    action: ActionSession,
+    *args: str,
+    file: Path,
+    allow_exit_failure: bool = False,
+    cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+) -> Path:
+    """Run the given process, writing its stdout directly to the given file,
+    and resolve with the path to that file once the process exits.
+
+    The output is never held in memory, so this is suitable for processes
+    which produce very large outputs.
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    *args : str
+        Program to execute.
+    file : Path
+        File to write stdout to. It is replaced if it already exists.
+    allow_exit_failure : bool, optional
+        Whether to fail the action if the process exits with a non-zero status
+        code, by default False
+    cwd : Path
+        Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+
+    Returns
+    -------
+    Path
+        Path to the file containing the process's stdout.
+    """
+    with open(file, "wb") as f:
+        async with (
+            using_resources(action, *resources),
+            start_process(action, args, cwd, stdout=f) as process,
+        ):
+            returncode = await process.wait()
+    check_exit_code(returncode, allow_exit_failure)
+    action.succeed()
+    return file
+
+
+async def stdout_chunks_of(
+    action: ActionSession,
+    *args: str,
+    allow_exit_failure: bool = False,
+    cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+) -> AsyncGenerator[bytes]:
+    """Run the given process, yielding chunks of its raw stdout output as they
+    are produced.
+
+    This allows large outputs to be processed with constant memory. If
+    iteration stops early, the process is killed.
+
+    Note that this is an async iterator rather than an action, so it should
+    be used with `async for`:
+
+    ```py
+    async for chunk in process.stdout_chunks_of(action, "git", "archive"):
+        ...
+    ```
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    *args : str
+        Program to execute.
+    allow_exit_failure : bool, optional
+        Whether to raise an exception once output ends if the process exits
+        with a non-zero status code, by default False
+    cwd : Path
+        Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+
+    Yields
+    ------
+    bytes
+        Chunks of the process's stdout, of no more than `READ_CHUNK_SIZE`
+        bytes.
+    """
+    async with (
+        using_resources(action, *resources),
+        start_process(action, args, cwd) as process,
+    ):
+        assert process.stdout is not None
+        while chunk := await process.stdout.read(READ_CHUNK_SIZE):
+            yield chunk
+        returncode = await process.wait()
+    check_exit_code(returncode, allow_exit_failure)
+    action.succeed()
+
+
+async def stdout_lines_of(
+    action: ActionSession,
+    *args: str,
+    allow_exit_failure: bool = False,
+    cwd: Path | None = None,
+    resources: Sequence[str] = ("cpu",),
+) -> AsyncGenerator[str]:
+    """Run the given process, yielding lines of its stdout output as they are
+    produced.
+
+    Lines are decoded in the same way as for `stdout_of`, but are not
+    stripped. If iteration stops early, the process is killed.
+
+    Note that this is an async iterator rather than an action, so it should
+    be used with `async for`:
+
+    ```py
+    async for line in process.stdout_lines_of(action, "git", "log"):
+        ...
+    ```
+
+    Parameters
+    ----------
+    action : ActionSession
+        Action session
+    *args : str
+        Program to execute.
+    allow_exit_failure : bool, optional
+        Whether to raise an exception once output ends if the process exits
+        with a non-zero status code, by default False
+    cwd : Path
+        Working directory for child process.
+    resources : Sequence[str], optional
+        Names of resource pools in which to hold a slot while the process
+        runs, by default `("cpu",)`. Pools which aren't configured on the
+        recipe are unlimited.
+
+    Yields
+    ------
+    str
+        Lines of the process's stdout, without line endings.
+    """
+    decoder = LineDecoder()
+    chunks = stdout_chunks_of(
+        action,
+        *args,
+        allow_exit_failure=allow_exit_failure,
+        cwd=cwd,
+        resources=resources,
+    )
+    try:
+        async for chunk in chunks:
+            for line in decoder.feed(chunk):
+                yield line
+        for line in decoder.feed(b""):
+            yield line
+    finally:
+        await chunks.aclose()
 
 
 @markten_action
@@ -6,24 +6,32 @@ Actions associated with `git` and Git repos.
 
 from . import __gitlab as gitlab
 from .__git import (
+    GitObjectReader,
     add,
     branch_exists,
     checkout,
     clone,
     commit,
     current_branch,
+    mirror,
+    object_reader,
     pull,
     push,
+    remote_branch_exists,
 )
 
 __all__ = [
+    "GitObjectReader",
     "add",
     "branch_exists",
     "checkout",
     "clone",
     "commit",
     "current_branch",
+    "mirror",
+    "object_reader",
     "pull",
     "push",
+    "remote_branch_exists",
     "gitlab",
 ]
@@ -4,17 +4,27 @@
 Actions for running subprocesses
 """
 from .__process import (
+    ProcessLimitExceeded,
     run,
     run_async,
     run_detached,
     run_in_background,
+    stdout_bytes_of,
+    stdout_chunks_of,
+    stdout_lines_of,
     stdout_of,
+    stdout_to_file,
 )
 
 __all__ = [
+    "ProcessLimitExceeded",
     "run",
     "run_async",
     "run_detached",
     "run_in_background",
+    "stdout_bytes_of",
+    "stdout_chunks_of",
+    "stdout_lines_of",
     "stdout_of",
+    "stdout_to_file",
 ]
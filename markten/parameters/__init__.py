@@ -4,9 +4,26 @@
 Code for generating parameters to run the marking recipe on.
 """
 
-from .__fs import list_dir
-from .__io import stdin
-from .__object import from_object
+# Imported lazily (when first accessed), so that importing Markten doesn't
+# set up `readline` unless it's needed.
+from typing import TYPE_CHECKING
+
+from markten.__lazy import lazy_getattr
+
+if TYPE_CHECKING:
+    from .__fs import list_dir
+    from .__io import stdin
+    from .__object import from_object
+
+__getattr__ = lazy_getattr(
+    __name__,
+    {
+        "stdin": (".__io", "stdin"),
+        "list_dir": (".__fs", "list_dir"),
+        "from_object": (".__object", "from_object"),
+    },
+)
+
 
 __all__ = [
     "stdin",
@@ -0,0 +1,116 @@
+"""
+tests / actions / cache_test.py
+
+Test cases for caching action results
+"""
+
+import asyncio
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from markten import ActionSession
+from markten.actions import cached
+
+
+@pytest.mark.asyncio
+async def test_cached_result_reused():
+    calls: list[int] = []
+
+    with TemporaryDirectory() as tmp_dir:
+
+        @cached(directory=Path(tmp_dir))
+        async def double(action: ActionSession, n: int) -> int:
+            calls.append(n)
+            return n * 2
+
+        assert await double(ActionSession("test"), 2) == 4
+        assert await double(ActionSession("test"), 2) == 4
+        assert await double(ActionSession("test"), 3) == 6
+
+    assert calls == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_expired_result_not_reused():
+    calls: list[int] = []
+
+    with TemporaryDirectory() as tmp_dir:
+
+        @cached(directory=Path(tmp_dir), ttl=-1)
+        async def double(action: ActionSession, n: int) -> int:
+            calls.append(n)
+            return n * 2
+
+        await double(ActionSession("test"), 2)
+        await double(ActionSession("test"), 2)
+
+    assert calls == [2, 2]
+
+
+@pytest.mark.asyncio
+async def test_missing_path_not_reused():
+    calls = 0
+
+    with TemporaryDirectory() as tmp_dir:
+        target = Path(tmp_dir) / "target"
+
+        @cached(directory=Path(tmp_dir) / "cache")
+        async def make(action: ActionSession) -> Path:
+            nonlocal calls
+            calls += 1
+            target.touch()
+            return target
+
+        await make(ActionSession("test"))
+        target.unlink()
+        await make(ActionSession("test"))
+
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_evicted():
+    with TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir)
+
+        @cached(directory=directory, max_size=1500)
+        async def big(action: ActionSession, n: int) -> bytes:
+            return bytes(1000)
+
+        await big(ActionSession("test"), 1)
+        await big(ActionSession("test"), 2)
+
+        assert len(list(directory.glob("*.pickle"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stores_of_same_key():
+    with TemporaryDirectory() as tmp_dir:
+
+        @cached(directory=Path(tmp_dir))
+        async def slow_double(action: ActionSession, n: int) -> int:
+            await asyncio.sleep(0.01)
+            return n * 2
+
+        results = await asyncio.gather(
+            *(slow_double(ActionSession("test"), 2) for _ in range(8))
+        )
+        assert results == [4] * 8
+        # No temporary files are left behind
+        assert [p.suffix for p in Path(tmp_dir).iterdir()] == [".pickle"]
+
+
+@pytest.mark.asyncio
+async def test_caching_failure_does_not_fail_action():
+    with TemporaryDirectory() as tmp_dir:
+        # Cache directory can't be created, since a file is in the way
+        blocker = Path(tmp_dir) / "blocker"
+        blocker.write_text("")
+
+        @cached(directory=blocker / "cache")
+        async def double(action: ActionSession, n: int) -> int:
+            return n * 2
+
+        assert await double(ActionSession("test"), 2) == 4
@@ -0,0 +1,225 @@
+"""
+tests / actions / git_test
+
+Test cases for git actions.
+"""
+
+import asyncio
+import os
+import subprocess
+from datetime import timedelta
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__recipe.hook import exec_hook
+from markten.actions import git
+
+
+def make_repo(path: Path) -> None:
+    """Create a git repo with a single commit at the given path"""
+    env = os.environ | {
+        "GIT_AUTHOR_NAME": "Test",
+        "GIT_AUTHOR_EMAIL": "test@example.com",
+        "GIT_COMMITTER_NAME": "Test",
+        "GIT_COMMITTER_EMAIL": "test@example.com",
+    }
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    (path / "README.md").write_text("Hello")
+    subprocess.run(["git", "-C", str(path), "add", "."], check=True)
+    subprocess.run(
+        ["git", "-C", str(path), "commit", "-q", "-m", "Initial"],
+        check=True,
+        env=env,
+    )
+
+
+@pytest.mark.asyncio
+async def test_clone_with_reference(monkeypatch: pytest.MonkeyPatch):
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+        mirrors = tmp_dir / "mirrors"
+        monkeypatch.setattr(
+            "markten.actions.__git.DEFAULT_MIRROR_DIR", mirrors
+        )
+
+        mirror_path = await git.mirror(
+            ActionSession("mirror"), str(upstream), directory=mirrors
+        )
+        assert (mirror_path / "HEAD").exists()
+
+        clone_path = await git.clone(
+            ActionSession("clone"),
+            str(upstream),
+            dir=tmp_dir / "clone",
+            reference=str(upstream),
+        )
+        assert (clone_path / "README.md").read_text() == "Hello"
+        # Dissociated from the mirror
+        alternates = clone_path / ".git" / "objects" / "info" / "alternates"
+        assert not alternates.exists()
+
+
+@pytest.mark.asyncio
+async def test_mirror_updated_when_stale():
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+        mirrors = tmp_dir / "mirrors"
+
+        mirror_path = await git.mirror(
+            ActionSession("mirror"), str(upstream), directory=mirrors
+        )
+        subprocess.run(
+            ["git", "-C", str(upstream), "branch", "new-branch"], check=True
+        )
+        await git.mirror(
+            ActionSession("mirror"),
+            str(upstream),
+            directory=mirrors,
+            max_age=timedelta(0),
+        )
+        branches = subprocess.run(
+            ["git", "-C", str(mirror_path), "branch"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        assert "new-branch" in branches
+
+
+@pytest.mark.asyncio
+async def test_mirror_as_recipe_step():
+    """`mirror` can be given its repo URL by the recipe"""
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+        mirrors: list[Path] = []
+
+        async def check(action: ActionSession, mirror_path: Path) -> None:
+            mirrors.append(mirror_path)
+
+        recipe = Recipe("mirror")
+        recipe.parameter("repo_url", [str(upstream)])
+        recipe.parameter("directory", [tmp_dir / "mirrors"])
+        recipe.step({"mirror_path": git.mirror})
+        recipe.step(check)
+        await recipe.async_run()
+
+        assert len(mirrors) == 1
+        assert (mirrors[0] / "HEAD").exists()
+
+
+@pytest.mark.asyncio
+async def test_clone_checks_out_branch():
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+        subprocess.run(
+            ["git", "-C", str(upstream), "branch", "submission"], check=True
+        )
+
+        clone_path = await git.clone(
+            ActionSession("clone"),
+            str(upstream),
+            branch="submission",
+            dir=tmp_dir / "clone",
+            single_branch=True,
+        )
+        assert (
+            await git.current_branch(ActionSession("branch"), clone_path)
+            == "submission"
+        )
+
+
+@pytest.mark.asyncio
+async def test_clone_missing_branch_fails_before_cloning():
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+
+        with pytest.raises(RuntimeError):
+            await git.clone(
+                ActionSession("clone"),
+                str(upstream),
+                branch="submission",
+                dir=tmp_dir / "clone",
+            )
+        assert not (tmp_dir / "clone").exists()
+
+
+@pytest.mark.asyncio
+async def test_clone_missing_branch_fallback():
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+
+        clone_path = await git.clone(
+            ActionSession("clone"),
+            str(upstream),
+            branch="submission",
+            fallback_to_main=True,
+            dir=tmp_dir / "clone",
+        )
+        assert (clone_path / "README.md").exists()
+
+
+@pytest.mark.asyncio
+async def test_object_reader():
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+
+        session = ActionSession("clone")
+        clone_path = await git.clone(
+            session,
+            str(upstream),
+            dir=tmp_dir / "clone",
+            no_checkout=True,
+        )
+        assert not (clone_path / "README.md").exists()
+
+        reader = await git.object_reader(session, clone_path)
+        try:
+            assert await reader.read_text("README.md") == "Hello"
+            assert await reader.read("README.md", "HEAD") == b"Hello"
+            with pytest.raises(FileNotFoundError):
+                await reader.read("missing.txt")
+            with pytest.raises(FileNotFoundError):
+                await reader.read("no such.txt")
+        finally:
+            for hook in session.get_teardown_hooks():
+                await exec_hook(hook)
+
+
+@pytest.mark.asyncio
+async def test_object_reader_cancelled():
+    """Cancelling a read doesn't mix up the responses to later reads"""
+    with TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        upstream = tmp_dir / "upstream"
+        make_repo(upstream)
+
+        session = ActionSession("clone")
+        reader = await git.object_reader(session, upstream)
+        try:
+            task = asyncio.create_task(reader.read("missing.txt"))
+            # Request is sent, but its response isn't read yet
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert await reader.read_text("README.md") == "Hello"
+        finally:
+            for hook in session.get_teardown_hooks():
+                await exec_hook(hook)
@@ -4,3 +4,194 @@ tests / actions / process_test
 
 Test cases for the process action.
 """
+
+import asyncio
+import json
+import sys
+
+import pytest
+
+from markten import ActionSession
+from markten.actions import process
+from markten.actions.__process import LineDecoder, read_stream
+
+
+async def read_all(data: list[bytes], max_line_length: int = 100) -> list[str]:
+    """Read the given chunks of data using `read_stream`"""
+    stream = asyncio.StreamReader()
+    for chunk in data:
+        stream.feed_data(chunk)
+    stream.feed_eof()
+    lines: list[str] = []
+    await read_stream(stream, lines.extend, max_line_length=max_line_length)
+    return lines
+
+
+@pytest.mark.asyncio
+async def test_read_stream_lines():
+    assert await read_all([b"a\nb\r\n", b"c"]) == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_read_stream_split_multibyte_character():
+    data = "héllo\n".encode()
+    assert await read_all([data[:2], data[2:]]) == ["héllo"]
+
+
+@pytest.mark.asyncio
+async def test_read_stream_long_line_split():
+    assert await read_all([b"a" * 250 + b"\n"]) == [
+        "a" * 100,
+        "a" * 100,
+        "a" * 50,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stdout_of_long_line():
+    # Longer than the default `StreamReader` limit of 64 KiB
+    length = 200_000
+    output = await process.stdout_of(
+        ActionSession("test"),
+        sys.executable,
+        "-c",
+        f"print('x' * {length})",
+    )
+    assert output == "x" * length
+
+
+@pytest.mark.asyncio
+async def test_stdout_of_long_json_line():
+    output = await process.stdout_of(
+        ActionSession("test"),
+        sys.executable,
+        "-c",
+        "import json; print(json.dumps({'k': 'x' * 100000}))",
+    )
+    assert json.loads(output) == {"k": "x" * 100000}
+
+
+def test_line_decoder_without_limit():
+    decoder = LineDecoder(None)
+    assert decoder.feed(b"a" * 10) == []
+    assert decoder.feed(b"a" * 10 + b"\nb") == ["a" * 20]
+    assert decoder.feed(b"") == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_stdout_bytes_of():
+    output = await process.stdout_bytes_of(
+        ActionSession("test"),
+        sys.executable,
+        "-c",
+        "import sys; sys.stdout.buffer.write(bytes(range(256)))",
+    )
+    assert output == bytes(range(256))
+
+
+@pytest.mark.asyncio
+async def test_stdout_to_file(tmp_path):
+    file = await process.stdout_to_file(
+        ActionSession("test"),
+        sys.executable,
+        "-c",
+        "print('hello')",
+        file=tmp_path / "out.txt",
+    )
+    assert file.read_text().strip() == "hello"
+
+
+@pytest.mark.asyncio
+async def test_stdout_lines_of():
+    lines = [
+        line
+        async for line in process.stdout_lines_of(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "print('a'); print('b')",
+        )
+    ]
+    assert lines == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_stdout_lines_of_exit_failure():
+    with pytest.raises(RuntimeError):
+        async for _ in process.stdout_lines_of(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "print('a'); exit(1)",
+        ):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_stdout_chunks_of_stop_early():
+    # Process would never exit by itself, so must be killed
+    chunks = process.stdout_chunks_of(
+        ActionSession("test"),
+        sys.executable,
+        "-c",
+        "import sys\nwhile True: sys.stdout.write('x' * 1000)",
+    )
+    async for chunk in chunks:
+        assert chunk
+        break
+    await asyncio.wait_for(chunks.aclose(), 5)
+
+
+@pytest.mark.asyncio
+async def test_run_timeout():
+    with pytest.raises(process.ProcessLimitExceeded) as e:
+        await process.run(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "import time; time.sleep(30)",
+            timeout=0.5,
+        )
+    assert e.value.limit == "timeout"
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(sys.platform == "win32", reason="Uses rlimits")
+async def test_run_cpu_limit():
+    with pytest.raises(process.ProcessLimitExceeded) as e:
+        await process.run(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "while True: pass",
+            cpu_seconds=1,
+            timeout=30,
+        )
+    assert e.value.limit == "cpu_seconds"
+
+
+@pytest.mark.asyncio
+async def test_stdout_of_output_limit():
+    with pytest.raises(process.ProcessLimitExceeded) as e:
+        await process.stdout_of(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "while True: print('x' * 1000)",
+            max_output_bytes=100_000,
+            timeout=30,
+        )
+    assert e.value.limit == "max_output_bytes"
+
+
+@pytest.mark.asyncio
+async def test_exit_failure_is_not_limit():
+    with pytest.raises(RuntimeError) as e:
+        await process.run(
+            ActionSession("test"),
+            sys.executable,
+            "-c",
+            "exit(1)",
+            timeout=30,
+        )
+    assert not isinstance(e.value, process.ProcessLimitExceeded)
@@ -0,0 +1,200 @@
+"""
+tests / benchmarks / io_test
+============================
+
+Benchmarks for the throughput of Markten's I/O paths: reading output from
+subprocesses, and reading and writing files.
+
+Fixtures are generated for each run, so these don't need network access.
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+from markten import ActionSession
+from markten.__action_session import TeardownHook
+from markten.actions import fs, process
+from markten.actions.__process import read_stream, run_process
+
+pytestmark = [
+    pytest.mark.benchmark,
+    pytest.mark.skipif(
+        not sys.platform.startswith("linux"),
+        reason="I/O benchmarks are only comparable on Linux",
+    ),
+]
+
+CHATTY_LINES = 200_000
+"""Number of lines of output for the chatty subprocess benchmarks"""
+
+LARGE_OUTPUT_BYTES = 32 * 1024 * 1024
+"""Size of output for the large output benchmarks"""
+
+MB = 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def chatty_file(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """File with many short lines, like the output of a verbose test run"""
+    file = tmp_path_factory.mktemp("io") / "chatty.txt"
+    file.write_text(
+        "".join(f"test case {i} passed\n" for i in range(CHATTY_LINES))
+    )
+    return file
+
+
+@pytest.fixture(scope="module")
+def large_file(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """Large file with long lines, like the output of `git archive`"""
+    file = tmp_path_factory.mktemp("io") / "large.txt"
+    line = "x" * 1023 + "\n"
+    file.write_text(line * (LARGE_OUTPUT_BYTES // len(line)))
+    return file
+
+
+@pytest.mark.asyncio
+async def test_run_process_lines(benchmark, chatty_file: Path):
+    """Lines per second through `run_process` from a chatty subprocess"""
+    lines = 0
+
+    def count(batch: list[str]) -> None:
+        nonlocal lines
+        lines += len(batch)
+
+    async def run():
+        await run_process(("cat", str(chatty_file)), on_stdout=count)
+
+    duration = await benchmark.time_async(run)
+    assert lines == CHATTY_LINES * 5
+    benchmark.check(
+        CHATTY_LINES / duration,
+        "lines/s",
+        metric="throughput",
+        higher_is_better=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_process_bytes(benchmark, large_file: Path):
+    """Megabytes per second through `run_process` for large output"""
+
+    async def run():
+        await run_process(("cat", str(large_file)), on_stdout=lambda _: None)
+
+    duration = await benchmark.time_async(run)
+    benchmark.check(
+        LARGE_OUTPUT_BYTES / MB / duration,
+        "MB/s",
+        metric="throughput",
+        higher_is_better=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_stream(benchmark, chatty_file: Path):
+    """Megabytes per second decoded by `read_stream`, without a subprocess"""
+    data = chatty_file.read_bytes()
+
+    async def read():
+        stream = asyncio.StreamReader()
+        stream.feed_data(data)
+        stream.feed_eof()
+        await read_stream(stream, lambda _: None)
+
+    duration = await benchmark.time_async(read)
+    benchmark.check(
+        len(data) / MB / duration,
+        "MB/s",
+        metric="throughput",
+        higher_is_better=True,
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("action", "max_ratio"),
+    [
+        pytest.param(process.stdout_of, 2.5, id="stdout_of"),
+        # Output is collected in place, so is never held twice
+        pytest.param(process.stdout_bytes_of, 1.25, id="stdout_bytes_of"),
+    ],
+)
+async def test_stdout_memory(
+    benchmark, large_file: Path, action, max_ratio: float
+):
+    """Peak memory used while collecting a large output, relative to the size
+    of the output
+    """
+    tracemalloc.start()
+    try:
+        output = await action(ActionSession("test"), "cat", str(large_file))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # `stdout_of` strips the trailing newline
+    assert len(output) >= large_file.stat().st_size - 1
+    assert peak / len(output) < max_ratio
+    benchmark.check(peak / len(output), "x output size", metric="memory")
+
+
+@pytest.mark.asyncio
+async def test_write_read_file(benchmark, tmp_path: Path):
+    """Writing and reading back small files using `fs.write_file` and
+    `fs.read_file` (which use `aiofiles`)
+    """
+    text = "print('hello world')\n" * 100
+    files = [tmp_path / f"{i}.py" for i in range(100)]
+
+    async def write_and_read():
+        for file in files:
+            await fs.write_file(
+                ActionSession("write"), file, text, overwrite=True
+            )
+            assert await fs.read_file(ActionSession("read"), file) == text
+
+    await benchmark.time_async(write_and_read)
+
+
+@pytest.mark.asyncio
+async def test_write_read_file_thread(benchmark, tmp_path: Path):
+    """Same as `test_write_read_file`, but using plain threads, for
+    comparison
+    """
+    text = "print('hello world')\n" * 100
+    files = [tmp_path / f"{i}.py" for i in range(100)]
+
+    async def write_and_read():
+        for file in files:
+            await asyncio.to_thread(file.write_text, text)
+            assert await asyncio.to_thread(file.read_text) == text
+
+    await benchmark.time_async(write_and_read)
+
+
+@pytest.mark.asyncio
+async def test_temp_dir(benchmark):
+    """Temporary directories created and removed per second"""
+    count = 100
+
+    async def create_and_remove():
+        hooks: list[TeardownHook] = []
+        for _ in range(count):
+            action = ActionSession("temp_dir")
+            await fs.temp_dir(action, remove=True)
+            hooks.extend(action.get_teardown_hooks())
+        for hook in hooks:
+            result = hook()
+            if result is not None:
+                await result
+
+    duration = await benchmark.time_async(create_and_remove)
+    benchmark.check(
+        count / duration,
+        "dirs/s",
+        metric="throughput",
+        higher_is_better=True,
+    )
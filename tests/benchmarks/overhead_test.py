@@ -0,0 +1,115 @@
+"""
+tests / benchmarks / overhead_test
+==================================
+
+Benchmarks for the overhead of Markten itself, using actions which do
+nothing, so that the cost of scheduling, parameter expansion and rendering
+can be measured in isolation.
+"""
+
+import io
+from typing import Any
+
+import pytest
+from rich.console import Console
+from rich.live import Live
+
+from markten import ActionSession, get_context
+from markten.__cli import draw_action
+from markten.__recipe.binding import ActionBinding, call_action_with_context
+from markten.__recipe.parameters import ParameterManager
+from markten.__recipe.step import RecipeStep
+
+pytestmark = pytest.mark.benchmark
+
+
+async def no_op(action: ActionSession, a: int, b: str) -> None:
+    pass
+
+
+def make_console() -> Console:
+    """Console which draws as if to a terminal, but discards its output"""
+    return Console(
+        file=io.StringIO(), force_terminal=True, width=100, height=50
+    )
+
+
+def make_tree(children: int, grandchildren: int) -> ActionSession:
+    """Create a tree of actions, each with some output"""
+    root = ActionSession("root")
+    for i in range(children):
+        child = root.make_child(f"child {i}")
+        for j in range(grandchildren):
+            grandchild = child.make_child(f"grandchild {j}")
+            grandchild.log_lines(f"line {k}" for k in range(10))
+            grandchild.succeed("Done")
+    return root
+
+
+def test_parameter_iteration(benchmark):
+    """Expanding 1000 permutations of 3 parameters"""
+
+    def iterate():
+        params = ParameterManager()
+        params.add("a", range(10))
+        params.add("b", [str(i) for i in range(10)])
+        params.add("c", (i for i in range(10)))
+        for _ in params:
+            pass
+
+    benchmark.time(iterate)
+
+
+@pytest.mark.asyncio
+async def test_action_dispatch(benchmark):
+    """Binding parameters to an action and calling it"""
+    binding = ActionBinding(no_op)
+    context: dict[str, Any] = {"a": 1, "b": "2", "c": 3}
+
+    async def dispatch():
+        await call_action_with_context(
+            binding, context, ActionSession("no_op")
+        )
+
+    await benchmark.time_async(dispatch, iterations=1000)
+
+
+@pytest.mark.asyncio
+async def test_step_run(benchmark):
+    """Running a step, including setting up and tearing down its live
+    display
+    """
+    step = RecipeStep(0, [no_op])
+    console = make_console()
+    output = get_context().output
+    get_context().output = "rich"
+    try:
+        await benchmark.time_async(
+            lambda: step.run({"a": 1, "b": "2"}, {}, console),
+            iterations=50,
+        )
+    finally:
+        get_context().output = output
+
+
+def test_action_tree_display(benchmark):
+    """Building and taking a snapshot of a tree of 1000 actions"""
+
+    def build():
+        make_tree(100, 10).display()
+
+    benchmark.time(build)
+
+
+def test_cli_frame(benchmark):
+    """Drawing a frame after one action in a large tree changes"""
+    root = make_tree(20, 5)
+    leaf = root.make_child("leaf")
+    console = make_console()
+    with Live(console=console, auto_refresh=False) as live:
+        # Same as a frame drawn by `CliManager` when the action changes
+        def frame():
+            leaf.log("more output")
+            live.update(draw_action(root.display()), refresh=True)
+
+        benchmark.time(frame, iterations=20)
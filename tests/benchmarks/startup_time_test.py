@@ -0,0 +1,48 @@
+"""
+tests / benchmarks / startup_test
+=================================
+
+Benchmarks for the time taken to start Markten.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+TRIVIAL_RECIPE = """
+from markten import ActionSession, Recipe
+
+recipe = Recipe("trivial")
+
+
+@recipe.step
+async def step(action: ActionSession) -> None:
+    pass
+
+
+recipe.run()
+"""
+
+
+def run_markten(*args: str) -> None:
+    _ = subprocess.run(
+        [sys.executable, "-m", "markten", *args],
+        capture_output=True,
+        check=True,
+    )
+
+
+def test_version(benchmark):
+    """Time taken by `markten --version`"""
+    benchmark.time(lambda: run_markten("--version"))
+
+
+def test_trivial_recipe(benchmark, tmp_path: Path):
+    """Time taken to run a recipe with a single step which does nothing"""
+    recipe = tmp_path / "recipe.py"
+    recipe.write_text(TRIVIAL_RECIPE)
+    benchmark.time(lambda: run_markten("--output", "json", str(recipe)))
@@ -0,0 +1,128 @@
+"""
+tests / cli / daemon_test
+=========================
+
+Test cases for running recipes using the Markten daemon.
+"""
+
+import os
+import subprocess
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="The daemon requires a Unix system"
+)
+
+RECIPE = """
+import os
+import sys
+
+from markten import ActionSession, Recipe
+
+print("args:", *sys.argv[1:])
+print("cwd:", os.getcwd())
+print("pid:", os.getpid())
+
+recipe = Recipe("daemon")
+
+
+@recipe.step
+async def step(action: ActionSession) -> None:
+    if "fail" in sys.argv:
+        raise RuntimeError("Failed")
+
+
+recipe.run()
+if "exit" in sys.argv:
+    sys.exit(3)
+"""
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Iterator[Path]:
+    """Run the daemon for the duration of a test, returning its socket"""
+    socket_path = tmp_path / "markten.sock"
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "markten", "serve", "--socket", socket_path],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert daemon.stdout is not None
+        assert "listening" in daemon.stdout.readline()
+        yield socket_path
+    finally:
+        daemon.terminate()
+        daemon.wait(5)
+    # Daemon cleans up after itself
+    assert not socket_path.exists()
+
+
+def run_client(
+    socket_path: Path,
+    recipe_dir: Path,
+    *args: str,
+) -> subprocess.CompletedProcess[str]:
+    """Run the recipe using `markten --daemon`"""
+    (recipe_dir / "recipe.py").write_text(RECIPE)
+    return subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "markten",
+            "--daemon",
+            "--output",
+            "json",
+            "recipe.py",
+            *args,
+        ],
+        cwd=recipe_dir,
+        env=os.environ | {"MARKTEN_SOCKET": str(socket_path)},
+        capture_output=True,
+        text=True,
+        timeout=10,
+    )
+
+
+def test_daemon_runs_recipe(socket_path: Path, tmp_path: Path):
+    result = run_client(socket_path, tmp_path, "a", "b c")
+    assert result.returncode == 0
+    assert "args: a b c" in result.stdout
+    # Runs in the client's working directory
+    assert f"cwd: {tmp_path}" in result.stdout
+    # Options are passed to the daemon
+    assert '"event": "recipe_end"' in result.stdout
+
+
+def test_daemon_runs_in_separate_processes(
+    socket_path: Path, tmp_path: Path
+):
+    first = run_client(socket_path, tmp_path)
+    second = run_client(socket_path, tmp_path)
+    pids = {
+        line
+        for line in first.stdout.splitlines() + second.stdout.splitlines()
+        if line.startswith("pid:")
+    }
+    assert len(pids) == 2
+
+
+def test_daemon_exit_code(socket_path: Path, tmp_path: Path):
+    result = run_client(socket_path, tmp_path, "exit")
+    assert result.returncode == 3
+
+
+def test_daemon_failure(socket_path: Path, tmp_path: Path):
+    result = run_client(socket_path, tmp_path, "fail")
+    assert '"status": "failure"' in result.stdout
+
+
+def test_no_daemon(tmp_path: Path):
+    """If the daemon isn't running, the recipe is run normally"""
+    result = run_client(tmp_path / "missing.sock", tmp_path, "a")
+    assert result.returncode == 0
+    assert "args: a" in result.stdout
@@ -0,0 +1,90 @@
+"""
+tests / cli / events_test
+
+Test cases for headless JSON event output.
+"""
+
+import asyncio
+import json
+from collections.abc import Iterator
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__consts import LOG_TAIL_LINES
+from markten.__context import get_context
+
+
+@pytest.fixture
+def json_output() -> Iterator[None]:
+    previous = get_context().output
+    get_context().output = "json"
+    yield
+    get_context().output = previous
+
+
+def test_events_reported(json_output: None, capsys: pytest.CaptureFixture):
+    async def greet(action: ActionSession, name: str) -> None:
+        action.log(f"Hello {name}")
+
+    recipe = Recipe("Events")
+    recipe.parameter("name", ["Maddy"])
+    recipe.step(greet)
+    recipe.run()
+
+    events = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    kinds = [event["event"] for event in events]
+    assert kinds == [
+        "recipe_start",
+        "permutation_start",
+        "action_start",
+        "log",
+        "action_end",
+        "permutation_end",
+        "recipe_end",
+    ]
+    assert events[1]["params"] == {"name": "Maddy"}
+    assert events[3]["line"] == "Hello Maddy"
+    assert events[4]["status"] == "success"
+    assert events[5]["status"] == "success"
+
+
+def test_failure_reported(json_output: None, capsys: pytest.CaptureFixture):
+    async def broken(action: ActionSession) -> None:
+        raise RuntimeError("Oh no")
+
+    recipe = Recipe("Events")
+    recipe.step(broken)
+    recipe.run()
+
+    events = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    error = next(event for event in events if event["event"] == "error")
+    assert "Oh no" in error["traceback"]
+    end = next(e for e in events if e["event"] == "permutation_end")
+    assert end["status"] == "failure"
+
+
+def test_spilled_log_lines_reported(
+    json_output: None, capsys: pytest.CaptureFixture
+):
+    """Lines spilled to disk between reports are still reported"""
+    lines = [str(i) for i in range(LOG_TAIL_LINES * 3 + 5)]
+
+    async def noisy(action: ActionSession) -> None:
+        action.log_lines(lines[:10])
+        # Let the first lines be reported
+        await asyncio.sleep(0.01)
+        action.log_lines(lines[10:])
+
+    recipe = Recipe("Events")
+    recipe.step(noisy)
+    recipe.run()
+
+    events = [
+        json.loads(line) for line in capsys.readouterr().out.splitlines()
+    ]
+    assert [e["line"] for e in events if e["event"] == "log"] == lines
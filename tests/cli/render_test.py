@@ -0,0 +1,233 @@
+"""
+tests / cli / render_test
+
+Test cases for change tracking and cached rendering of actions.
+"""
+
+import asyncio
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+from rich.console import Console
+
+from markten import ActionSession
+from markten.__cli import CliManager, Dashboard, draw_action
+from markten.__consts import (
+    DEFAULT_RENDER_BUDGET,
+    LOG_TAIL_LINES,
+    RENDER_BUDGET_ENV_VAR,
+)
+from markten.__utils import LogBuffer
+
+
+def test_display_reused_when_unchanged():
+    session = ActionSession("root")
+    child = session.make_child("child")
+    info = session.display()
+    assert session.display() is info
+    assert child.display() is info.children[0]
+
+
+def test_change_invalidates_ancestors_only():
+    session = ActionSession("root")
+    first = session.make_child("first")
+    session.make_child("second")
+    info = session.display()
+
+    first.log("Hello")
+    new_info = session.display()
+    assert new_info is not info
+    assert new_info.children[0] is not info.children[0]
+    assert new_info.children[0].output == ["Hello"]
+    # Unchanged sibling is reused
+    assert new_info.children[1] is info.children[1]
+
+
+def test_listener_notified_once_per_display():
+    session = ActionSession("root")
+    child = session.make_child("child")
+    calls = 0
+
+    def listener():
+        nonlocal calls
+        calls += 1
+
+    session.add_change_listener(listener)
+    session.display()
+    child.log("a")
+    child.log("b")
+    assert calls == 1
+
+    session.display()
+    child.succeed()
+    assert calls == 2
+
+    session.remove_change_listener(listener)
+    session.display()
+    child.log("c")
+    assert calls == 2
+
+
+def test_renderable_reused_when_unchanged():
+    session = ActionSession("root")
+    session.make_child("child")
+    info = session.display()
+    assert draw_action(info) is draw_action(session.display())
+
+
+def test_log_spills_to_disk():
+    session = ActionSession("root")
+    lines = [str(i) for i in range(LOG_TAIL_LINES + 5)]
+    for line in lines:
+        session.log(line)
+
+    info = session.display()
+    assert info.output == lines[5:]
+    assert info.omitted_output == 5
+    assert session.full_output() == lines
+
+    # Still appends correctly after reading the full log
+    session.log("end")
+    assert session.full_output() == [*lines, "end"]
+
+
+def test_log_read_lines():
+    log = LogBuffer(max_lines=3)
+    lines = [str(i) for i in range(10)]
+    for line in lines:
+        log.append(line)
+    assert log.read_lines(0) == lines
+    assert log.read_lines(2, 5) == lines[2:5]
+    # Continues from where the previous read stopped
+    assert log.read_lines(5, 8) == lines[5:8]
+    assert log.read_lines(1, 3) == lines[1:3]
+    log.append("10")
+    assert log.read_lines(6) == [*lines[6:], "10"]
+
+
+class FakeLive:
+    """Records how often the display is updated and refreshed"""
+
+    def __init__(self) -> None:
+        self.updates = 0
+        self.refreshes = 0
+        self.renderable: object = None
+
+    def update(self, renderable: object, refresh: bool = False) -> None:
+        self.updates += 1
+        self.renderable = renderable
+
+    def refresh(self) -> None:
+        self.refreshes += 1
+
+
+@pytest.mark.asyncio
+async def test_idle_backoff():
+    session = ActionSession("root")
+    live = FakeLive()
+    manager = CliManager(live)  # type: ignore
+    task = asyncio.create_task(manager.run(session))
+    await asyncio.sleep(1)
+    # At full rate, this would be around 33 frames
+    assert live.refreshes < 10
+
+    # Changes are drawn promptly, even while idle
+    updates = live.updates
+    session.log("Hello")
+    await asyncio.sleep(0.1)
+    assert live.updates == updates + 1
+
+    manager.stop()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_final_frame_is_up_to_date():
+    """Changes made just before stopping are drawn in the final frame"""
+    session = ActionSession("root")
+    live = FakeLive()
+    manager = CliManager(live, lambda info: info)  # type: ignore
+    task = asyncio.create_task(manager.run(session))
+    # Let the first frame be drawn, then change the action while the manager
+    # waits for the next one
+    await asyncio.sleep(0)
+    session.log("Hello")
+    session.succeed()
+    manager.stop()
+    await task
+    final = session.display()
+    assert live.renderable is final
+    assert final.output == ["Hello"]
+
+
+@pytest.mark.parametrize("budget", ["0", "-1", "2", "nope"])
+def test_invalid_render_budget_from_environment(budget: str):
+    """Invalid budgets are ignored, even when the CLI option isn't used"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from markten.__context import get_context\n"
+            "print(get_context().render_budget)",
+        ],
+        env=os.environ | {RENDER_BUDGET_ENV_VAR: budget},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert float(result.stdout) == DEFAULT_RENDER_BUDGET
+
+
+def test_dashboard_history():
+    output = io.StringIO()
+    console = Console(file=output, width=80)
+    dashboard = Dashboard(console, 2)
+
+    session = dashboard.add("name = Maddy")
+    dashboard.start(session)
+    session.make_child("quiet step").succeed()
+    verbose_step = session.make_child("verbose step")
+    action = verbose_step.make_child("student info")
+    action.set_verbose()
+    action.log("Student: Maddy")
+    action.succeed()
+    verbose_step.succeed()
+    dashboard.finish(session, True, "(success)")
+
+    assert "name = Maddy (success)" in output.getvalue()
+    # Details of successful permutations are collapsed, other than the steps
+    # containing verbose actions
+    assert "quiet step" not in output.getvalue()
+    assert "verbose step" in output.getvalue()
+    assert "Student: Maddy" in output.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_dashboard_paused():
+    output = io.StringIO()
+    console = Console(file=output, width=80, force_terminal=True)
+    dashboard = Dashboard(console, None)
+    async with dashboard.show():
+        await asyncio.sleep(0.05)
+        with dashboard.paused():
+            console.file.write("Enter zid: ")
+            await asyncio.sleep(0.05)
+    # Output while paused isn't written onto the end of the dashboard
+    assert "Enter zid: " in output.getvalue()
+    assert "permutationsEnter zid: " not in output.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_dashboard_skip_redraws():
+    output = io.StringIO()
+    console = Console(file=output, width=80, force_terminal=True)
+    dashboard = Dashboard(console, 2)
+    async with dashboard.show():
+        await asyncio.sleep(0.05)
+        dashboard.skip()
+        await asyncio.sleep(0.05)
+        # Shown without waiting for another permutation to change
+        assert "1 skipped" in output.getvalue()
@@ -0,0 +1,67 @@
+"""
+tests / cli / startup_test
+==========================
+
+Test cases to ensure that Markten starts quickly, by not importing modules
+which aren't needed.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+TRIVIAL_RECIPE = """
+from markten import ActionSession, Recipe
+
+recipe = Recipe("trivial")
+
+
+@recipe.step
+async def step(action: ActionSession) -> None:
+    pass
+
+
+recipe.run()
+"""
+
+
+def imported_modules(*args: str) -> set[str]:
+    """Run `python -m markten` with the given arguments, returning the names
+    of all modules it imports.
+    """
+    script = (
+        "import atexit, runpy, sys\n"
+        "atexit.register(lambda: print(*sys.modules, file=sys.stderr))\n"
+        f"sys.argv = ['markten', *{args!r}]\n"
+        "runpy.run_module('markten', run_name='__main__')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stderr.split())
+
+
+def test_version_imports():
+    modules = imported_modules("--version")
+    assert "markten" in modules
+    for module in ["rich", "asyncio", "markten.__recipe", "markten.actions"]:
+        assert module not in modules
+
+
+def test_trivial_recipe_imports(tmp_path: Path):
+    recipe = tmp_path / "recipe.py"
+    recipe.write_text(TRIVIAL_RECIPE)
+    modules = imported_modules("--output", "json", str(recipe))
+    assert "markten.__recipe" in modules
+    for module in [
+        "aiofiles",
+        "humanize",
+        "platformdirs",
+        "readline",
+        "markten.actions.git",
+        "markten.parameters.__io",
+    ]:
+        assert module not in modules
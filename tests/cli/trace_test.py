@@ -0,0 +1,91 @@
+"""
+tests / cli / trace_test
+========================
+
+Test cases for exporting traces of action timing.
+"""
+
+import asyncio
+import json
+import weakref
+
+import pytest
+
+from markten import ActionSession, Recipe, get_context
+from markten.__action_session import ActionInfo, ActionStatus
+from markten.__trace import Tracer, assign_lanes
+
+
+def make_slice(start: float, end: float) -> tuple[float, float, ActionInfo]:
+    info = ActionInfo("x", ActionStatus.Success, None, None, [], [], False)
+    return (start, end, info)
+
+
+def test_nested_slices_share_lane():
+    slices = [make_slice(0, 10), make_slice(1, 5), make_slice(5, 9)]
+    assert assign_lanes(slices) == [0, 0, 0]
+
+
+def test_overlapping_slices_use_separate_lanes():
+    slices = [make_slice(0, 10), make_slice(1, 6), make_slice(4, 9)]
+    assert assign_lanes(slices) == [0, 0, 1]
+
+
+def test_tracer_records_children():
+    tracer = Tracer()
+    session = ActionSession("step")
+    tracer.record("n = 1", session)
+    child = session.make_child("child")
+    child.succeed()
+    session.fail()
+    unfinished = ActionSession("other")
+    tracer.record("n = 2", unfinished)
+
+    events = tracer.events()
+    slices = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert slices["step"]["args"]["status"] == "failure"
+    assert slices["child"]["args"]["status"] == "success"
+    assert slices["child"]["pid"] == slices["step"]["pid"]
+    assert slices["other"]["args"]["status"] == "unfinished"
+    assert slices["other"]["pid"] != slices["step"]["pid"]
+    names = {e["args"]["name"] for e in events if e["name"] == "process_name"}
+    assert names == {"n = 1", "n = 2"}
+
+
+def test_tracer_releases_finished_sessions():
+    tracer = Tracer()
+    session = ActionSession("step")
+    tracer.record("n = 1", session)
+    session.log("output")
+    session.succeed()
+    tracer.finish(session)
+    # The trace no longer refers to the session or its output
+    session_ref = weakref.ref(session)
+    del session
+    assert session_ref() is None
+    slices = [e for e in tracer.events() if e["ph"] == "X"]
+    assert slices[0]["args"]["status"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_recipe_writes_trace(tmp_path):
+    trace = tmp_path / "trace.json"
+    get_context().trace = str(trace)
+    try:
+        recipe = Recipe("test", max_concurrency=2)
+        recipe.parameter("n", range(2))
+
+        @recipe.step
+        async def step(action: ActionSession, n: int):
+            await asyncio.sleep(0.01)
+
+        await recipe.async_run()
+    finally:
+        get_context().trace = None
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    tracks = {e["args"]["name"] for e in events if e["name"] == "process_name"}
+    assert tracks == {"n = 0", "n = 1"}
+    durations = [e["dur"] for e in events if e["ph"] == "X"]
+    assert len(durations) == 2
+    assert all(d >= 10_000 for d in durations)
@@ -0,0 +1,237 @@
+"""
+tests / conftest
+================
+
+Shared configuration for the test suite.
+
+Benchmarks (in `tests/benchmarks`) are slow and depend on the machine, so
+they only run when `--benchmark` is given, eg
+`pytest tests/benchmarks --benchmark`. A benchmark fails if its result is
+worse than its baseline by more than the threshold given by
+`--benchmark-threshold`. Since results depend on the machine, the baseline
+should be regenerated (using `--benchmark-save`) when benchmarks are run on a
+different machine.
+"""
+
+import gc
+import json
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+BASELINE_FILE = Path(__file__).parent / "benchmarks" / "baseline.json"
+"""File in which baseline benchmark results are stored"""
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("benchmark", "Markten benchmarks")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        help="Run benchmarks, comparing results to the stored baseline",
+    )
+    group.addoption(
+        "--benchmark-save",
+        action="store_true",
+        help="Store the results of benchmarks as the new baseline",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=2.0,
+        help=(
+            "Factor by which a benchmark can be worse than its baseline "
+            "before it fails (default 2.0)"
+        ),
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers", "benchmark: benchmark, which only runs with --benchmark"
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config,
+    items: list[pytest.Item],
+) -> None:
+    if config.getoption("--benchmark") or config.getoption(
+        "--benchmark-save"
+    ):
+        return
+    skip = pytest.mark.skip(reason="Benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+results_key = pytest.StashKey[dict[str, dict[str, Any]]]()
+"""Results of all benchmarks in the session"""
+
+
+class Benchmark:
+    """
+    Measures the performance of a benchmark, failing it if it performs worse
+    than its baseline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        baseline: dict[str, dict[str, Any]],
+        results: dict[str, dict[str, Any]],
+        threshold: float,
+    ) -> None:
+        self.__name = name
+        self.__baseline = baseline
+        self.__results = results
+        self.__threshold = threshold
+
+    def time(
+        self,
+        fn: Callable[[], object],
+        *,
+        iterations: int = 1,
+        rounds: int = 5,
+        metric: str = "time",
+    ) -> float:
+        """Measure the time taken to call the given function.
+
+        The function is called `iterations` times per round, and the fastest
+        round is used, to reduce noise from other activity on the machine.
+
+        Returns
+        -------
+        float
+            Number of seconds per call.
+        """
+        # Don't include collecting garbage from earlier tests
+        gc.collect()
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            best = min(best, time.perf_counter() - start)
+        return self.check(best / iterations, "s", metric=metric)
+
+    async def time_async(
+        self,
+        fn: Callable[[], Awaitable[object]],
+        *,
+        iterations: int = 1,
+        rounds: int = 5,
+        metric: str = "time",
+    ) -> float:
+        """Measure the time taken to call and await the given function.
+
+        Returns
+        -------
+        float
+            Number of seconds per call.
+        """
+        # Don't include collecting garbage from earlier tests
+        gc.collect()
+        best = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                await fn()
+            best = min(best, time.perf_counter() - start)
+        return self.check(best / iterations, "s", metric=metric)
+
+    def check(
+        self,
+        value: float,
+        unit: str,
+        *,
+        metric: str = "time",
+        higher_is_better: bool = False,
+    ) -> float:
+        """Record a result, failing if it is worse than its baseline.
+
+        Parameters
+        ----------
+        value : float
+            Measured value.
+        unit : str
+            Unit of the value, for display.
+        metric : str, optional
+            Name of the metric, so that a benchmark can measure multiple
+            values, by default "time".
+        higher_is_better : bool, optional
+            Whether higher values are better (eg for throughput), by default
+            False.
+
+        Returns
+        -------
+        float
+            The given value.
+        """
+        key = f"{self.__name}::{metric}"
+        self.__results[key] = {
+            "value": value,
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+        baseline = self.__baseline.get(key)
+        if baseline is None:
+            return value
+        # How many times worse the result is than the baseline
+        if higher_is_better:
+            ratio = baseline["value"] / value if value else float("inf")
+        else:
+            ratio = value / baseline["value"] if baseline["value"] else 1
+        if ratio > self.__threshold:
+            pytest.fail(
+                f"{metric} regressed: {value:.4g} {unit} vs baseline "
+                f"{baseline['value']:.4g} {unit} ({ratio:.2f}x worse)"
+            )
+        return value
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest) -> Benchmark:
+    config = request.config
+    baseline = (
+        {}
+        if config.getoption("--benchmark-save") or not BASELINE_FILE.exists()
+        else json.loads(BASELINE_FILE.read_text())
+    )
+    results = config.stash.setdefault(results_key, {})
+    name = f"{request.path.stem}::{request.node.name}"
+    return Benchmark(
+        name,
+        baseline,
+        results,
+        config.getoption("--benchmark-threshold"),
+    )
+
+
+def pytest_terminal_summary(
+    terminalreporter: Any,
+    config: pytest.Config,
+) -> None:
+    results = config.stash.get(results_key, {})
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for key, result in sorted(results.items()):
+        terminalreporter.write_line(
+            f"{key}: {result['value']:.4g} {result['unit']}"
+        )
+    if config.getoption("--benchmark-save"):
+        baseline = (
+            json.loads(BASELINE_FILE.read_text())
+            if BASELINE_FILE.exists()
+            else {}
+        )
+        baseline.update(results)
+        BASELINE_FILE.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + "\n"
+        )
+        terminalreporter.write_line(f"Saved baseline to {BASELINE_FILE}")
@@ -0,0 +1,99 @@
+"""
+tests / recipe / binding_test
+=============================
+
+Test cases for precompiled action binding plans.
+"""
+
+from collections.abc import Awaitable, Coroutine
+from typing import Any
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__recipe.binding import ActionBinding
+
+
+async def uses_a(action: ActionSession, a: int, b: int = 2) -> None:
+    pass
+
+
+async def uses_everything(action: ActionSession, **kwargs: Any) -> None:
+    pass
+
+
+async def positional_only(action: ActionSession, a: int, /) -> None:
+    pass
+
+
+async def produce(action: ActionSession, n: int) -> dict[str, int]:
+    return {"x": n}
+
+
+def wrapper(action: ActionSession, n: int) -> Awaitable[dict[str, int]]:
+    return produce(action, n)
+
+
+def coroutine_wrapper(
+    action: ActionSession, n: int
+) -> Coroutine[Any, Any, dict[str, int]]:
+    return produce(action, n)
+
+
+def awaits_none(action: ActionSession) -> Awaitable[None]:
+    return uses_everything(action)
+
+
+def test_binds_only_requested_values():
+    binding = ActionBinding(uses_a)
+    assert binding.bind({"a": 1, "c": 3}) == {"a": 1}
+    assert binding.bind({"a": 1, "b": 4}) == {"a": 1, "b": 4}
+
+
+def test_binds_everything_for_kwargs():
+    binding = ActionBinding(uses_everything)
+    assert binding.bind({"a": 1, "c": 3}) == {"a": 1, "c": 3}
+
+
+def test_missing_value():
+    binding = ActionBinding(uses_a)
+    with pytest.raises(TypeError):
+        binding.bind({"b": 1})
+
+
+def test_positional_only_rejected_on_registration():
+    with pytest.raises(ValueError):
+        ActionBinding(positional_only)
+
+
+@pytest.mark.asyncio
+async def test_recipe_rejects_missing_value():
+    recipe = Recipe("test")
+    recipe.parameter("b", [1])
+    recipe.step(uses_a)
+
+    with pytest.raises(ValueError):
+        await recipe.async_run()
+
+
+def test_awaitable_outputs():
+    """Awaitables are described by the type they resolve to"""
+    assert ActionBinding(wrapper).outputs is None
+    assert ActionBinding(coroutine_wrapper).outputs is None
+    assert ActionBinding(awaits_none).outputs == frozenset()
+
+
+@pytest.mark.asyncio
+async def test_recipe_accepts_awaitable_outputs():
+    recipe = Recipe("test")
+    recipe.parameter("n", [1])
+    recipe.step(wrapper)
+    received: list[int] = []
+
+    async def uses_x(action: ActionSession, x: int) -> None:
+        received.append(x)
+
+    recipe.step(uses_x)
+
+    await recipe.async_run()
+    assert received == [1]
@@ -0,0 +1,68 @@
+"""
+tests / recipe / concurrency_test
+=================================
+
+Test cases for running recipe permutations concurrently.
+"""
+
+import asyncio
+
+import pytest
+
+from markten import ActionSession, Recipe
+
+
+@pytest.mark.asyncio
+async def test_permutations_run_concurrently():
+    """
+    Up to `max_concurrency` permutations should be in-flight at once.
+    """
+    recipe = Recipe("test", max_concurrency=3)
+    recipe.parameter("n", range(6))
+
+    in_flight = 0
+    max_in_flight = 0
+    completed: list[int] = []
+
+    @recipe.step
+    async def step(action: ActionSession, n: int):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        completed.append(n)
+
+    await recipe.async_run()
+
+    assert max_in_flight == 3
+    assert sorted(completed) == list(range(6))
+
+
+@pytest.mark.asyncio
+async def test_permutations_run_serially_by_default():
+    """
+    By default, only one permutation should run at a time.
+    """
+    recipe = Recipe("test")
+    recipe.parameter("n", range(3))
+
+    in_flight = 0
+    max_in_flight = 0
+
+    @recipe.step
+    async def step(action: ActionSession, n: int):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await recipe.async_run()
+
+    assert max_in_flight == 1
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError):
+        Recipe("test", max_concurrency=0)
@@ -0,0 +1,130 @@
+"""
+tests / recipe / dependencies_test
+==================================
+
+Test cases for inferring dependencies between recipe steps.
+"""
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__recipe.step import RecipeStep, dict_to_actions
+
+
+async def produce_a(action: ActionSession) -> int:
+    return 1
+
+
+async def consume_a(action: ActionSession, a: int) -> None:
+    pass
+
+
+async def consume_b(action: ActionSession, b: int) -> None:
+    pass
+
+
+async def unknown_outputs(action: ActionSession):
+    return {}
+
+
+async def consume_everything(action: ActionSession, **kwargs: Any) -> None:
+    pass
+
+
+def named_step(index: int, **actions: Any) -> RecipeStep:
+    return RecipeStep(index, dict_to_actions(actions))
+
+
+def test_consumer_depends_on_producer():
+    producer = named_step(0, a=produce_a)
+    consumer = RecipeStep(1, [consume_a])
+    assert consumer.depends_on(producer)
+
+
+def test_independent_steps():
+    producer = named_step(0, a=produce_a)
+    consumer = RecipeStep(1, [consume_b])
+    assert not consumer.depends_on(producer)
+
+
+def test_depends_on_unknown_outputs():
+    producer = RecipeStep(0, [unknown_outputs])
+    consumer = RecipeStep(1, [consume_b])
+    assert consumer.depends_on(producer)
+
+
+def test_kwargs_depends_on_all_producers():
+    producer = named_step(0, a=produce_a)
+    consumer = RecipeStep(1, [consume_everything])
+    assert consumer.depends_on(producer)
+
+
+def test_overwriting_value_depends_on_producer():
+    first = named_step(0, a=produce_a)
+    second = named_step(1, a=produce_a)
+    assert second.depends_on(first)
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    recipe = Recipe("test", infer_dependencies=True)
+    recipe.parameter("n", [1])
+
+    running = 0
+    max_running = 0
+
+    async def lookup(action: ActionSession, n: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return n
+
+    received: list[tuple[int, int]] = []
+
+    async def combine(action: ActionSession, x: int, y: int) -> None:
+        received.append((x, y))
+
+    recipe.step({"x": lookup})
+    recipe.step({"y": lookup})
+    recipe.step(combine)
+
+    await recipe.async_run()
+
+    assert max_running == 2
+    assert received == [(1, 1)]
+
+
+@pytest.mark.asyncio
+async def test_failed_step_cancels_concurrent_actions():
+    """
+    When a step fails, all actions of concurrent steps are cancelled, and
+    their teardown hooks are run, before the permutation ends.
+    """
+    recipe = Recipe("test", infer_dependencies=True)
+    finished: list[str] = []
+    torn_down: list[str] = []
+
+    async def fail(action: ActionSession) -> None:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Failed")
+
+    def make_slow(name: str):
+        async def slow(action: ActionSession) -> None:
+            action.add_teardown_hook(lambda: torn_down.append(name))
+            await asyncio.sleep(0.2)
+            finished.append(name)
+
+        return slow
+
+    recipe.step(fail)
+    recipe.step(make_slow("slow1"), make_slow("slow2"))
+    await recipe.async_run()
+    await asyncio.sleep(0.3)
+
+    assert finished == []
+    assert sorted(torn_down) == ["slow1", "slow2"]
@@ -0,0 +1,97 @@
+"""
+tests / recipe / journal_test
+=============================
+
+Test cases for the run journal, and resuming recipes.
+"""
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__recipe.journal import RunJournal, fingerprint
+
+
+def test_fingerprint_is_stable():
+    assert fingerprint({"a": 1, "b": "x"}) == fingerprint({"b": "x", "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": "1"})
+
+
+def test_succeeded_uses_latest_status():
+    with TemporaryDirectory() as tmp_dir:
+        journal = RunJournal(Path(tmp_dir) / "journal.jsonl")
+        journal.record({"a": 1}, "success", 1.0, [])
+        journal.record({"a": 2}, "success", 1.0, [("step", 0.5)])
+        journal.record({"a": 2}, "failure", 1.0, [])
+        journal.record({"a": 3}, "interrupted", 1.0, [])
+
+        assert journal.succeeded() == {fingerprint({"a": 1})}
+
+
+def test_ignores_partial_lines():
+    with TemporaryDirectory() as tmp_dir:
+        journal = RunJournal(Path(tmp_dir) / "journal.jsonl")
+        journal.record({"a": 1}, "success", 1.0, [])
+        with open(journal.path, "a") as f:
+            f.write('{"fingerprint": "ab')
+
+        assert journal.succeeded() == {fingerprint({"a": 1})}
+
+
+def test_missing_journal():
+    with TemporaryDirectory() as tmp_dir:
+        journal = RunJournal(Path(tmp_dir) / "journal.jsonl")
+        assert journal.succeeded() == set()
+
+
+@pytest.fixture
+def journal_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Store recipes' journals in a temporary directory"""
+    path = tmp_path / "recipe.journal.jsonl"
+    monkeypatch.setattr(
+        RunJournal, "for_recipe", staticmethod(lambda _: RunJournal(path))
+    )
+    return path
+
+
+def make_recipe(ran: list[int], journal: bool | None = None) -> Recipe:
+    recipe = Recipe("test", journal=journal)
+    recipe.parameter("n", [1, 2])
+
+    async def step(action: ActionSession, n: int) -> None:
+        ran.append(n)
+
+    recipe.step(step)
+    return recipe
+
+
+@pytest.mark.asyncio
+async def test_no_journal_by_default(journal_path: Path):
+    ran: list[int] = []
+    await make_recipe(ran).async_run()
+    assert ran == [1, 2]
+    assert not journal_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_resume_records_journal(journal_path: Path):
+    ran: list[int] = []
+    await make_recipe(ran).async_run(resume=True)
+    assert ran == [1, 2]
+    assert journal_path.exists()
+
+    # Resuming again skips everything
+    ran.clear()
+    await make_recipe(ran).async_run(resume=True)
+    assert ran == []
+
+
+@pytest.mark.asyncio
+async def test_journal_enabled(journal_path: Path):
+    ran: list[int] = []
+    await make_recipe(ran, journal=True).async_run()
+    assert journal_path.exists()
+    await make_recipe(ran, journal=False).async_run(resume=True)
+    assert ran == [1, 2, 1, 2]
@@ -0,0 +1,139 @@
+"""
+tests / recipe / parameters_test
+================================
+
+Test cases for the parameter manager.
+"""
+
+import pytest
+
+from markten.__recipe.parameters import ParameterManager
+from markten.__shard import Shard
+from markten.more_itertools import RegenerateIterable
+
+
+def make_params(**params) -> ParameterManager:
+    manager = ParameterManager()
+    for name, values in params.items():
+        manager.add(name, values)
+    return manager
+
+
+def test_permutation_order():
+    params = make_params(a=[1, 2], b=["x", "y"])
+    assert list(params) == [
+        {"a": 1, "b": "x"},
+        {"a": 1, "b": "y"},
+        {"a": 2, "b": "x"},
+        {"a": 2, "b": "y"},
+    ]
+
+
+def test_inner_generator_evaluated_once():
+    """
+    A one-shot iterator used as an inner parameter is reused for every value
+    of the outer parameter.
+    """
+    evaluations = 0
+
+    def values():
+        nonlocal evaluations
+        evaluations += 1
+        yield from ["x", "y"]
+
+    params = make_params(a=[1, 2], b=values())
+    assert len(list(params)) == 4
+    assert evaluations == 1
+
+
+def test_regenerate_iterable_is_reevaluated():
+    evaluations = 0
+
+    def values():
+        nonlocal evaluations
+        evaluations += 1
+        yield from ["x", "y"]
+
+    params = make_params(a=[1, 2], b=RegenerateIterable(values))
+    assert len(list(params)) == 4
+    assert evaluations == 2
+
+
+def test_len_known_for_sequences():
+    params = make_params(a=[1, 2, 3], b=range(4))
+    assert len(params) == 12
+
+
+def test_len_unknown_for_unevaluated_iterators():
+    params = make_params(a=iter([1, 2, 3]))
+    assert params.size is None
+    with pytest.raises(TypeError):
+        len(params)
+
+
+def test_index_access():
+    params = make_params(a=iter([1, 2, 3]), b=iter(["x", "y"]))
+    assert params[3] == {"a": 2, "b": "y"}
+    assert params[0] == {"a": 1, "b": "x"}
+    with pytest.raises(IndexError):
+        params[6]
+
+
+def test_iterate_from_index():
+    params = make_params(a=[1, 2], b=["x", "y"])
+    assert list(params.iterate(2)) == [
+        {"a": 2, "b": "x"},
+        {"a": 2, "b": "y"},
+    ]
+
+
+def test_no_parameters():
+    assert list(make_params()) == [{}]
+
+
+def test_shards_are_contiguous_ranges_when_size_known():
+    params = make_params(a=[1, 2, 3], b=["x", "y", "z"])
+    shards = [list(params.iterate_shard(Shard(i, 4))) for i in range(1, 5)]
+    assert [len(shard) for shard in shards] == [2, 2, 2, 3]
+    assert [params.shard_size(Shard(i, 4)) for i in range(1, 5)] == [
+        2,
+        2,
+        2,
+        3,
+    ]
+    assert [p for shard in shards for p in shard] == list(params)
+
+
+def test_shards_partition_unknown_size():
+    def values():
+        yield from range(50)
+
+    shards = []
+    for i in range(1, 4):
+        params = make_params(a=values(), b=["x", "y"])
+        assert params.shard_size(Shard(i, 3)) is None
+        shards.append(list(params.iterate_shard(Shard(i, 3))))
+    # Every permutation is in exactly one shard
+    found = sorted(
+        (p["a"], p["b"]) for shard in shards for p in shard
+    )
+    assert found == [(a, b) for a in range(50) for b in ["x", "y"]]
+    assert all(shards)
+
+
+def test_more_shards_than_permutations():
+    params = make_params(a=[1])
+    assert list(params.iterate_shard(Shard(1, 2))) == []
+    assert list(params.iterate_shard(Shard(2, 2))) == [{"a": 1}]
+
+
+@pytest.mark.parametrize("shard", ["0/2", "3/2", "1", "a/b", "1/0"])
+def test_invalid_shard(shard: str):
+    with pytest.raises(ValueError):
+        Shard.parse(shard)
+
+
+def test_parse_shard():
+    assert Shard.parse("2/3") == Shard(2, 3)
+    assert Shard.parse((1, 4)) == Shard(1, 4)
+    assert str(Shard(2, 3)) == "2/3"
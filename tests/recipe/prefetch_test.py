@@ -0,0 +1,85 @@
+"""
+tests / recipe / prefetch_test
+==============================
+
+Test cases for prefetching steps of upcoming permutations.
+"""
+
+import asyncio
+
+import pytest
+
+from markten import ActionSession, Recipe
+
+
+@pytest.mark.asyncio
+async def test_prefetch_runs_ahead():
+    """
+    Prefetchable steps for the next permutation should start while the
+    current permutation is still running.
+    """
+    recipe = Recipe("test")
+    recipe.parameter("n", range(3))
+
+    events: list[str] = []
+
+    @recipe.step(prefetch=True)
+    async def fetch(action: ActionSession, n: int):
+        events.append(f"fetch {n}")
+        await asyncio.sleep(0.01)
+        return {"value": n}
+
+    @recipe.step
+    async def present(action: ActionSession, value: int):
+        events.append(f"present start {value}")
+        await asyncio.sleep(0.05)
+        events.append(f"present end {value}")
+
+    await recipe.async_run()
+
+    assert events.index("fetch 1") < events.index("present end 0")
+    assert events.index("fetch 2") < events.index("present end 1")
+    # Presentation still happens strictly one at a time
+    assert events.index("present end 0") < events.index("present start 1")
+
+
+@pytest.mark.asyncio
+async def test_no_prefetch_without_lookahead():
+    """
+    Prefetching is disabled when `lookahead=0`.
+    """
+    recipe = Recipe("test", lookahead=0)
+    recipe.parameter("n", range(2))
+
+    events: list[str] = []
+
+    @recipe.step(prefetch=True)
+    async def fetch(action: ActionSession, n: int):
+        events.append(f"fetch {n}")
+
+    @recipe.step
+    async def present(action: ActionSession, n: int):
+        events.append(f"present {n}")
+
+    await recipe.async_run()
+
+    assert events == ["fetch 0", "present 0", "fetch 1", "present 1"]
+
+
+@pytest.mark.asyncio
+async def test_prefetched_teardown_runs():
+    """
+    Teardown hooks registered by prefetched steps are run.
+    """
+    recipe = Recipe("test")
+    recipe.parameter("n", range(2))
+
+    torn_down: list[int] = []
+
+    @recipe.step(prefetch=True)
+    async def fetch(action: ActionSession, n: int):
+        action.add_teardown_hook(lambda: torn_down.append(n))
+
+    await recipe.async_run()
+
+    assert torn_down == [0, 1]
@@ -0,0 +1,134 @@
+"""
+tests / recipe / resources_test
+===============================
+
+Test cases for resource pools.
+"""
+
+import asyncio
+import sys
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__resources import ResourcePool, ResourcePools, using_resources
+from markten.actions import process
+from markten.actions.__git import network_resources
+
+
+@pytest.mark.asyncio
+async def test_pool_admission_is_fair():
+    """
+    Slots should be given to waiters in the order they requested them, even
+    if another action arrives as a slot is released.
+    """
+    pool = ResourcePool("test", 1)
+    await pool.acquire()
+    order: list[int] = []
+
+    async def waiter(n: int):
+        await pool.acquire()
+        order.append(n)
+        await asyncio.sleep(0)
+        pool.release()
+
+    tasks = [asyncio.create_task(waiter(n)) for n in range(3)]
+    await asyncio.sleep(0)
+    assert pool.queued == 3
+    pool.release()
+    tasks.append(asyncio.create_task(waiter(3)))
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2, 3]
+    assert pool.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_cancelled_waiter_leaves_queue():
+    pool = ResourcePool("test", 1)
+    await pool.acquire()
+    task = asyncio.create_task(pool.acquire())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert pool.queued == 0
+    pool.release()
+    assert pool.in_use == 0
+
+
+def test_wildcard_pools():
+    pools = ResourcePools({"host:*": 2, "host:example.com": 1})
+    a = pools.get("host:a.com")
+    assert a is not None and a.capacity == 2
+    assert pools.get("host:b.com") is not a
+    example = pools.get("host:example.com")
+    assert example is not None and example.capacity == 1
+    assert pools.get("network") is None
+
+
+def test_network_resources():
+    assert network_resources("https://github.com/a/b.git") == (
+        "network",
+        "host:github.com",
+    )
+    assert network_resources("git@gitlab.com:a/b.git") == (
+        "network",
+        "host:gitlab.com",
+    )
+    assert network_resources("/some/local/path") == ("network",)
+
+
+@pytest.mark.asyncio
+async def test_recipe_resource_pool_limits_processes():
+    """
+    Processes should hold a slot in the "cpu" pool while they run.
+    """
+    recipe = Recipe("test", max_concurrency=4)
+    recipe.parameter("n", range(4))
+    recipe.resource_pool("cpu", 1)
+
+    in_flight = 0
+    max_in_flight = 0
+
+    @recipe.step
+    async def step(action: ActionSession, n: int):
+        nonlocal in_flight, max_in_flight
+        # Holding "cpu" means the process doesn't acquire it again
+        async with using_resources(action, "cpu"):
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await process.run(action, sys.executable, "-c", "pass")
+            in_flight -= 1
+
+    await recipe.async_run()
+
+    assert max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_action_shows_queue_position():
+    recipe = Recipe("test", max_concurrency=2)
+    recipe.parameter("n", range(2))
+    recipe.resource_pool("network", 1)
+    messages: list[str | None] = []
+    final_messages: list[str | None] = []
+
+    @recipe.step
+    async def step(action: ActionSession, n: int):
+        action.running("Downloading")
+
+        def on_change():
+            messages.append(action.display().message)
+
+        action.add_change_listener(on_change)
+        async with using_resources(action, "network"):
+            final_messages.append(action.display().message)
+            await asyncio.sleep(0.01)
+        action.remove_change_listener(on_change)
+
+    await recipe.async_run()
+
+    assert "Waiting for 'network' (0 ahead in queue)" in messages
+    # Message is restored once the resource is acquired
+    assert final_messages == ["Downloading", "Downloading"]
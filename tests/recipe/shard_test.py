@@ -0,0 +1,46 @@
+"""
+tests / recipe / shard_test
+===========================
+
+Test cases for running a shard of a recipe's permutations.
+"""
+
+import pytest
+
+from markten import ActionSession, Recipe
+from markten.__context import get_context
+
+
+async def run_shard(shard: str | tuple[int, int] | None) -> list[int]:
+    """Run a shard of a recipe, returning the permutations which ran"""
+    recipe = Recipe("test")
+    recipe.parameter("n", range(10))
+    completed: list[int] = []
+
+    @recipe.step
+    async def step(action: ActionSession, n: int):
+        completed.append(n)
+
+    await recipe.async_run(shard=shard)
+    return completed
+
+
+@pytest.mark.asyncio
+async def test_shards_cover_permutations():
+    shards = [await run_shard((i, 3)) for i in range(1, 4)]
+    assert shards == [[0, 1, 2], [3, 4, 5], [6, 7, 8, 9]]
+
+
+@pytest.mark.asyncio
+async def test_shard_from_context():
+    get_context().shard = "2/2"
+    try:
+        assert await run_shard(None) == [5, 6, 7, 8, 9]
+    finally:
+        get_context().shard = None
+
+
+@pytest.mark.asyncio
+async def test_invalid_shard():
+    with pytest.raises(ValueError):
+        await run_shard("3/2")